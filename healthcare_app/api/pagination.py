@@ -0,0 +1,169 @@
+"""
+Pagination classes for the healthcare API.
+
+KeysetPagination pages through a queryset by the values of its ordering
+fields instead of OFFSET, so deep pages cost the same as the first.
+Viewsets opt in by setting it as their pagination_class.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination over the view's ordering plus the primary key.
+
+    The ordering comes from `view.cursor_ordering` or the queryset's own
+    order_by, with the primary key appended as a unique tiebreaker. Ordering
+    fields must be non-null model fields. Clients choose the page size with
+    ?page_size= (capped at max_page_size) and follow the returned
+    next/previous links. The first page carries the same `count` total as
+    PageNumberPagination; pages reached through a cursor leave it out, so
+    walking deep pages never re-counts the table. Requests that pass ?page=
+    keep the page-number behaviour for clients that need random access.
+    """
+    page_size = api_settings.PAGE_SIZE or 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    fallback_class = PageNumberPagination
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        if self.fallback_class.page_query_param in request.query_params:
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+
+        values, reverse = self.decode_cursor(request, fields)
+        ordering = self._flip(self.ordering) if reverse else self.ordering
+        page = queryset.order_by(*ordering)
+        if values is not None:
+            page = page.filter(self._after(ordering, values))
+
+        results = list(page[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        # Only the first page counts, and only when it doesn't hold every row
+        self.count = None
+        if values is None:
+            self.count = queryset.count() if has_more else len(results)
+        if reverse:
+            results.reverse()
+
+        self.fields = fields
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else values is not None
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': 'Total rows; first page only'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        pk_name = queryset.model._meta.pk.name
+        ordering = []
+        for name in getattr(view, 'cursor_ordering', None) or queryset.query.order_by:
+            prefix = '-' if name.startswith('-') else ''
+            field = name.lstrip('-')
+            ordering.append(prefix + (pk_name if field == 'pk' else field))
+
+        # Unique tiebreaker, in the direction of the last ordering field
+        if not any(name.lstrip('-') == pk_name for name in ordering):
+            descending = ordering[-1].startswith('-') if ordering else True
+            ordering.append(('-' if descending else '') + pk_name)
+        return ordering
+
+    @staticmethod
+    def _flip(ordering):
+        return [name[1:] if name.startswith('-') else '-' + name for name in ordering]
+
+    @staticmethod
+    def _after(ordering, values):
+        """Rows strictly after `values` in `ordering` (a row-value comparison)"""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def decode_cursor(self, request, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values = [field.to_python(value) for field, value in zip(fields, payload['v'])]
+            if len(values) != len(fields):
+                raise ValueError
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        values = [field.value_to_string(obj) for field in self.fields]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.results:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.results[0], reverse=True)
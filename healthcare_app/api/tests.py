@@ -9,7 +9,7 @@ from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from users.models import CustomUser, PatientProfile, DoctorProfile, FamilyMember
+from users.models import CustomUser, PatientProfile, DoctorProfile, FamilyMember, CareTeamMember
 from health.models import HealthProfile
 
 
@@ -212,18 +212,30 @@ class PermissionTestCase(TestCase):
         self.assertEqual(len(response.data['results']), 3)
 
     def test_doctor_can_view_health_profiles(self):
-        """Test that doctors can view patient health profiles."""
+        """Test that doctors can view the health profiles of patients on their panel."""
         # Create a patient with health profile
         health_profile = HealthProfile.objects.create(
             user=self.patient_user,
             gender='male',
             blood_type='O+'
         )
+        # And one who is not under this doctor's care
+        other_patient = CustomUser.objects.create_user(
+            username='patient2',
+            password='testpass123',
+            user_type=CustomUser.UserType.PATIENT
+        )
 
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.doctor_token}')
         response = self.client.get('/api/health/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreater(len(response.data['results']), 0)
+        self.assertEqual(len(response.data['results']), 0)
+
+        CareTeamMember.objects.create(doctor=self.doctor_user, patient=self.patient_user)
+        response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['user']['id'], self.patient_user.id)
 
     def test_patient_can_only_view_own_health_profile(self):
         """Test that patients can only see their own health profile."""
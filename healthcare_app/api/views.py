@@ -13,6 +13,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from users.models import CustomUser, PatientProfile, DoctorProfile, FamilyMember
+from users.panels import doctor_panel
 from health.models import HealthProfile
 
 from .serializers import (
@@ -20,6 +21,7 @@ from .serializers import (
     PatientProfileSerializer, DoctorProfileSerializer,
     HealthProfileSerializer, FamilyMemberSerializer
 )
+from .pagination import KeysetPagination
 from .permissions import (
     IsPatient, IsDoctor, IsAdminUser,
     IsPatientOrDoctor, IsOwnerOrReadOnly
@@ -111,6 +113,8 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     """
     queryset = CustomUser.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-date_joined', '-id')
 
     def get_serializer_class(self):
         """Use different serializers for different actions."""
@@ -197,8 +201,8 @@ class PatientProfileViewSet(viewsets.ModelViewSet):
             # Patients can only see their own profile
             return PatientProfile.objects.filter(user=user)
         elif user.user_type == CustomUser.UserType.DOCTOR:
-            # Doctors can see all patient profiles (in real app, restrict to assigned patients)
-            return PatientProfile.objects.all()
+            # Doctors can see the profiles of patients on their panel
+            return doctor_panel(self.request).filter(PatientProfile.objects.all(), 'user')
         elif user.user_type == CustomUser.UserType.ADMIN:
             # Admins can see all profiles
             return PatientProfile.objects.all()
@@ -264,8 +268,8 @@ class HealthProfileViewSet(viewsets.ModelViewSet):
             # Patients can only see their own profile
             return HealthProfile.objects.filter(user=user)
         elif user.user_type == CustomUser.UserType.DOCTOR:
-            # Doctors can see all patient health profiles
-            return HealthProfile.objects.all()
+            # Doctors can see the health profiles of patients on their panel
+            return doctor_panel(self.request).filter(HealthProfile.objects.all(), 'user')
         elif user.user_type == CustomUser.UserType.ADMIN:
             # Admins can see all profiles
             return HealthProfile.objects.all()
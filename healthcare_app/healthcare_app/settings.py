@@ -216,6 +216,18 @@ AUTH_USER_MODEL = 'users.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Text extraction backend for uploaded prescription images: dotted path of a
+# medications.ocr.OCREngine subclass, used by the run_ocr_jobs workers
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'medications.ocr.StubEngine')
+
+# Seconds a warm in-memory medication index (interactions, catalogue, ...) is
+# served before its shared generation is checked for writes by other processes
+INDEX_CHECK_INTERVAL = float(os.environ.get('INDEX_CHECK_INTERVAL', '5'))
+
+# Seconds an OCR upload may stay `processing`, or a safety scan `running`,
+# before its worker is presumed dead and the item is queued again
+QUEUE_CLAIM_TIMEOUT = float(os.environ.get('QUEUE_CLAIM_TIMEOUT', '900'))
+
 # Login/Logout URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'user_type_redirect'
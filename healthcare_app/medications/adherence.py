@@ -0,0 +1,107 @@
+# medications/adherence.py
+
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PatientMedication
+
+
+def _rate(taken, total):
+    return round((taken / total * 100) if total > 0 else 0, 2)
+
+
+def adherence_rate(taken, total):
+    """Percentage of doses taken (on time or late); 0 when nothing is logged"""
+    return (taken / total) * 100 if total > 0 else 0
+
+
+def _rollup_sum(prefix, fields, filter=None):
+    expression = F(prefix + fields[0])
+    for field in fields[1:]:
+        expression = expression + F(prefix + field)
+    return Coalesce(Sum(expression, filter=filter), 0)
+
+
+def rollup_totals(prefix='', filter=None):
+    """
+    Taken/missed/total dose aggregates over MedicationAdherenceRollup rows.
+
+    Use prefix='adherence_rollups__' to annotate PatientMedication querysets
+    and the default empty prefix to aggregate a rollup queryset directly.
+    """
+    return {
+        'taken_doses': _rollup_sum(prefix, ('taken', 'late'), filter),
+        'missed_doses': _rollup_sum(prefix, ('missed',), filter),
+        'total_doses': _rollup_sum(prefix, ('taken', 'late', 'missed', 'skipped'), filter),
+    }
+
+
+def compute_adherence(patient, date_from=None, date_to=None):
+    """
+    Build the adherence summary for a patient with a single grouped query.
+
+    Every medication of the patient is annotated with sums over its daily
+    adherence rollups, so the cost depends neither on the number of
+    medications nor on the size of the raw log table. `date_from`/`date_to`
+    (inclusive dates) restrict the per-medication totals; the weekly trend
+    always covers the last 7 days.
+    """
+    window = Q()
+    if date_from:
+        window &= Q(adherence_rollups__date__gte=date_from)
+    if date_to:
+        window &= Q(adherence_rollups__date__lte=date_to)
+
+    week_ago = timezone.localdate() - timezone.timedelta(days=7)
+    recent = Q(adherence_rollups__date__gte=week_ago)
+    weekly = rollup_totals('adherence_rollups__', recent)
+
+    rows = PatientMedication.objects.filter(patient=patient).values(
+        'medication_id', 'name', 'is_active'
+    ).annotate(
+        last_taken=Max('adherence_rollups__last_taken', filter=window),
+        weekly_total=weekly['total_doses'],
+        weekly_taken=weekly['taken_doses'],
+        **rollup_totals('adherence_rollups__', window)
+    ).order_by('created_at')
+
+    adherence_data = []
+    overall_taken = 0
+    overall_total = 0
+    weekly_taken = 0
+    weekly_total = 0
+
+    for row in rows:
+        # The weekly trend spans every medication, as it always has
+        weekly_taken += row['weekly_taken']
+        weekly_total += row['weekly_total']
+
+        if not row['is_active']:
+            continue
+
+        adherence_data.append({
+            'medication_id': row['medication_id'],
+            'medication_name': row['name'],
+            'total_doses': row['total_doses'],
+            'taken_doses': row['taken_doses'],
+            'missed_doses': row['missed_doses'],
+            'adherence_rate': _rate(row['taken_doses'], row['total_doses']),
+            'last_taken': row['last_taken']
+        })
+
+        overall_taken += row['taken_doses']
+        overall_total += row['total_doses']
+
+    return {
+        'overall_adherence': _rate(overall_taken, overall_total),
+        'weekly_adherence': _rate(weekly_taken, weekly_total),
+        'medications': adherence_data,
+        'total_medications': len(adherence_data),
+        'active_medications': len(adherence_data),
+        'summary': {
+            'total_doses': overall_total,
+            'taken_doses': overall_taken,
+            'missed_doses': overall_total - overall_taken
+        }
+    }
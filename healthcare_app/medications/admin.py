@@ -3,6 +3,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import *
+from .adherence import rollup_totals
 
 @admin.register(Medication)
 class MedicationAdmin(admin.ModelAdmin):
@@ -23,13 +24,18 @@ class PatientMedicationAdmin(admin.ModelAdmin):
         return obj.patient.get_full_name()
     patient_name.short_description = 'Patient'
     
+    def get_queryset(self, request):
+        totals = rollup_totals('adherence_rollups__')
+        return super().get_queryset(request).select_related('patient').annotate(
+            taken_doses=totals['taken_doses'],
+            total_doses=totals['total_doses']
+        )
+    
     def adherence_rate(self, obj):
-        logs = obj.logs.all()
-        if logs:
-            taken = logs.filter(status__in=['taken', 'late']).count()
-            rate = (taken / logs.count()) * 100
+        if obj.total_doses:
+            rate = (obj.taken_doses / obj.total_doses) * 100
             color = 'green' if rate >= 90 else 'orange' if rate >= 75 else 'red'
-            return format_html('<span style="color: {};">{:.1f}%</span>', color, rate)
+            return format_html('<span style="color: {};">{}%</span>', color, f'{rate:.1f}')
         return 'No logs'
     adherence_rate.short_description = 'Adherence'
 
@@ -69,6 +75,14 @@ class MedicationLogAdmin(admin.ModelAdmin):
     patient_name.short_description = 'Patient'
 
 
+@admin.register(MedicationAdherenceRollup)
+class MedicationAdherenceRollupAdmin(admin.ModelAdmin):
+    list_display = ('medication', 'date', 'taken', 'late', 'missed', 'skipped')
+    list_filter = ('date',)
+    search_fields = ('medication__name', 'medication__patient__username')
+    raw_id_fields = ('medication',)
+
+
 @admin.register(DrugInteraction)
 class DrugInteractionAdmin(admin.ModelAdmin):
     list_display = ('medication_1', 'medication_2', 'severity', 'created_at')
@@ -77,6 +91,20 @@ class DrugInteractionAdmin(admin.ModelAdmin):
     readonly_fields = ('interaction_id', 'created_at')
 
 
+@admin.register(AllergenGroup)
+class AllergenGroupAdmin(admin.ModelAdmin):
+    list_display = ('token', 'drug_class', 'atc_prefix')
+    search_fields = ('token', 'drug_class', 'atc_prefix')
+
+
+@admin.register(Contraindication)
+class ContraindicationAdmin(admin.ModelAdmin):
+    list_display = ('condition', 'drug_class', 'atc_prefix', 'severity')
+    list_filter = ('severity',)
+    search_fields = ('condition', 'drug_class', 'atc_prefix')
+    readonly_fields = ('created_at', 'updated_at')
+
+
 @admin.register(Prescription)
 class PrescriptionAdmin(admin.ModelAdmin):
     list_display = ('prescription_id_short', 'patient_name', 'doctor_name', 'issue_date', 'status')
@@ -0,0 +1,159 @@
+# medications/allergies.py
+
+import re
+
+from django.db import transaction
+
+from health.models import HealthProfile
+from users.models import PatientProfile
+
+from .classification import classification_index
+from .indexes import ALLERGEN_GROUPS, SharedIndex
+from .interactions import normalize_name
+from .models import AllergenGroup, PatientAllergy
+
+SEPARATORS = re.compile(r'[,;\n]')
+
+# PatientAllergy.source of each profile model with an allergies field
+PROFILE_SOURCES = (
+    ('patient_profile', PatientProfile),
+    ('health_profile', HealthProfile),
+)
+
+
+def split_allergies(allergies):
+    """Normalized entries of a comma-separated allergies field"""
+    return sorted({normalize_name(allergy) for allergy in SEPARATORS.split(allergies or '') if allergy.strip()})
+
+
+class AllergySet:
+    """
+    A patient's allergies compiled for set intersection: the normalized
+    entries, and the drug classes and ATC prefixes they cover, each mapped
+    back to the entry that covers it.
+    """
+
+    def __init__(self, tokens=(), drug_classes=None, atc_prefixes=None):
+        self.tokens = frozenset(tokens)
+        self.drug_classes = drug_classes or {}
+        self.atc_prefixes = atc_prefixes or {}
+
+    def __bool__(self):
+        return bool(self.tokens)
+
+    def key(self):
+        """Stable description of the set, for cache keys"""
+        return [sorted(self.tokens), sorted(self.drug_classes), sorted(self.atc_prefixes)]
+
+
+class AllergyIndex(SharedIndex):
+    """
+    Process-local map of AllergenGroup rows by normalized token.
+
+    Loaded lazily and reloaded once an AllergenGroup save or delete in
+    any process bumps its shared generation (see medications/indexes.py).
+    """
+
+    generation = ALLERGEN_GROUPS
+
+    def _load(self):
+        groups = {}
+        for token, drug_class, atc_prefix in AllergenGroup.objects.values_list(
+            'token', 'drug_class', 'atc_prefix'
+        ).iterator():
+            groups.setdefault(normalize_name(token), []).append((normalize_name(drug_class), atc_prefix.strip().upper()))
+        return groups
+
+    def compile(self, tokens):
+        """AllergySet of normalized allergy entries"""
+        groups = self.get_index()
+        drug_classes = {}
+        atc = {}
+        for token in sorted(tokens):
+            # An entry naming a drug class covers the class itself
+            drug_classes.setdefault(token, token)
+            for drug_class, atc_prefix in groups.get(token, ()):
+                if drug_class:
+                    drug_classes.setdefault(drug_class, token)
+                if atc_prefix:
+                    atc.setdefault(atc_prefix, token)
+        return AllergySet(tokens, drug_classes, atc)
+
+    def conflicts(self, medications, allergies):
+        """
+        (medication, allergy entry, matched on) for every medication in a
+        regimen covered by `allergies`: by a word of its name or generic
+        name, its drug class, or a level of its ATC code.
+        """
+        if not allergies:
+            return []
+
+        found = []
+        for medication in medications:
+            name = normalize_name(medication)
+            generic_name, drug_class, atc = classification_index.classify(name)
+
+            names = {name, generic_name} | set(name.split()) | set(generic_name.split())
+            matched = names & allergies.tokens
+            if matched:
+                found.append((medication, min(matched), 'name'))
+            elif drug_class in allergies.drug_classes:
+                found.append((medication, allergies.drug_classes[drug_class], 'drug_class'))
+            else:
+                prefixes = allergies.atc_prefixes.keys() & atc
+                if prefixes:
+                    found.append((medication, allergies.atc_prefixes[max(prefixes, key=len)], 'atc_code'))
+        return found
+
+
+allergy_index = AllergyIndex()
+
+
+def patient_allergy_set(patient_id):
+    """Compiled allergies of a patient, from their parsed allergy entries"""
+    tokens = PatientAllergy.objects.filter(patient_id=patient_id).values_list('token', flat=True)
+    return allergy_index.compile(set(tokens))
+
+
+def sync_patient_allergies(patient_id, source, allergies):
+    """Replace a patient's parsed allergy entries from one profile's allergies field"""
+    tokens = set(split_allergies(allergies))
+    existing = PatientAllergy.objects.filter(patient_id=patient_id, source=source)
+    with transaction.atomic():
+        stored = set(existing.values_list('token', flat=True))
+        if stored - tokens:
+            existing.filter(token__in=stored - tokens).delete()
+        PatientAllergy.objects.bulk_create([
+            PatientAllergy(patient_id=patient_id, source=source, token=token)
+            for token in sorted(tokens - stored)
+        ])
+
+
+def _replace_allergies(source, profiles):
+    """Rewrite the parsed entries of a batch of (patient id, allergies) from one source"""
+    with transaction.atomic():
+        PatientAllergy.objects.filter(
+            source=source, patient_id__in=[patient_id for patient_id, _ in profiles]
+        ).delete()
+        created = PatientAllergy.objects.bulk_create([
+            PatientAllergy(patient_id=patient_id, source=source, token=token)
+            for patient_id, allergies in profiles
+            for token in split_allergies(allergies)
+        ])
+    return len(created)
+
+
+def backfill_patient_allergies(batch_size=1000):
+    """Parse the allergies of every existing profile; returns entries written per source"""
+    counts = {}
+    for source, model in PROFILE_SOURCES:
+        counts[source] = 0
+        batch = []
+        for profile in model.objects.values_list('user_id', 'allergies').order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(profile)
+            if len(batch) >= batch_size:
+                counts[source] += _replace_allergies(source, batch)
+                batch = []
+        if batch:
+            counts[source] += _replace_allergies(source, batch)
+    return counts
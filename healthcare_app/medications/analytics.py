@@ -0,0 +1,232 @@
+# medications/analytics.py
+
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from .classification import classification_index
+from .models import MedicationLog, PatientMedication, PopulationAdherenceStat
+from .rollups import ROLLUP_STATUSES, TAKEN_STATUSES
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ('frequency', 'drug_class', 'age_band', 'week')
+
+# (lowest age, label); each band runs up to the next one's lowest age
+AGE_BANDS = ((0, '0-17'), (18, '18-29'), (30, '30-44'), (45, '45-64'), (65, '65-74'), (75, '75+'))
+UNKNOWN = 'unknown'
+
+# Per-patient adherence is histogrammed in 5% bins; 100% falls in the last
+HISTOGRAM_BINS = 20
+
+
+def age_band(date_of_birth, today):
+    if date_of_birth is None:
+        return UNKNOWN
+    age = today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+    label = AGE_BANDS[0][1]
+    for lowest, band in AGE_BANDS:
+        if age >= lowest:
+            label = band
+    return label
+
+
+class _Codes(dict):
+    """Dense integer codes for bucket labels, assigned on first sight"""
+
+    def code(self, label):
+        code = self.get(label)
+        if code is None:
+            code = self[label] = len(self)
+        return code
+
+    def labels(self):
+        return sorted(self, key=self.get)
+
+
+class _Distribution:
+    """Running totals and a histogram of per-patient adherence for one bucket"""
+
+    def __init__(self):
+        self.patients = 0
+        self.doses = 0
+        self.taken = 0
+        self.rate_sum = 0.0
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+
+    def percentile(self, fraction):
+        """Upper edge (in %) of the histogram bin holding the given fraction of patients"""
+        position = np.searchsorted(np.cumsum(self.histogram), fraction * self.patients)
+        return (int(position) + 1) * 100 / HISTOGRAM_BINS
+
+    def as_row(self, dimension, bucket):
+        return PopulationAdherenceStat(
+            dimension=dimension,
+            bucket=bucket,
+            patients=self.patients,
+            doses=self.doses,
+            taken=self.taken,
+            adherence_rate=round(self.taken / self.doses * 100, 2),
+            mean_patient_rate=round(self.rate_sum / self.patients * 100, 2),
+            p25=self.percentile(0.25),
+            median=self.percentile(0.5),
+            p75=self.percentile(0.75),
+            histogram=self.histogram.tolist()
+        )
+
+
+class PopulationAdherence:
+    """
+    Adherence distributions by frequency, drug class, age band and week,
+    folded in from chunks of logs that each hold every log of a set of
+    patients. Memory depends on the number of buckets, not of logs.
+    """
+
+    def __init__(self):
+        self.codes = {dimension: _Codes() for dimension in DIMENSIONS}
+        self.distributions = {dimension: {} for dimension in DIMENSIONS}
+        self.logs = 0
+
+    def add_chunk(self, patients, buckets, taken):
+        """
+        Fold one chunk in: `patients` are dense per-chunk patient indexes,
+        `buckets` maps each dimension to the logs' bucket codes, `taken`
+        flags each log as taken (on time or late).
+        """
+        self.logs += len(taken)
+        for dimension, codes in buckets.items():
+            self._fold(dimension, patients, codes, taken)
+
+    def _fold(self, dimension, patients, codes, taken):
+        width = len(self.codes[dimension])
+        cells = patients * width + codes
+
+        # Per (patient, bucket) rates, then their histogram per bucket
+        doses = np.bincount(cells)
+        hits = np.bincount(cells, weights=taken, minlength=len(doses))
+        present = np.flatnonzero(doses)
+        rates = hits[present] / doses[present]
+        bucket = present % width
+        bins = np.minimum((rates * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+
+        histograms = np.bincount(bucket * HISTOGRAM_BINS + bins, minlength=width * HISTOGRAM_BINS)
+        histograms = histograms.reshape(width, HISTOGRAM_BINS)
+        patient_counts = np.bincount(bucket, minlength=width)
+        rate_sums = np.bincount(bucket, weights=rates, minlength=width)
+        dose_counts = np.bincount(codes, minlength=width)
+        taken_counts = np.bincount(codes, weights=taken, minlength=width)
+
+        labels = self.codes[dimension].labels()
+        distributions = self.distributions[dimension]
+        for code in np.flatnonzero(patient_counts).tolist():
+            distribution = distributions.get(labels[code])
+            if distribution is None:
+                distribution = distributions[labels[code]] = _Distribution()
+            distribution.patients += int(patient_counts[code])
+            distribution.doses += int(dose_counts[code])
+            distribution.taken += int(taken_counts[code])
+            distribution.rate_sum += float(rate_sums[code])
+            distribution.histogram += histograms[code]
+
+    def rows(self):
+        return [
+            distribution.as_row(dimension, bucket)
+            for dimension in DIMENSIONS
+            for bucket, distribution in sorted(self.distributions[dimension].items())
+        ]
+
+
+def _patient_batches(batch_size):
+    patient_ids = PatientMedication.objects.values_list('patient_id', flat=True).distinct().order_by('patient_id')
+    batch = []
+    for patient_id in patient_ids.iterator(chunk_size=batch_size):
+        batch.append(patient_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _read_chunk(report, patient_ids, start, end, today):
+    """Column arrays of every counted log of `patient_ids` in [start, end)"""
+    codes = report.codes
+    ages = {
+        patient_id: codes['age_band'].code(age_band(date_of_birth, today))
+        for patient_id, date_of_birth in CustomUser.objects.filter(
+            pk__in=patient_ids
+        ).values_list('pk', 'date_of_birth')
+    }
+    medications = {}
+    for medication_id, patient_id, frequency, name in PatientMedication.objects.filter(
+        patient_id__in=patient_ids
+    ).values_list('medication_id', 'patient_id', 'frequency', 'name'):
+        drug_class = classification_index.classify(name)[1] or UNKNOWN
+        medications[medication_id] = (
+            patient_id,
+            codes['frequency'].code(frequency),
+            codes['drug_class'].code(drug_class),
+            ages[patient_id],
+        )
+
+    logs = MedicationLog.objects.filter(
+        medication__patient_id__in=patient_ids,
+        scheduled_time__gte=start,
+        scheduled_time__lt=end,
+        status__in=ROLLUP_STATUSES
+    ).annotate(week=TruncWeek('scheduled_time')).values_list('medication_id', 'status', 'week').order_by()
+
+    patients, frequencies, drug_classes, age_bands, weeks, taken = ([] for _ in range(6))
+    week_codes = codes['week']
+    for medication_id, status, week in logs.iterator(chunk_size=10000):
+        patient_id, frequency, drug_class, band = medications[medication_id]
+        patients.append(patient_id)
+        frequencies.append(frequency)
+        drug_classes.append(drug_class)
+        age_bands.append(band)
+        weeks.append(week_codes.code(week.date().isoformat()))
+        taken.append(status in TAKEN_STATUSES)
+
+    # Dense patient indexes keep the per-patient bincounts small
+    _, patient_index = np.unique(np.array(patients, dtype=np.int64), return_inverse=True)
+    return patient_index, {
+        'frequency': np.array(frequencies, dtype=np.int64),
+        'drug_class': np.array(drug_classes, dtype=np.int64),
+        'age_band': np.array(age_bands, dtype=np.int64),
+        'week': np.array(weeks, dtype=np.int64),
+    }, np.array(taken, dtype=np.float64)
+
+
+def compute_population_adherence(days=90, batch_size=1000, now=None, progress=None):
+    """
+    Rebuild the PopulationAdherenceStat cache from the logs of the last
+    `days`, reading the logs of `batch_size` patients at a time.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    start = now - timedelta(days=days)
+    report = PopulationAdherence()
+
+    for patient_ids in _patient_batches(batch_size):
+        patients, buckets, taken = _read_chunk(report, patient_ids, start, now, today)
+        if len(taken):
+            report.add_chunk(patients, buckets, taken)
+        if progress:
+            progress(report.logs)
+
+    rows = report.rows()
+    for row in rows:
+        row.window_start = start
+        row.window_end = now
+        row.generated_at = timezone.now()
+    with transaction.atomic():
+        PopulationAdherenceStat.objects.all().delete()
+        PopulationAdherenceStat.objects.bulk_create(rows, batch_size=1000)
+
+    logger.info(f"Population adherence: {report.logs} logs into {len(rows)} buckets")
+    return report.logs, len(rows)
@@ -0,0 +1,140 @@
+# medications/catalogue.py
+
+from bisect import bisect_left
+from collections import Counter
+from itertools import chain
+
+from .indexes import MEDICATION_CATALOGUE, SharedIndex
+from .interactions import normalize_name
+from .models import Medication
+
+SEARCH_FIELDS = ('name', 'generic_name', 'brand_name')
+RESULT_FIELDS = ('medication_id', 'name', 'generic_name', 'brand_name', 'strength', 'dosage_form')
+
+# Same cut-off as pg_trgm's default similarity threshold
+MIN_SIMILARITY = 0.3
+# Bounds the work for one- or two-letter queries on a large catalogue
+MAX_PREFIX_TERMS = 1000
+# Terms (per requested result) ranked by shared trigrams before scoring
+FUZZY_CANDIDATES = 20
+COMMON_TRIGRAM_SHARE = 0.01
+
+
+def trigrams(term):
+    """Trigrams of a term padded the way pg_trgm does ('  ab ' -> '  a', ' ab', 'ab ')"""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _terms(value):
+    """The whole normalized value plus each of its words"""
+    value = normalize_name(value)
+    terms = {value}
+    terms.update(value.split())
+    return terms
+
+
+class CatalogueIndex(SharedIndex):
+    """
+    Process-local autocomplete index over the Medication catalogue.
+
+    Every name, generic name and brand name (and each word in them) is a
+    term. Terms are kept in a sorted array for prefix matches by binary
+    search, and in a trigram postings map for typo-tolerant matches. Like
+    the interaction index it is built lazily and reloaded once the shared
+    catalogue generation moves (see medications/indexes.py).
+    """
+
+    generation = MEDICATION_CATALOGUE
+
+    def _load(self):
+        entries = []
+        term_entries = {}
+        rows = Medication.objects.order_by('name', 'pk').values_list(*RESULT_FIELDS)
+        for row in rows.iterator(chunk_size=2000):
+            entry_id = len(entries)
+            entry = dict(zip(RESULT_FIELDS, row))
+            entries.append(entry)
+            for field in SEARCH_FIELDS:
+                if entry[field]:
+                    for term in _terms(entry[field]):
+                        term_entries.setdefault(term, set()).add(entry_id)
+
+        terms = sorted(term_entries)
+        postings = {}
+        trigram_counts = []
+        for term_id, term in enumerate(terms):
+            grams = trigrams(term)
+            trigram_counts.append(len(grams))
+            # Multi-word values are found through their words
+            if ' ' in term:
+                continue
+            for gram in grams:
+                postings.setdefault(gram, []).append(term_id)
+
+        return {
+            'entries': entries,
+            'terms': terms,
+            'term_entries': [tuple(sorted(term_entries[term])) for term in terms],
+            'trigram_counts': trigram_counts,
+            'postings': postings,
+        }
+
+    def _prefix_matches(self, index, query, scores):
+        terms = index['terms']
+        start = bisect_left(terms, query)
+        for position in range(start, min(start + MAX_PREFIX_TERMS, len(terms))):
+            term = terms[position]
+            if not term.startswith(query):
+                break
+            # Exact terms rank above longer completions
+            score = 2.0 if term == query else 1.0 + len(query) / len(term)
+            for entry_id in index['term_entries'][position]:
+                if score > scores.get(entry_id, 0):
+                    scores[entry_id] = score
+
+    def _fuzzy_matches(self, index, query, scores, limit):
+        grams = trigrams(query)
+        postings = index['postings']
+        terms = index['terms']
+
+        # Trigrams shared by a large slice of the catalogue (a word's first
+        # letter, common suffixes) barely rank anything, so candidates are
+        # ranked on the rarer ones and scored exactly afterwards
+        candidates = limit * FUZZY_CANDIDATES
+        common_cutoff = max(len(terms) * COMMON_TRIGRAM_SHARE, candidates)
+        rare = [gram for gram in grams if 0 < len(postings.get(gram, ())) <= common_cutoff] or grams
+        shared = Counter(chain.from_iterable(postings.get(gram, ()) for gram in rare))
+
+        counts = index['trigram_counts']
+        for term_id, _ in shared.most_common(candidates):
+            common = len(grams.intersection(trigrams(terms[term_id])))
+            similarity = common / (len(grams) + counts[term_id] - common)
+            if similarity < MIN_SIMILARITY:
+                continue
+            for entry_id in index['term_entries'][term_id]:
+                if similarity > scores.get(entry_id, 0):
+                    scores[entry_id] = similarity
+
+    def search(self, query, limit=10):
+        """
+        Best catalogue entries for a partial or misspelled name. Prefix
+        matches rank above fuzzy ones; fuzzy matching only runs when
+        prefixes alone don't fill `limit`.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+
+        index = self.get_index()
+        scores = {}
+        self._prefix_matches(index, query, scores)
+        if len(scores) < limit and len(query) >= 3:
+            self._fuzzy_matches(index, query, scores, limit)
+
+        entries = index['entries']
+        ranked = sorted(scores, key=lambda entry_id: (-scores[entry_id], entry_id))
+        return [entries[entry_id] for entry_id in ranked[:limit]]
+
+
+catalogue_index = CatalogueIndex()
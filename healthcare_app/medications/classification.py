@@ -0,0 +1,52 @@
+# medications/classification.py
+
+from .indexes import MEDICATION_CATALOGUE, SharedIndex
+from .interactions import normalize_name
+from .models import Medication
+
+# Levels of the ATC hierarchy: group, subgroups and substance
+ATC_PREFIX_LENGTHS = (1, 3, 4, 5, 7)
+
+UNCLASSIFIED = ('', '', frozenset())
+
+
+def atc_prefixes(atc_code):
+    """Every level of an ATC code, e.g. J01CA04 -> J, J01, J01C, J01CA, J01CA04"""
+    code = (atc_code or '').strip().upper()
+    return frozenset(code[:length] for length in ATC_PREFIX_LENGTHS if len(code) >= length)
+
+
+class ClassificationIndex(SharedIndex):
+    """
+    Process-local map from every name, generic name and brand name in the
+    Medication catalogue (normalized) to the medication's normalized
+    generic name, drug class and ATC levels.
+
+    Loaded lazily and reloaded once the shared catalogue generation moves,
+    which Medication saves, deletes and imports bump (see medications/indexes.py).
+    """
+
+    generation = MEDICATION_CATALOGUE
+
+    def _load(self):
+        index = {}
+        rows = Medication.objects.values_list(
+            'name', 'generic_name', 'brand_name', 'drug_class', 'atc_code'
+        ).order_by('pk')
+        for name, generic_name, brand_name, drug_class, atc_code in rows.iterator(chunk_size=5000):
+            classification = (
+                normalize_name(generic_name or ''),
+                normalize_name(drug_class or ''),
+                atc_prefixes(atc_code),
+            )
+            for alias in (name, generic_name, brand_name):
+                if alias:
+                    index.setdefault(normalize_name(alias), classification)
+        return index
+
+    def classify(self, medication):
+        """(generic name, drug class, ATC levels) of a medication name; blanks when not in the catalogue"""
+        return self.get_index().get(normalize_name(medication), UNCLASSIFIED)
+
+
+classification_index = ClassificationIndex()
@@ -0,0 +1,71 @@
+# medications/contraindications.py
+
+from .allergies import SEPARATORS
+from .classification import classification_index
+from .indexes import CONTRAINDICATIONS, SharedIndex
+from .interactions import normalize_name
+from .models import Contraindication, DrugInteraction
+
+# Least to most severe, as listed in the choices
+SEVERITY_RANK = {severity: rank for rank, (severity, _) in enumerate(DrugInteraction.SEVERITY_CHOICES)}
+
+
+def split_conditions(conditions):
+    """Normalized entries of a comma-separated conditions field"""
+    return sorted({normalize_name(condition) for condition in SEPARATORS.split(conditions or '') if condition.strip()})
+
+
+class ContraindicationIndex(SharedIndex):
+    """
+    Process-local contraindication matrix: for each drug class and each
+    ATC prefix, the Contraindication rows keyed by normalized condition.
+
+    A regimen is checked in one pass: each medication's class and ATC
+    levels select rows of the matrix, which are intersected with the
+    patient's conditions. Loaded lazily and reloaded once a
+    Contraindication save or delete in any process bumps its shared
+    generation (see medications/indexes.py).
+    """
+
+    generation = CONTRAINDICATIONS
+
+    def _load(self):
+        by_class = {}
+        by_atc = {}
+        for contraindication in Contraindication.objects.order_by('pk').iterator():
+            condition = normalize_name(contraindication.condition)
+            if contraindication.drug_class:
+                by_class.setdefault(normalize_name(contraindication.drug_class), {})[condition] = contraindication
+            if contraindication.atc_prefix:
+                by_atc.setdefault(contraindication.atc_prefix.strip().upper(), {})[condition] = contraindication
+        return by_class, by_atc
+
+    def find_contraindications(self, medications, conditions):
+        """
+        (medication, condition, contraindication) for every medication in
+        a regimen contraindicated by one of `conditions`, keeping the most
+        severe row when its class and ATC levels both match.
+        """
+        conditions = {normalize_name(condition) for condition in conditions}
+        if not conditions:
+            return []
+
+        by_class, by_atc = self.get_index()
+        found = []
+        for medication in medications:
+            _, drug_class, atc = classification_index.classify(medication)
+            rows = [by_class.get(drug_class, {})] + [by_atc[prefix] for prefix in atc if prefix in by_atc]
+
+            matched = {}
+            for row in rows:
+                for condition in row.keys() & conditions:
+                    contraindication = row[condition]
+                    current = matched.get(condition)
+                    if current is None or SEVERITY_RANK[contraindication.severity] > SEVERITY_RANK[current.severity]:
+                        matched[condition] = contraindication
+            for condition in sorted(matched):
+                found.append((medication, condition, matched[condition]))
+        return found
+
+
+contraindication_index = ContraindicationIndex()
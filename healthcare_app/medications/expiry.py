@@ -0,0 +1,74 @@
+# medications/expiry.py
+
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MedicationReminder, PatientMedication, Prescription
+from .regimens import sync_active_medication_names
+from .summaries import refresh_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def expire_medications(now=None):
+    """
+    Deactivate every medication past its end date, the reminders of all
+    inactive medications, and prescriptions past their expiry date, with
+    one set-based UPDATE each.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+
+    with transaction.atomic():
+        medications = PatientMedication.objects.filter(
+            is_active=True, end_date__lt=today
+        ).update(
+            is_active=False,
+            reason_for_discontinuation='Expired',
+            updated_at=now
+        )
+        if medications:
+            # The UPDATE skips the signals that re-post the patients' active
+            # names and refresh their panel summaries
+            transaction.on_commit(partial(refresh_expired_patients, now))
+
+        # Also catches reminders left on by single saves of expired medications
+        reminders = MedicationReminder.objects.filter(
+            is_active=True, medication__is_active=False
+        ).update(
+            is_active=False,
+            next_trigger=None,
+            updated_at=now
+        )
+
+        prescriptions = Prescription.objects.filter(
+            status='active', expiry_date__lt=now
+        ).update(
+            status='expired',
+            updated_at=now
+        )
+
+    logger.info(
+        f"Expired {medications} medications, {reminders} reminders and {prescriptions} prescriptions"
+    )
+    return {'medications': medications, 'reminders': reminders, 'prescriptions': prescriptions}
+
+
+def refresh_expired_patients(expired_at, batch_size=1000):
+    """
+    Re-post the names and refresh the panel summaries of the patients whose
+    medications a sweep at `expired_at` deactivated.
+    """
+    patient_ids = list(PatientMedication.objects.filter(
+        is_active=False, reason_for_discontinuation='Expired', updated_at=expired_at
+    ).values_list('patient_id', flat=True).distinct().order_by('patient_id'))
+    for i in range(0, len(patient_ids), batch_size):
+        batch = patient_ids[i:i + batch_size]
+        sync_active_medication_names(batch)
+        try:
+            refresh_summaries(batch)
+        except Exception as e:
+            logger.error(f"Error refreshing the summaries of expired patients {batch[0]}-{batch[-1]}: {str(e)}")
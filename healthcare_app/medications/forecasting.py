@@ -0,0 +1,123 @@
+# medications/forecasting.py
+
+import numpy as np
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import PatientMedication
+
+# Doses per day for each PatientMedication.FREQUENCY_CHOICES value. As-needed
+# medications have no schedule to project from.
+DOSES_PER_DAY = {
+    'once_daily': 1,
+    'twice_daily': 2,
+    'thrice_daily': 3,
+    'four_times_daily': 4,
+    'weekly': 1 / 7,
+    'monthly': 1 / 30,
+    'as_needed': 0,
+}
+
+REPORT_FIELDS = (
+    'medication_id', 'patient_id', 'name', 'pharmacy', 'frequency',
+    'remaining_quantity', 'refills_remaining', 'needs_prescription', 'run_out_date', 'days_left',
+)
+
+_FREQUENCIES = list(DOSES_PER_DAY)
+_RATES = np.array([DOSES_PER_DAY[frequency] for frequency in _FREQUENCIES], dtype=np.float64)
+_CODES = {frequency: code for code, frequency in enumerate(_FREQUENCIES)}
+
+
+def load_supply(queryset, chunk_size=10000):
+    """
+    Column arrays for the forecastable medications in `queryset`: active,
+    with a known remaining quantity and a scheduled frequency.
+    """
+    rows = queryset.filter(
+        is_active=True, remaining_quantity__isnull=False
+    ).exclude(frequency='as_needed').annotate(
+        as_of=TruncDate('quantity_updated_at')
+    ).values_list(
+        'medication_id', 'patient_id', 'name', 'pharmacy', 'frequency',
+        'remaining_quantity', 'refills_remaining', 'as_of', 'end_date'
+    )
+
+    columns = tuple([] for _ in range(9))
+    for row in rows.iterator(chunk_size=chunk_size):
+        for column, value in zip(columns, row):
+            column.append(value)
+    ids, patients, names, pharmacies, frequencies, remaining, refills, as_of, end_dates = columns
+
+    return {
+        'medication_id': ids,
+        'patient_id': patients,
+        'name': names,
+        'pharmacy': pharmacies,
+        'frequency': frequencies,
+        'frequency_code': np.array([_CODES.get(f, _CODES['as_needed']) for f in frequencies], dtype=np.int8),
+        'remaining_quantity': np.array(remaining, dtype=np.float64),
+        'refills_remaining': np.array(refills, dtype=np.int64),
+        'as_of': np.array(as_of, dtype='datetime64[D]'),
+        'end_date': np.array(end_dates, dtype='datetime64[D]'),
+    }
+
+
+def forecast_run_out(supply):
+    """
+    Projected run-out date of every medication in `supply`, in one pass.
+
+    The remaining quantity is taken as of when it was last set (not the
+    row's last edit) and is consumed at one unit per scheduled dose. Medications that end before
+    they would run out get NaT.
+    """
+    rates = _RATES[supply['frequency_code']]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_left = np.floor(supply['remaining_quantity'] / rates)
+    forecastable = np.isfinite(days_left)
+
+    run_out = np.full(days_left.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+    run_out[forecastable] = supply['as_of'][forecastable] + days_left[forecastable].astype('timedelta64[D]')
+
+    ends_first = ~np.isnat(supply['end_date']) & (supply['end_date'] < run_out)
+    run_out[ends_first] = np.datetime64('NaT')
+    return run_out
+
+
+def refills_due(queryset, within_days=7, today=None):
+    """
+    Medications in `queryset` projected to run out within `within_days`
+    of `today` (including those already out), soonest first. On the same
+    day, those with no refills left come first: they need a new
+    prescription, not just a pharmacy refill.
+    """
+    today = np.datetime64(today or timezone.localdate(), 'D')
+    supply = load_supply(queryset)
+    if not supply['medication_id']:
+        return []
+
+    run_out = forecast_run_out(supply)
+    due = np.flatnonzero(~np.isnat(run_out) & (run_out <= today + np.timedelta64(within_days, 'D')))
+    needs_prescription = supply['refills_remaining'] == 0
+    due = due[np.lexsort((~needs_prescription[due], run_out[due]))]
+
+    days_left = (run_out[due] - today).astype(np.int64)
+    return [
+        {
+            'medication_id': supply['medication_id'][i],
+            'patient_id': supply['patient_id'][i],
+            'name': supply['name'][i],
+            'pharmacy': supply['pharmacy'][i],
+            'frequency': supply['frequency'][i],
+            'remaining_quantity': int(supply['remaining_quantity'][i]),
+            'refills_remaining': int(supply['refills_remaining'][i]),
+            'needs_prescription': bool(needs_prescription[i]),
+            'run_out_date': run_out[i].item(),
+            'days_left': int(left),
+        }
+        for i, left in zip(due.tolist(), days_left.tolist())
+    ]
+
+
+def all_refills_due(within_days=7, today=None):
+    """refills_due over every patient, for pharmacy reports"""
+    return refills_due(PatientMedication.objects.all(), within_days, today)
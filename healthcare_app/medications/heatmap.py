@@ -0,0 +1,70 @@
+# medications/heatmap.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MedicationLog
+
+# Heatmap columns, in MedicationLog.LOG_STATUS order
+HEATMAP_STATUSES = tuple(status for status, _ in MedicationLog.LOG_STATUS)
+_COLUMNS = {status: column for column, status in enumerate(HEATMAP_STATUSES)}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def day_status_matrix(days, statuses, start, day_count):
+    """
+    (day_count x len(HEATMAP_STATUSES)) counts of the logs whose local
+    `days` and `statuses` are given as parallel sequences, binned with a
+    single bincount.
+    """
+    width = len(HEATMAP_STATUSES)
+    # Ordinals and a dict lookup: converting date objects to datetime64 is
+    # far slower than both
+    offsets = np.fromiter((day.toordinal() for day in days), dtype=np.int64, count=len(days)) - start.toordinal()
+    columns = np.fromiter(
+        (_COLUMNS.get(status, -1) for status in statuses), dtype=np.int64, count=len(statuses)
+    )
+
+    keep = (offsets >= 0) & (offsets < day_count) & (columns >= 0)
+    cells = offsets[keep] * width + columns[keep]
+    return np.bincount(cells, minlength=day_count * width).reshape(day_count, width)
+
+
+def adherence_heatmap(logs, start, end):
+    """
+    Daily and monthly dose counts per status of `logs` for the local dates
+    start..end (inclusive), from one query.
+    """
+    day_count = (end - start).days + 1
+    rows = logs.filter(
+        scheduled_time__gte=_day_start(start),
+        scheduled_time__lt=_day_start(end + timedelta(days=1))
+    ).annotate(day=TruncDate('scheduled_time')).values_list('day', 'status').order_by()
+
+    days, statuses = [], []
+    for day, status in rows.iterator(chunk_size=10000):
+        days.append(day)
+        statuses.append(status)
+    matrix = day_status_matrix(days, statuses, start, day_count)
+
+    # Month totals: sum the day rows between month boundaries
+    months = (np.datetime64(start, 'D') + np.arange(day_count)).astype('datetime64[M]')
+    boundaries = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    monthly = np.add.reduceat(matrix, boundaries, axis=0)
+
+    return {
+        'from': start,
+        'to': end,
+        'statuses': list(HEATMAP_STATUSES),
+        'days': {status: matrix[:, i].tolist() for i, status in enumerate(HEATMAP_STATUSES)},
+        'months': {
+            'labels': [str(month) for month in months[boundaries]],
+            **{status: monthly[:, i].tolist() for i, status in enumerate(HEATMAP_STATUSES)}
+        },
+    }
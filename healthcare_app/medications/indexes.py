@@ -0,0 +1,100 @@
+# medications/indexes.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import IndexGeneration
+
+# Generations of the process-local indexes; the catalogue and the drug
+# classification are both built from Medication rows, so they share one
+MEDICATION_CATALOGUE = 'medication_catalogue'
+DRUG_INTERACTIONS = 'drug_interactions'
+ALLERGEN_GROUPS = 'allergen_groups'
+CONTRAINDICATIONS = 'contraindications'
+
+
+def current_generation(name):
+    """Stored generation of an index, 0 before its first write"""
+    return IndexGeneration.objects.filter(name=name).values_list('generation', flat=True).first() or 0
+
+
+def bump_generation(name):
+    """
+    Mark an index stale in every process. Runs in the caller's transaction,
+    so other processes see the bump together with the rows it covers.
+    """
+    if IndexGeneration.objects.filter(name=name).update(generation=F('generation') + 1):
+        return
+    try:
+        with transaction.atomic():
+            IndexGeneration.objects.create(name=name, generation=1)
+    except IntegrityError:
+        # Created concurrently by another writer
+        IndexGeneration.objects.filter(name=name).update(generation=F('generation') + 1)
+
+
+class SharedIndex:
+    """
+    Base of the process-local medication indexes.
+
+    An index is loaded lazily and served from memory. Once it has been
+    served for INDEX_CHECK_INTERVAL seconds, the next lookup re-reads its
+    version (the shared generation by default) and reloads the index if
+    another process has written since. Writes in this process also call
+    invalidate() directly, so they are seen at once here.
+    """
+
+    generation = None
+
+    def __init__(self):
+        self._index = None
+        self._version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        raise NotImplementedError
+
+    def current_version(self):
+        return current_generation(self.generation)
+
+    @property
+    def version(self):
+        """Version the loaded index was built at, None when cold"""
+        return self._version
+
+    def _reload(self, version):
+        # The version is read before the rows, so a write in between only
+        # causes one more reload later
+        self._index = self._load()
+        self._version = version
+        self._checked = time.monotonic()
+
+    def get_index(self):
+        index = self._index
+        if index is not None and time.monotonic() - self._checked < settings.INDEX_CHECK_INTERVAL:
+            return index
+        with self._lock:
+            if self._index is None or time.monotonic() - self._checked >= settings.INDEX_CHECK_INTERVAL:
+                version = self.current_version()
+                if self._index is None or version != self._version:
+                    self._reload(version)
+                else:
+                    self._checked = time.monotonic()
+            return self._index
+
+    def ensure_version(self, version):
+        """Reload unless the index was built at `version`; returns the index"""
+        with self._lock:
+            if self._index is None or version != self._version:
+                self._reload(version)
+            return self._index
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+            self._version = None
@@ -0,0 +1,71 @@
+# medications/interactions.py
+
+from .indexes import DRUG_INTERACTIONS, SharedIndex, current_generation
+from .models import DrugInteraction
+
+
+def normalize_name(name):
+    """Normalize a medication name for case/whitespace-insensitive matching"""
+    return ' '.join(str(name).split()).casefold()
+
+
+def pair_key(medication_1, medication_2):
+    """Order-independent key for a pair of medication names"""
+    a, b = normalize_name(medication_1), normalize_name(medication_2)
+    return (a, b) if a <= b else (b, a)
+
+
+def interaction_db_version():
+    """
+    Identifies the current contents of the DrugInteraction table: the
+    shared generation, which every write path bumps (the signals for
+    single saves and deletes, load_interactions for bulk writes).
+    """
+    return current_generation(DRUG_INTERACTIONS)
+
+
+class InteractionIndex(SharedIndex):
+    """
+    Process-local hash map of DrugInteraction rows keyed by normalized,
+    ordered name pairs.
+
+    The index is loaded lazily on first use and dropped whenever a
+    DrugInteraction is saved or deleted in this process (see
+    medications/signals.py). Other worker processes notice the change
+    within INDEX_CHECK_INTERVAL, when their copy's version no longer
+    matches the shared generation (see medications/indexes.py).
+    """
+
+    generation = DRUG_INTERACTIONS
+
+    def _load(self):
+        index = {}
+        # Ordered by pk so duplicate pairs resolve the same way .first() did
+        for interaction in DrugInteraction.objects.order_by('pk').iterator():
+            key = pair_key(interaction.medication_1, interaction.medication_2)
+            index.setdefault(key, interaction)
+        return index
+
+    def lookup(self, medication_1, medication_2):
+        """Return the DrugInteraction for a pair of names, or None"""
+        return self.get_index().get(pair_key(medication_1, medication_2))
+
+    def find_interactions(self, medications, index=None):
+        """
+        Return (medication_1, medication_2, interaction) for every
+        interacting pair in a regimen, in the order the names were given.
+        `index` pins a copy returned by ensure_version().
+        """
+        index = self.get_index() if index is None else index
+        normalized = [normalize_name(med) for med in medications]
+        found = []
+        for i in range(len(medications)):
+            for j in range(i + 1, len(medications)):
+                a, b = normalized[i], normalized[j]
+                interaction = index.get((a, b) if a <= b else (b, a))
+                if interaction:
+                    found.append((medications[i], medications[j], interaction))
+        return found
+
+
+interaction_index = InteractionIndex()
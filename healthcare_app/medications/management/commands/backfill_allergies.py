@@ -0,0 +1,24 @@
+# medications/management/commands/backfill_allergies.py
+
+from django.core.management.base import BaseCommand
+
+from medications.allergies import backfill_patient_allergies
+
+
+class Command(BaseCommand):
+    help = 'Parse the allergies of existing patient and health profiles into normalized allergy entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Profiles rewritten per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        counts = backfill_patient_allergies(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {counts['patient_profile']} allergy entries from patient profiles "
+            f"and {counts['health_profile']} from health profiles"
+        ))
@@ -0,0 +1,21 @@
+# medications/management/commands/backfill_medication_names.py
+
+from django.core.management.base import BaseCommand
+
+from medications.regimens import backfill_active_medication_names
+
+
+class Command(BaseCommand):
+    help = 'Post the active medications of existing patients to the name index used by interaction rescans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Patients synced per transaction (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        synced = backfill_active_medication_names(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Synced the medication names of {synced} patients"))
@@ -0,0 +1,35 @@
+# medications/management/commands/compute_population_adherence.py
+
+from django.core.management.base import BaseCommand
+
+from medications.analytics import compute_population_adherence
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the platform-wide adherence distributions served to admins (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='Days of logs covered (default: 90)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Patients whose logs are read per chunk (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        def progress(logs):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{logs} logs read")
+
+        logs, buckets = compute_population_adherence(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f"Folded {logs} logs into {buckets} adherence buckets"))
@@ -0,0 +1,40 @@
+# medications/management/commands/detect_missed_doses.py
+
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from medications.missed_doses import run_missed_dose_detection
+
+
+class Command(BaseCommand):
+    help = 'Log reminder slots that passed without a dose as missed, partitioned by patient across processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: number of CPUs; 1 runs in-process)'
+        )
+        parser.add_argument(
+            '--lookback',
+            type=int,
+            default=48,
+            help='Hours of past slots to check (default: 48)'
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=120,
+            help='Minutes either side of a slot in which a log counts for it (default: 120)'
+        )
+
+    def handle(self, *args, **options):
+        missed = run_missed_dose_detection(
+            workers=options['workers'],
+            lookback=timedelta(hours=options['lookback']),
+            window=timedelta(minutes=options['window'])
+        )
+        self.stdout.write(self.style.SUCCESS(f'Logged {missed} missed doses'))
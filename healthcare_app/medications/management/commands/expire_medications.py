@@ -0,0 +1,16 @@
+# medications/management/commands/expire_medications.py
+
+from django.core.management.base import BaseCommand
+
+from medications.expiry import expire_medications
+
+
+class Command(BaseCommand):
+    help = 'Deactivate expired medications and their reminders, and expire lapsed prescriptions (run nightly)'
+
+    def handle(self, *args, **options):
+        counts = expire_medications()
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {counts['medications']} medications, {counts['reminders']} reminders "
+            f"and {counts['prescriptions']} prescriptions"
+        ))
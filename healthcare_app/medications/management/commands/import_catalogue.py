@@ -0,0 +1,213 @@
+# medications/management/commands/import_catalogue.py
+
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from medications.indexes import MEDICATION_CATALOGUE, bump_generation
+from medications.interactions import normalize_name
+from medications.management.readers import input_format_for, read_rows
+from medications.models import Medication
+
+KEY_FIELDS = ('name', 'strength', 'dosage_form')
+TEXT_FIELDS = ('generic_name', 'brand_name', 'drug_class', 'atc_code', 'pregnancy_category')
+FLAG_FIELDS = ('controlled_substance', 'requires_prescription')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def natural_key(name, strength, dosage_form):
+    """Case/whitespace-insensitive (name, strength, dosage_form) key"""
+    return (normalize_name(name), normalize_name(strength), normalize_name(dosage_form))
+
+
+class Command(BaseCommand):
+    help = 'Upsert the Medication catalogue from a CSV or JSON lines file, in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON lines file ('-' for stdin)")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (default: from the file extension, csv otherwise)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows diffed and written per transaction (default: 2000)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress; an interrupted run resumes from it'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and import from the first row'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        chunk_size = options['chunk_size']
+        checkpoint_path = options['checkpoint']
+        if checkpoint_path and path == '-':
+            raise CommandError('--checkpoint needs a file, not stdin')
+
+        source = self.describe_source(path)
+        done = 0
+        if checkpoint_path and not options['restart']:
+            done = self.read_checkpoint(checkpoint_path, source)
+            if done:
+                self.stdout.write(f'Resuming after row {done}')
+
+        # Natural key -> pk for the whole catalogue; row contents are only
+        # fetched chunk by chunk for the keys that chunk touches
+        self.existing = {
+            natural_key(*key): pk
+            for pk, *key in Medication.objects.values_list('pk', *KEY_FIELDS).iterator(chunk_size=chunk_size)
+        }
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0}
+        started = time.monotonic()
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+        try:
+            rows = read_rows(stream, input_format_for(path, options['format']), required=KEY_FIELDS)
+            rows = islice(rows, done, None)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk)
+                done += len(chunk)
+                if checkpoint_path:
+                    self.write_checkpoint(checkpoint_path, source, done)
+
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"Imported {done} rows ({self.counts['created']} created, "
+                    f"{self.counts['updated']} updated, {elapsed:.1f}s)"
+                )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.counts['created']} created, {self.counts['updated']} updated, "
+            f"{self.counts['unchanged']} unchanged, {self.counts['invalid']} invalid"
+        ))
+
+    def describe_source(self, path):
+        if path == '-':
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def read_checkpoint(self, checkpoint_path, source):
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except ValueError:
+            raise CommandError(f'Unreadable checkpoint {checkpoint_path}; use --restart')
+
+        if checkpoint.get('source') != source:
+            raise CommandError(
+                f'Checkpoint {checkpoint_path} belongs to a different or changed file; use --restart'
+            )
+        return checkpoint.get('rows', 0)
+
+    def write_checkpoint(self, checkpoint_path, source, rows):
+        # Written after each committed chunk and swapped in atomically
+        temporary = f'{checkpoint_path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'source': source, 'rows': rows}, f)
+        os.replace(temporary, checkpoint_path)
+
+    def clean(self, row):
+        """Incoming field values, limited to the columns the row provides"""
+        values = {field: ' '.join(str(row.get(field) or '').split()) for field in KEY_FIELDS}
+        if not all(values.values()):
+            return None
+
+        for field in TEXT_FIELDS:
+            if field in row:
+                values[field] = ' '.join(str(row[field] or '').split()) or None
+        for field in FLAG_FIELDS:
+            if field in row and str(row[field]).strip() != '':
+                flag = row[field]
+                values[field] = flag if isinstance(flag, bool) else str(flag).strip().lower() in TRUE_VALUES
+        if values.get('atc_code'):
+            values['atc_code'] = values['atc_code'].upper()
+
+        for field, value in values.items():
+            max_length = Medication._meta.get_field(field).max_length
+            if max_length and isinstance(value, str) and len(value) > max_length:
+                return None
+        return values
+
+    def import_chunk(self, chunk):
+        incoming = {}
+        for line_number, row in chunk:
+            values = self.clean(row)
+            if values is None:
+                self.counts['invalid'] += 1
+                if self.counts['invalid'] <= 10:
+                    self.stderr.write(f'Skipping invalid row at line {line_number}')
+                continue
+            # Later rows for the same key win
+            key = natural_key(*(values[field] for field in KEY_FIELDS))
+            incoming[key] = values
+
+        pks = [self.existing[key] for key in incoming if key in self.existing]
+        stored = Medication.objects.in_bulk(pks)
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        changed_fields = set()
+        for key, values in incoming.items():
+            medication = stored.get(self.existing.get(key))
+            if medication is None:
+                to_create.append(Medication(**values))
+                continue
+
+            changed = [field for field, value in values.items() if getattr(medication, field) != value]
+            if not changed:
+                self.counts['unchanged'] += 1
+                continue
+            for field in changed:
+                setattr(medication, field, values[field])
+            medication.updated_at = now
+            changed_fields.update(changed)
+            to_update.append(medication)
+
+        # One short transaction per chunk keeps write locks brief
+        with transaction.atomic():
+            Medication.objects.bulk_create(to_create, batch_size=1000)
+            if to_update:
+                Medication.objects.bulk_update(to_update, sorted(changed_fields) + ['updated_at'], batch_size=1000)
+            if to_create or to_update:
+                # Bulk writes send no signals: mark the catalogue and drug
+                # classification indexes of every process stale with the rows
+                bump_generation(MEDICATION_CATALOGUE)
+
+        for medication in to_create:
+            self.existing[natural_key(medication.name, medication.strength, medication.dosage_form)] = medication.pk
+        self.counts['created'] += len(to_create)
+        self.counts['updated'] += len(to_update)
@@ -0,0 +1,156 @@
+# medications/management/commands/load_interactions.py
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from medications.indexes import DRUG_INTERACTIONS, bump_generation
+from medications.interactions import interaction_index, normalize_name, pair_key
+from medications.management.readers import input_format_for, read_rows
+from medications.models import DrugInteraction
+from medications.regimens import rescan_interactions
+
+SEVERITIES = {value for value, _ in DrugInteraction.SEVERITY_CHOICES}
+DETAIL_FIELDS = ('severity', 'description', 'mechanism', 'recommendation')
+REQUIRED_COLUMNS = ('medication_1', 'medication_2', 'severity', 'description')
+
+
+class Command(BaseCommand):
+    help = 'Bulk load drug interactions from a CSV or JSON lines file, merging with existing pairs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON lines file ('-' for stdin)")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (default: from the file extension, csv otherwise)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows written per transaction (default: 5000)'
+        )
+        parser.add_argument(
+            '--skip-existing',
+            action='store_true',
+            help='Leave pairs that are already in the database untouched'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = input_format_for(path, options['format'])
+        self.batch_size = options['batch_size']
+        self.skip_existing = options['skip_existing']
+
+        # Normalized pair -> pk of every stored interaction. Only keys are
+        # held, so memory follows the knowledge base, not the input file.
+        self.existing = {
+            pair_key(medication_1, medication_2): pk
+            for pk, medication_1, medication_2 in DrugInteraction.objects.values_list(
+                'pk', 'medication_1', 'medication_2'
+            ).iterator(chunk_size=self.batch_size)
+        }
+        self.to_create = {}
+        self.to_update = {}
+        self.changed = set()
+        self.counts = {'read': 0, 'created': 0, 'updated': 0, 'skipped': 0, 'invalid': 0, 'rescanned': 0}
+        self.started = time.monotonic()
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+        try:
+            rows = read_rows(stream, input_format, required=REQUIRED_COLUMNS)
+            for line_number, row in rows:
+                self.counts['read'] += 1
+                self.add(line_number, row)
+                if len(self.to_create) + len(self.to_update) >= self.batch_size:
+                    self.flush()
+            self.flush()
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        # Warn the patients already taking both drugs of a new or changed pair,
+        # once, from a copy of the index that includes every batch
+        if self.changed:
+            interaction_index.invalidate()
+            self.counts['rescanned'] = rescan_interactions(self.changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {time.monotonic() - self.started:.1f}s: {self.counts['created']} created, "
+            f"{self.counts['updated']} updated, {self.counts['skipped']} skipped, "
+            f"{self.counts['invalid']} invalid of {self.counts['read']} rows; "
+            f"{self.counts['rescanned']} patients rescanned"
+        ))
+
+    def clean(self, row):
+        """Ordered, whitespace-normalized names plus details, or None if unusable"""
+        names = [' '.join(str(row.get(field) or '').split()) for field in ('medication_1', 'medication_2')]
+        details = {field: str(row.get(field) or '').strip() for field in DETAIL_FIELDS}
+        details['severity'] = details['severity'].lower()
+
+        if not all(names) or details['severity'] not in SEVERITIES or not details['description']:
+            return None
+        key = pair_key(*names)
+        if key[0] == key[1]:
+            return None
+        if normalize_name(names[0]) != key[0]:
+            names.reverse()
+        return key, names, details
+
+    def add(self, line_number, row):
+        cleaned = self.clean(row)
+        if cleaned is None:
+            self.counts['invalid'] += 1
+            if self.counts['invalid'] <= 10:
+                self.stderr.write(f'Skipping invalid row at line {line_number}')
+            return
+        key, (medication_1, medication_2), details = cleaned
+
+        # Later rows for the same pair win, both within and across batches
+        if key in self.to_create:
+            for field, value in details.items():
+                setattr(self.to_create[key], field, value)
+        elif key in self.existing:
+            if self.skip_existing:
+                self.counts['skipped'] += 1
+                return
+            self.to_update[key] = DrugInteraction(pk=self.existing[key], updated_at=timezone.now(), **details)
+        else:
+            self.to_create[key] = DrugInteraction(
+                medication_1=medication_1,
+                medication_2=medication_2,
+                **details
+            )
+
+    def flush(self):
+        if not self.to_create and not self.to_update:
+            return
+
+        with transaction.atomic():
+            DrugInteraction.objects.bulk_create(self.to_create.values(), batch_size=1000)
+            DrugInteraction.objects.bulk_update(self.to_update.values(), DETAIL_FIELDS + ('updated_at',), batch_size=1000)
+            # bulk_create/bulk_update skip the signals, so mark every
+            # process's interaction index stale with the rows themselves
+            bump_generation(DRUG_INTERACTIONS)
+
+        self.changed |= self.to_create.keys() | self.to_update.keys()
+        for key, interaction in self.to_create.items():
+            self.existing[key] = interaction.pk
+        self.counts['created'] += len(self.to_create)
+        self.counts['updated'] += len(self.to_update)
+        self.to_create = {}
+        self.to_update = {}
+
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(
+            f"Processed {self.counts['read']} rows ({self.counts['read'] / elapsed:.0f} rows/s): "
+            f"{self.counts['created']} created, {self.counts['updated']} updated"
+        )
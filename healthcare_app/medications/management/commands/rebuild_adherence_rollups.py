@@ -0,0 +1,42 @@
+# medications/management/commands/rebuild_adherence_rollups.py
+
+from django.core.management.base import BaseCommand
+
+from medications.models import PatientMedication
+from medications.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily adherence rollups from MedicationLog, a chunk of medications at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Number of medications rebuilt per transaction (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        medications = PatientMedication.objects.order_by('pk').values_list('pk', flat=True)
+
+        last_id = None
+        medication_count = 0
+        rollup_count = 0
+
+        while True:
+            chunk = medications if last_id is None else medications.filter(pk__gt=last_id)
+            medication_ids = list(chunk[:chunk_size])
+            if not medication_ids:
+                break
+
+            rollup_count += rebuild_rollups(medication_ids)
+            medication_count += len(medication_ids)
+            last_id = medication_ids[-1]
+
+            self.stdout.write(f'Rebuilt {medication_count} medications ({rollup_count} daily rollups)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {rollup_count} daily rollups for {medication_count} medications'
+        ))
@@ -0,0 +1,46 @@
+# medications/management/commands/refill_report.py
+
+import csv
+
+from django.core.management.base import BaseCommand
+
+from medications.forecasting import REPORT_FIELDS, all_refills_due
+
+
+class Command(BaseCommand):
+    help = 'Write a CSV of medications projected to run out soon, grouped by pharmacy'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Report medications running out within this many days (default: 7)'
+        )
+        parser.add_argument(
+            '--pharmacy',
+            help='Only include medications filled at this pharmacy'
+        )
+        parser.add_argument(
+            '--output',
+            help='CSV file to write (default: stdout)'
+        )
+
+    def handle(self, *args, **options):
+        due = all_refills_due(within_days=options['days'])
+        if options['pharmacy']:
+            due = [row for row in due if row['pharmacy'] == options['pharmacy']]
+        # Stable sort keeps each pharmacy's rows soonest first
+        due.sort(key=lambda row: row['pharmacy'])
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.DictWriter(output, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(due)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(due)} refills to {options['output']}"))
@@ -0,0 +1,21 @@
+# medications/management/commands/refresh_patient_summaries.py
+
+from django.core.management.base import BaseCommand
+
+from medications.summaries import refresh_all_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every patient panel summary so the 7/30-day windows move forward (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Patients refreshed per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        refreshed = refresh_all_summaries(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} patient summaries"))
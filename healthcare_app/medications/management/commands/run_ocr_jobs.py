@@ -0,0 +1,42 @@
+# medications/management/commands/run_ocr_jobs.py
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from medications.ocr_jobs import ocr_engine_path, work
+
+
+class Command(BaseCommand):
+    help = 'Read uploaded prescription images into draft prescriptions with a pool of OCR processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=2,
+            help='OCR processes; 1 reads images in this process (default: 2)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait before checking an empty queue again (default: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+        self.stdout.write(f"Reading uploads with {ocr_engine_path()} in {options['processes']} processes")
+        try:
+            work(stop, options['processes'], options['poll_interval'], options['once'])
+        except KeyboardInterrupt:
+            stop.set()
+        self.stdout.write(self.style.SUCCESS('OCR worker stopped'))
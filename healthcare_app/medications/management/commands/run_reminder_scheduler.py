@@ -0,0 +1,58 @@
+# medications/management/commands/run_reminder_scheduler.py
+
+import signal
+import sys
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from medications.scheduling import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the medication reminder dispatcher, firing reminders as their next_trigger comes due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=600,
+            help='Seconds of upcoming reminders held in memory (default: 600)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum reminders dispatched per batch (default: 500)'
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=900,
+            help='Seconds after which an overdue reminder is skipped instead of sent (default: 900)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Dispatch everything currently due and exit'
+        )
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            horizon=timedelta(seconds=options['horizon']),
+            batch_size=options['batch_size'],
+            grace=timedelta(seconds=options['grace'])
+        )
+
+        if options['once']:
+            sent = scheduler.run_once()
+            self.stdout.write(self.style.SUCCESS(f'Dispatched {sent} reminders'))
+            return
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.stdout.write('Reminder scheduler started')
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Reminder scheduler stopped')
@@ -0,0 +1,58 @@
+# medications/management/commands/run_safety_scans.py
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from medications.safety import work
+
+
+class Command(BaseCommand):
+    help = 'Run queued prescription safety scans with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Worker threads (default: 4)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds an idle worker waits before checking the queue again (default: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        if not options['once']:
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+        threads = [
+            threading.Thread(
+                target=work,
+                args=(stop, options['poll_interval'], options['once']),
+                name=f'safety-scan-{i}'
+            )
+            for i in range(options['workers'])
+        ]
+        for thread in threads:
+            thread.start()
+
+        self.stdout.write(f"Started {len(threads)} safety scan workers")
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Safety scan workers stopped'))
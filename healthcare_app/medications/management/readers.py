@@ -0,0 +1,38 @@
+# medications/management/readers.py
+
+import csv
+import json
+
+from django.core.management.base import CommandError
+
+
+def input_format_for(path, input_format=None):
+    """Explicit format, else guessed from the extension (csv by default)"""
+    if input_format:
+        return input_format
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, input_format, required=()):
+    """
+    Yield (line_number, row dict) from a CSV or JSON lines stream.
+    Unparseable JSON lines come through as empty dicts so callers can
+    report them with their line number.
+    """
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        missing = set(required) - set(reader.fieldnames or [])
+        if missing:
+            raise CommandError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else {}
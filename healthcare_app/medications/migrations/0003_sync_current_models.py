@@ -0,0 +1,145 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:01
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # The first two migrations predate the move to the current models;
+        # drop their tables and recreate every model as defined today.
+        migrations.DeleteModel(
+            name='MedicationReminder',
+        ),
+        migrations.DeleteModel(
+            name='Medication',
+        ),
+        migrations.CreateModel(
+            name='DrugInteraction',
+            fields=[
+                ('interaction_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('medication_1', models.CharField(max_length=200)),
+                ('medication_2', models.CharField(max_length=200)),
+                ('severity', models.CharField(choices=[('minor', 'Minor'), ('moderate', 'Moderate'), ('major', 'Major'), ('contraindicated', 'Contraindicated')], max_length=20)),
+                ('description', models.TextField()),
+                ('mechanism', models.TextField(blank=True)),
+                ('recommendation', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'drug_interactions',
+            },
+        ),
+        migrations.CreateModel(
+            name='Medication',
+            fields=[
+                ('medication_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('generic_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('brand_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('dosage_form', models.CharField(max_length=100)),
+                ('strength', models.CharField(max_length=100)),
+                ('drug_class', models.CharField(blank=True, max_length=200, null=True)),
+                ('atc_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('pregnancy_category', models.CharField(blank=True, max_length=10, null=True)),
+                ('controlled_substance', models.BooleanField(default=False)),
+                ('requires_prescription', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'medications',
+                'indexes': [models.Index(fields=['name'], name='medications_name_906f5e_idx'), models.Index(fields=['generic_name'], name='medications_generic_f22126_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientMedication',
+            fields=[
+                ('medication_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('dosage', models.CharField(max_length=100)),
+                ('frequency', models.CharField(choices=[('once_daily', 'Once Daily'), ('twice_daily', 'Twice Daily'), ('thrice_daily', 'Three Times Daily'), ('four_times_daily', 'Four Times Daily'), ('as_needed', 'As Needed'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], max_length=20)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('instructions', models.TextField(blank=True)),
+                ('prescribing_doctor', models.CharField(blank=True, max_length=200)),
+                ('pharmacy', models.CharField(blank=True, max_length=200)),
+                ('is_active', models.BooleanField(default=True)),
+                ('reason_for_discontinuation', models.TextField(blank=True)),
+                ('total_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('remaining_quantity', models.PositiveIntegerField(blank=True, null=True)),
+                ('refills_remaining', models.PositiveIntegerField(default=0)),
+                ('safety_checked', models.BooleanField(default=False)),
+                ('safety_warnings', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_medications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicationReminder',
+            fields=[
+                ('reminder_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reminder_time', models.TimeField()),
+                ('days_of_week', models.JSONField(default=list)),
+                ('notification_type', models.CharField(choices=[('push', 'Push Notification'), ('email', 'Email'), ('sms', 'SMS'), ('all', 'All')], default='push', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_triggered', models.DateTimeField(blank=True, null=True)),
+                ('next_trigger', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='medications.patientmedication')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Prescription',
+            fields=[
+                ('prescription_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('issue_date', models.DateTimeField()),
+                ('expiry_date', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='active', max_length=20)),
+                ('diagnosis', models.TextField(blank=True)),
+                ('instructions', models.TextField()),
+                ('notes', models.TextField(blank=True)),
+                ('safety_scan_performed', models.BooleanField(default=False)),
+                ('safety_warnings', models.JSONField(default=list)),
+                ('scan_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('source', models.CharField(choices=[('manual', 'Manual Entry'), ('ocr', 'OCR Scan'), ('electronic', 'Electronic Rx')], default='manual', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prescriptions_written', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prescriptions_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'prescriptions',
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicationLog',
+            fields=[
+                ('log_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('scheduled_time', models.DateTimeField()),
+                ('actual_time', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('taken', 'Taken'), ('missed', 'Missed'), ('skipped', 'Skipped'), ('late', 'Taken Late')], max_length=20)),
+                ('dosage_taken', models.CharField(blank=True, max_length=100)),
+                ('notes', models.TextField(blank=True)),
+                ('confirmation_method', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('confirmed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('reminder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='medications.medicationreminder')),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logs', to='medications.patientmedication')),
+            ],
+            options={
+                'db_table': 'medication_logs',
+                'indexes': [models.Index(fields=['medication', 'scheduled_time'], name='medication__medicat_3d2cd5_idx'), models.Index(fields=['scheduled_time'], name='medication__schedul_7185c1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0003_sync_current_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicationAdherenceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('taken', models.IntegerField(default=0)),
+                ('late', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('skipped', models.IntegerField(default=0)),
+                ('last_taken', models.DateTimeField(blank=True, null=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adherence_rollups', to='medications.patientmedication')),
+            ],
+            options={
+                'db_table': 'medication_adherence_rollups',
+                'constraints': [models.UniqueConstraint(fields=('medication', 'date'), name='unique_adherence_rollup_day')],
+            },
+        ),
+    ]
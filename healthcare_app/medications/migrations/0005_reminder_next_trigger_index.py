@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0004_adherence_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicationreminder',
+            index=models.Index(fields=['is_active', 'next_trigger'], name='medications_is_acti_7663be_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+def backfill_weekday_mask(apps, schema_editor):
+    MedicationReminder = apps.get_model('medications', 'MedicationReminder')
+    batch = []
+    for reminder in MedicationReminder.objects.only('pk', 'days_of_week').iterator(chunk_size=1000):
+        reminder.weekday_mask = sum(1 << day for day in set(reminder.days_of_week or []))
+        batch.append(reminder)
+        if len(batch) >= 1000:
+            MedicationReminder.objects.bulk_update(batch, ['weekday_mask'])
+            batch = []
+    if batch:
+        MedicationReminder.objects.bulk_update(batch, ['weekday_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0005_reminder_next_trigger_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationreminder',
+            name='weekday_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_weekday_mask, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='medicationreminder',
+            index=models.Index(fields=['is_active', 'weekday_mask', 'reminder_time'], name='medications_is_acti_ec3886_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0006_reminder_weekday_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientmedication',
+            index=models.Index(fields=['is_active', 'end_date'], name='medications_is_acti_27a747_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['status', 'expiry_date'], name='prescriptio_status_c112f1_idx'),
+        ),
+    ]
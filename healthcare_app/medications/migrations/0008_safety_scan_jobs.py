@@ -0,0 +1,69 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:32
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0007_expiry_sweep_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SafetyScanJob',
+            fields=[
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('medications', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('scan_key', models.CharField(blank=True, max_length=64)),
+                ('cached', models.BooleanField(default=False)),
+                ('warnings', models.JSONField(default=list)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'safety_scan_jobs',
+            },
+        ),
+        migrations.CreateModel(
+            name='SafetyScanResult',
+            fields=[
+                ('scan_key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('warnings', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'safety_scan_results',
+            },
+        ),
+        migrations.AddField(
+            model_name='druginteraction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='druginteraction',
+            index=models.Index(fields=['updated_at'], name='drug_intera_updated_b64025_idx'),
+        ),
+        migrations.AddField(
+            model_name='safetyscanjob',
+            name='prescription',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='safety_scan_jobs', to='medications.prescription'),
+        ),
+        migrations.AddField(
+            model_name='safetyscanjob',
+            name='requested_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='safetyscanjob',
+            index=models.Index(fields=['status', 'created_at'], name='safety_scan_status_3872c4_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:36
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0008_safety_scan_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prescription',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('active', 'Active'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='active', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PrescriptionUpload',
+            fields=[
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('image', models.FileField(upload_to='prescription_uploads/%Y/%m/%d/')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('engine', models.CharField(blank=True, max_length=50)),
+                ('extracted_text', models.TextField(blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('prescription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='medications.prescription')),
+                ('uploaded_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'prescription_uploads',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='prescriptio_status_cbd1fe_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0009_prescription_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AllergenGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=200)),
+                ('drug_class', models.CharField(blank=True, max_length=200)),
+                ('atc_prefix', models.CharField(blank=True, max_length=20)),
+            ],
+            options={
+                'db_table': 'allergen_groups',
+                'constraints': [models.UniqueConstraint(fields=('token', 'drug_class', 'atc_prefix'), name='unique_allergen_group')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientAllergy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=200)),
+                ('source', models.CharField(choices=[('patient_profile', 'Patient Profile'), ('health_profile', 'Health Profile')], max_length=20)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allergy_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'patient_allergies',
+                'constraints': [models.UniqueConstraint(fields=('patient', 'source', 'token'), name='unique_patient_allergy')],
+            },
+        ),
+    ]
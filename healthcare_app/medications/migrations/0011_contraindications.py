@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0010_allergy_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contraindication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.CharField(max_length=200)),
+                ('drug_class', models.CharField(blank=True, max_length=200)),
+                ('atc_prefix', models.CharField(blank=True, max_length=20)),
+                ('severity', models.CharField(choices=[('minor', 'Minor'), ('moderate', 'Moderate'), ('major', 'Major'), ('contraindicated', 'Contraindicated')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('recommendation', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'contraindications',
+                'constraints': [models.UniqueConstraint(fields=('condition', 'drug_class', 'atc_prefix'), name='unique_contraindication')],
+            },
+        ),
+    ]
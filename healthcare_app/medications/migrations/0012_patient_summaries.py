@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0011_contraindications'),
+        ('users', '0004_care_team'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSummary',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='medication_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('taken_7d', models.IntegerField(default=0)),
+                ('total_7d', models.IntegerField(default=0)),
+                ('adherence_7d', models.FloatField(blank=True, null=True)),
+                ('taken_30d', models.IntegerField(default=0)),
+                ('total_30d', models.IntegerField(default=0)),
+                ('adherence_30d', models.FloatField(blank=True, null=True)),
+                ('active_medications', models.IntegerField(default=0)),
+                ('next_refill_date', models.DateField(blank=True, null=True)),
+                ('interaction_warnings', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'patient_summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0012_patient_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopulationAdherenceStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('frequency', 'Frequency'), ('drug_class', 'Drug class'), ('age_band', 'Age band'), ('week', 'Week')], max_length=20)),
+                ('bucket', models.CharField(max_length=100)),
+                ('patients', models.IntegerField(default=0)),
+                ('doses', models.BigIntegerField(default=0)),
+                ('taken', models.BigIntegerField(default=0)),
+                ('adherence_rate', models.FloatField()),
+                ('mean_patient_rate', models.FloatField()),
+                ('p25', models.FloatField()),
+                ('median', models.FloatField()),
+                ('p75', models.FloatField()),
+                ('histogram', models.JSONField(default=list)),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('generated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'population_adherence_stats',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'bucket'), name='unique_population_adherence_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0013_population_adherence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveMedicationName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active_medication_names', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'active_medication_names',
+                'constraints': [models.UniqueConstraint(fields=('name', 'patient'), name='unique_active_medication_name')],
+            },
+        ),
+    ]
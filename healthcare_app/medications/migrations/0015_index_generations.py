@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0014_active_medication_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexGeneration',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'index_generations',
+            },
+        ),
+    ]
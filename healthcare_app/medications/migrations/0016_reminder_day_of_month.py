@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0015_index_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicationreminder',
+            name='day_of_month',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0016_reminder_day_of_month'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='medicationreminder',
+            name='medications_is_acti_ec3886_idx',
+        ),
+        migrations.AddIndex(
+            model_name='medicationreminder',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['weekday_mask', 'reminder_time'], name='reminder_active_weekday_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicationreminder',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['day_of_month', 'reminder_time'], name='reminder_active_monthday_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0017_reminder_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='medicationreminder',
+            name='medications_is_acti_7663be_idx',
+        ),
+        migrations.AddIndex(
+            model_name='medicationreminder',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_trigger'], name='reminder_active_trigger_idx'),
+        ),
+    ]
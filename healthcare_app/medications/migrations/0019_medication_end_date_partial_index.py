@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0018_reminder_trigger_partial_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='patientmedication',
+            name='medications_is_acti_27a747_idx',
+        ),
+        migrations.AddIndex(
+            model_name='patientmedication',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['end_date'], name='medication_active_end_idx'),
+        ),
+    ]
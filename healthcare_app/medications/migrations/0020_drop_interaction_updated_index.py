@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-17 01:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0019_medication_end_date_partial_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='druginteraction',
+            name='drug_intera_updated_b64025_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-17 02:00
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_quantity_updated_at(apps, schema_editor):
+    # The last edit is the best record there is of when the quantity was set
+    PatientMedication = apps.get_model('medications', 'PatientMedication')
+    PatientMedication.objects.update(quantity_updated_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0020_drop_interaction_updated_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientmedication',
+            name='quantity_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.RunPython(backfill_quantity_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,181 @@
+# medications/missed_doses.py
+
+import logging
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import MedicationLog, MedicationReminder
+from .rollups import record_logs
+from .scheduling import compute_next_trigger
+from .summaries import refresh_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def _day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def scheduled_slots(reminder, start, end):
+    """Every time `reminder` was due in [start, end)"""
+    slots = []
+    when = compute_next_trigger(
+        reminder.reminder_time, reminder.days_of_week, start - timedelta(microseconds=1), reminder.day_of_month
+    )
+    while when is not None and when < end:
+        slots.append(when)
+        when = compute_next_trigger(reminder.reminder_time, reminder.days_of_week, when, reminder.day_of_month)
+    return slots
+
+
+def patient_ranges(count):
+    """Split the ids of patients with active reminders into `count` contiguous ranges"""
+    bounds = MedicationReminder.objects.scheduled().filter(
+        is_active=True, medication__is_active=True
+    ).aggregate(low=Min('medication__patient_id'), high=Max('medication__patient_id'))
+    if bounds['low'] is None:
+        return []
+
+    low, high = bounds['low'], bounds['high'] + 1
+    step = max(-(-(high - low) // count), 1)
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def detect_missed_doses(patient_range, now, lookback, window, chunk_size=500):
+    """
+    Write `missed` logs for the reminder slots of patients in
+    [patient_range) that have no log within `window` of the slot.
+
+    Only slots in the last `lookback` that are at least `window` old are
+    considered. Each log covers at most one slot: the nearest unclaimed
+    one of its reminder, or of any of the medication's reminders when the
+    log has none. `missed` rows from an earlier run claim their own slot,
+    so re-running after a crash never duplicates rows.
+    """
+    low, high = patient_range
+    reminders = MedicationReminder.objects.scheduled().filter(
+        is_active=True,
+        medication__is_active=True,
+        medication__patient_id__gte=low,
+        medication__patient_id__lt=high
+    ).select_related('medication').order_by('medication_id', 'pk')
+
+    end = now - window
+    created = 0
+    chunk = []
+    for reminder in reminders.iterator(chunk_size=chunk_size):
+        # A medication's reminders share its logs, so they stay in one chunk
+        if len(chunk) >= chunk_size and chunk[-1].medication_id != reminder.medication_id:
+            created += _detect_chunk(chunk, now - lookback, end, window)
+            chunk = []
+        chunk.append(reminder)
+    if chunk:
+        created += _detect_chunk(chunk, now - lookback, end, window)
+
+    if created:
+        logger.info(f"Logged {created} missed doses for patients {low}-{high - 1}")
+    return created
+
+
+def _detect_chunk(reminders, start, end, window):
+    slots = {}
+    for reminder in reminders:
+        medication = reminder.medication
+        slot_start = max(start, reminder.created_at, _day_start(medication.start_date))
+        slot_end = end
+        if medication.end_date:
+            slot_end = min(slot_end, _day_start(medication.end_date + timedelta(days=1)))
+        if slot_start < slot_end:
+            slots[reminder] = scheduled_slots(reminder, slot_start, slot_end)
+
+    if not any(slots.values()):
+        return 0
+
+    # Every slot of the chunk per medication, in time order, with the reminder it belongs to
+    due = {}
+    for reminder, reminder_slots in slots.items():
+        due.setdefault(reminder.medication_id, []).extend((slot, reminder) for slot in reminder_slots)
+    times = {}
+    reminder_ids = {}
+    for medication_id, medication_slots in due.items():
+        medication_slots.sort(key=lambda item: (item[0], item[1].pk))
+        times[medication_id] = [slot for slot, _ in medication_slots]
+        reminder_ids[medication_id] = {reminder.pk for _, reminder in medication_slots}
+
+    # Every log near the chunk's slots in one query; logs tied to a reminder claim first
+    existing = MedicationLog.objects.filter(
+        medication_id__in=due,
+        scheduled_time__gte=start - window,
+        scheduled_time__lt=end + window
+    ).values_list('medication_id', 'reminder_id', 'scheduled_time').order_by('scheduled_time', 'pk')
+    logs = sorted(existing.iterator(), key=lambda log: log[1] not in reminder_ids[log[0]])
+
+    claimed = set()
+    for medication_id, reminder_id, scheduled_time in logs:
+        medication_slots = due[medication_id]
+        slot_times = times[medication_id]
+        # A log of one of these reminders only covers that reminder's slots
+        own = reminder_id if reminder_id in reminder_ids[medication_id] else None
+        nearest = None
+        for position in range(bisect_left(slot_times, scheduled_time - window), len(slot_times)):
+            slot, reminder = medication_slots[position]
+            if slot > scheduled_time + window:
+                break
+            if (medication_id, position) in claimed or own not in (None, reminder.pk):
+                continue
+            if nearest is None or abs(slot - scheduled_time) < abs(slot_times[nearest] - scheduled_time):
+                nearest = position
+        if nearest is not None:
+            claimed.add((medication_id, nearest))
+
+    missed = [
+        MedicationLog(
+            medication=reminder.medication,
+            reminder=reminder,
+            scheduled_time=slot,
+            status='missed',
+            confirmation_method='auto'
+        )
+        for medication_id, medication_slots in due.items()
+        for position, (slot, reminder) in enumerate(medication_slots)
+        if (medication_id, position) not in claimed
+    ]
+
+    with transaction.atomic():
+        MedicationLog.objects.bulk_create(missed, batch_size=1000)
+        # bulk_create skips the signals that keep the daily rollups and
+        # the patients' panel summaries current
+        record_logs(missed)
+        refresh_summaries({log.medication.patient_id for log in missed})
+    return len(missed)
+
+
+def _init_worker():
+    django.setup()
+    # Connections inherited from the parent process must not be shared
+    connections.close_all()
+
+
+def run_missed_dose_detection(workers=1, lookback=timedelta(days=2), window=timedelta(hours=2), now=None):
+    """Detect missed doses for all patients, fanning patient id ranges out over `workers` processes"""
+    now = now or timezone.now()
+    # Several ranges per worker even out patients with many reminders
+    ranges = patient_ranges(workers * 4)
+    if workers <= 1 or len(ranges) <= 1:
+        return sum(detect_missed_doses(patient_range, now, lookback, window) for patient_range in ranges)
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(detect_missed_doses, patient_range, now, lookback, window)
+            for patient_range in ranges
+        ]
+        return sum(future.result() for future in futures)
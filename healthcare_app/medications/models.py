@@ -1,6 +1,10 @@
 # medications/models.py
 
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import DEFERRED, Q
+from django.utils import timezone
 from djongo import models as djongo_models
 from users.models import CustomUser
 import uuid
@@ -74,6 +78,8 @@ class PatientMedication(djongo_models.Model):
     total_quantity = djongo_models.PositiveIntegerField(null=True, blank=True)
     remaining_quantity = djongo_models.PositiveIntegerField(null=True, blank=True)
     refills_remaining = djongo_models.PositiveIntegerField(default=0)
+    # When remaining_quantity was last set; refill forecasts count doses from here
+    quantity_updated_at = djongo_models.DateTimeField(default=timezone.now, editable=False)
     
     # AI Safety
     safety_checked = djongo_models.BooleanField(default=False)
@@ -82,14 +88,78 @@ class PatientMedication(djongo_models.Model):
     created_at = djongo_models.DateTimeField(auto_now_add=True)
     updated_at = djongo_models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Nightly expiry sweep; partial because SQLite cannot seek on the
+            # bare boolean term `is_active=True` renders to
+            djongo_models.Index(fields=['end_date'], condition=Q(is_active=True), name='medication_active_end_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.patient.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept so save() can tell a supply change from any other edit
+        instance._loaded_quantity = dict(zip(field_names, values)).get('remaining_quantity', DEFERRED)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        loaded = getattr(self, '_loaded_quantity', DEFERRED)
+        saves_quantity = update_fields is None or 'remaining_quantity' in update_fields
+        if saves_quantity and loaded is not DEFERRED and self.__dict__.get('remaining_quantity', loaded) != loaded:
+            self.quantity_updated_at = timezone.now()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'quantity_updated_at'}
+        super().save(*args, **kwargs)
+        if saves_quantity:
+            self._loaded_quantity = self.__dict__.get('remaining_quantity', DEFERRED)
+    
     def is_expired(self):
         from django.utils import timezone
         return self.end_date and self.end_date < timezone.now().date()
 
 
+def weekday_mask(days_of_week):
+    """7-bit mask of a days_of_week list, bit 0 = Monday"""
+    return sum(1 << day for day in set(days_of_week or []))
+
+
+class MedicationReminderQuerySet(djongo_models.QuerySet):
+    def for_weekday(self, weekday):
+        """
+        Reminders scheduled on `weekday` (0=Monday).
+
+        Matches the 64 masks that have the day's bit set with an IN list
+        so the partial (weekday_mask, reminder_time) index of active
+        reminders is used.
+        """
+        bit = 1 << weekday
+        return self.filter(weekday_mask__in=[mask for mask in range(128) if mask & bit])
+
+    def for_date(self, day):
+        """
+        Active reminders due on `day`: by weekday, or monthly on its day of
+        the month. Each side of the OR repeats is_active so it can seek its
+        own partial index.
+        """
+        days = [day.day]
+        if day.month != (day + timedelta(days=1)).month:
+            # Monthly reminders past the end of a short month fall on its last day
+            days += range(day.day + 1, 32)
+        bit = 1 << day.weekday()
+        return self.filter(
+            Q(is_active=True, weekday_mask__in=[mask for mask in range(128) if mask & bit])
+            | Q(is_active=True, day_of_month__in=days)
+        )
+
+    def scheduled(self):
+        """Reminders that ever come due: some weekday selected, or a day of the month"""
+        return self.filter(Q(weekday_mask__gt=0) | Q(day_of_month__isnull=False))
+
+
 class MedicationReminder(djongo_models.Model):
     """Medication reminder schedule"""
     reminder_id = djongo_models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -98,6 +168,8 @@ class MedicationReminder(djongo_models.Model):
     # Timing
     reminder_time = djongo_models.TimeField()
     days_of_week = djongo_models.JSONField(default=list)  # [0,1,2,3,4,5,6] where 0=Monday
+    weekday_mask = djongo_models.PositiveSmallIntegerField(default=0, editable=False)  # derived from days_of_week
+    day_of_month = djongo_models.PositiveSmallIntegerField(null=True, blank=True)  # 1-31 for monthly doses, instead of days_of_week
     
     # Notification settings
     notification_type = djongo_models.CharField(max_length=20, choices=[
@@ -117,8 +189,29 @@ class MedicationReminder(djongo_models.Model):
     created_at = djongo_models.DateTimeField(auto_now_add=True)
     updated_at = djongo_models.DateTimeField(auto_now=True)
     
+    objects = MedicationReminderQuerySet.as_manager()
+    
+    class Meta:
+        indexes = [
+            # Partial: SQLite cannot seek on the bare boolean term `is_active=True` renders to
+            djongo_models.Index(fields=['next_trigger'], condition=Q(is_active=True), name='reminder_active_trigger_idx'),
+            djongo_models.Index(
+                fields=['weekday_mask', 'reminder_time'], condition=Q(is_active=True), name='reminder_active_weekday_idx'
+            ),
+            djongo_models.Index(
+                fields=['day_of_month', 'reminder_time'], condition=Q(is_active=True), name='reminder_active_monthday_idx'
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.medication.name} at {self.reminder_time}"
+    
+    def save(self, *args, **kwargs):
+        self.weekday_mask = weekday_mask(self.days_of_week)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'days_of_week' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'weekday_mask'}
+        super().save(*args, **kwargs)
 
 
 class MedicationLog(djongo_models.Model):
@@ -162,6 +255,110 @@ class MedicationLog(djongo_models.Model):
         return f"{self.medication.name} - {self.status} at {self.scheduled_time}"
 
 
+class MedicationAdherenceRollup(djongo_models.Model):
+    """Per-medication, per-day dose counters maintained from MedicationLog"""
+    medication = djongo_models.ForeignKey(PatientMedication, on_delete=djongo_models.CASCADE, related_name='adherence_rollups')
+    date = djongo_models.DateField()
+    
+    # Counters per MedicationLog.LOG_STATUS
+    taken = djongo_models.IntegerField(default=0)
+    late = djongo_models.IntegerField(default=0)
+    missed = djongo_models.IntegerField(default=0)
+    skipped = djongo_models.IntegerField(default=0)
+    
+    last_taken = djongo_models.DateTimeField(null=True, blank=True)  # latest taken/late scheduled_time that day
+    
+    class Meta:
+        db_table = 'medication_adherence_rollups'
+        constraints = [
+            djongo_models.UniqueConstraint(fields=['medication', 'date'], name='unique_adherence_rollup_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.medication_id} on {self.date}"
+    
+    @property
+    def total(self):
+        return self.taken + self.late + self.missed + self.skipped
+
+
+class PatientSummary(djongo_models.Model):
+    """Per-patient panel figures, refreshed from rollups and medications (see medications/summaries.py)"""
+    patient = djongo_models.OneToOneField(
+        CustomUser, on_delete=djongo_models.CASCADE, primary_key=True, related_name='medication_summary'
+    )
+    
+    # Doses over the last 7 and 30 days, from the daily adherence rollups
+    taken_7d = djongo_models.IntegerField(default=0)
+    total_7d = djongo_models.IntegerField(default=0)
+    adherence_7d = djongo_models.FloatField(null=True, blank=True)
+    taken_30d = djongo_models.IntegerField(default=0)
+    total_30d = djongo_models.IntegerField(default=0)
+    adherence_30d = djongo_models.FloatField(null=True, blank=True)
+    
+    active_medications = djongo_models.IntegerField(default=0)
+    next_refill_date = djongo_models.DateField(null=True, blank=True)
+    interaction_warnings = djongo_models.IntegerField(default=0)
+    
+    refreshed_at = djongo_models.DateTimeField()
+    
+    class Meta:
+        db_table = 'patient_summaries'
+    
+    def __str__(self):
+        return f"Summary of {self.patient_id}"
+
+
+class PopulationAdherenceStat(djongo_models.Model):
+    """Platform-wide adherence distribution of one bucket, rebuilt by compute_population_adherence"""
+    DIMENSION_CHOICES = [
+        ('frequency', 'Frequency'),
+        ('drug_class', 'Drug class'),
+        ('age_band', 'Age band'),
+        ('week', 'Week'),
+    ]
+
+    dimension = djongo_models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    bucket = djongo_models.CharField(max_length=100)
+
+    patients = djongo_models.IntegerField(default=0)
+    doses = djongo_models.BigIntegerField(default=0)
+    taken = djongo_models.BigIntegerField(default=0)
+    adherence_rate = djongo_models.FloatField()  # taken / doses, pooled over patients
+
+    # Per-patient adherence: mean, quartiles and a 5%-bin histogram
+    mean_patient_rate = djongo_models.FloatField()
+    p25 = djongo_models.FloatField()
+    median = djongo_models.FloatField()
+    p75 = djongo_models.FloatField()
+    histogram = djongo_models.JSONField(default=list)
+
+    window_start = djongo_models.DateTimeField()
+    window_end = djongo_models.DateTimeField()
+    generated_at = djongo_models.DateTimeField()
+
+    class Meta:
+        db_table = 'population_adherence_stats'
+        constraints = [
+            djongo_models.UniqueConstraint(fields=['dimension', 'bucket'], name='unique_population_adherence_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.bucket}"
+
+
+class IndexGeneration(djongo_models.Model):
+    """Shared change counter of a process-local index, bumped by every write path (see medications/indexes.py)"""
+    name = djongo_models.CharField(max_length=50, primary_key=True)
+    generation = djongo_models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'index_generations'
+    
+    def __str__(self):
+        return f"{self.name} @ {self.generation}"
+
+
 class DrugInteraction(djongo_models.Model):
     """Drug interaction database"""
     interaction_id = djongo_models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -181,6 +378,7 @@ class DrugInteraction(djongo_models.Model):
     recommendation = djongo_models.TextField(blank=True)
     
     created_at = djongo_models.DateTimeField(auto_now_add=True)
+    updated_at = djongo_models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'drug_interactions'
@@ -189,6 +387,82 @@ class DrugInteraction(djongo_models.Model):
         return f"{self.medication_1} + {self.medication_2} ({self.severity})"
 
 
+class AllergenGroup(djongo_models.Model):
+    """Medication group an allergy entry covers, e.g. 'penicillin' -> Penicillins / J01C"""
+    token = djongo_models.CharField(max_length=200)  # normalized allergy entry
+    drug_class = djongo_models.CharField(max_length=200, blank=True)
+    atc_prefix = djongo_models.CharField(max_length=20, blank=True)
+    
+    class Meta:
+        db_table = 'allergen_groups'
+        constraints = [
+            djongo_models.UniqueConstraint(fields=['token', 'drug_class', 'atc_prefix'], name='unique_allergen_group'),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.drug_class or self.atc_prefix}"
+
+
+class PatientAllergy(djongo_models.Model):
+    """Normalized entry of a patient's allergies, parsed from their profiles on save"""
+    SOURCE_CHOICES = [
+        ('patient_profile', 'Patient Profile'),
+        ('health_profile', 'Health Profile'),
+    ]
+    
+    patient = djongo_models.ForeignKey(CustomUser, on_delete=djongo_models.CASCADE, related_name='allergy_tokens')
+    token = djongo_models.CharField(max_length=200)
+    source = djongo_models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    
+    class Meta:
+        db_table = 'patient_allergies'
+        constraints = [
+            djongo_models.UniqueConstraint(fields=['patient', 'source', 'token'], name='unique_patient_allergy'),
+        ]
+    
+    def __str__(self):
+        return f"{self.patient_id}: {self.token}"
+
+
+class ActiveMedicationName(djongo_models.Model):
+    """Posting of a normalized medication name to a patient actively taking it (see medications/regimens.py)"""
+    name = djongo_models.CharField(max_length=200)
+    patient = djongo_models.ForeignKey(CustomUser, on_delete=djongo_models.CASCADE, related_name='active_medication_names')
+    
+    class Meta:
+        db_table = 'active_medication_names'
+        constraints = [
+            # Leads with the name, so a posting list is one index range
+            djongo_models.UniqueConstraint(fields=['name', 'patient'], name='unique_active_medication_name'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name}: {self.patient_id}"
+
+
+class Contraindication(djongo_models.Model):
+    """Condition under which a drug class or ATC group should be avoided"""
+    condition = djongo_models.CharField(max_length=200)
+    drug_class = djongo_models.CharField(max_length=200, blank=True)
+    atc_prefix = djongo_models.CharField(max_length=20, blank=True)
+    
+    severity = djongo_models.CharField(max_length=20, choices=DrugInteraction.SEVERITY_CHOICES)
+    description = djongo_models.TextField(blank=True)
+    recommendation = djongo_models.TextField(blank=True)
+    
+    created_at = djongo_models.DateTimeField(auto_now_add=True)
+    updated_at = djongo_models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'contraindications'
+        constraints = [
+            djongo_models.UniqueConstraint(fields=['condition', 'drug_class', 'atc_prefix'], name='unique_contraindication'),
+        ]
+    
+    def __str__(self):
+        return f"{self.condition} x {self.drug_class or self.atc_prefix} ({self.severity})"
+
+
 class Prescription(djongo_models.Model):
     """Digital prescriptions"""
     prescription_id = djongo_models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -200,6 +474,7 @@ class Prescription(djongo_models.Model):
     expiry_date = djongo_models.DateTimeField(null=True, blank=True)
     
     STATUS_CHOICES = [
+        ('draft', 'Draft'),
         ('active', 'Active'),
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
@@ -231,6 +506,91 @@ class Prescription(djongo_models.Model):
     
     class Meta:
         db_table = 'prescriptions'
+        indexes = [
+            djongo_models.Index(fields=['status', 'expiry_date']),
+        ]
+    
+    def __str__(self):
+        return f"Prescription {self.prescription_id} - {self.patient.username}"
+
+
+class PrescriptionUpload(djongo_models.Model):
+    """Uploaded prescription image, read into a draft Prescription by run_ocr_jobs workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    upload_id = djongo_models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    prescription = djongo_models.ForeignKey(Prescription, on_delete=djongo_models.CASCADE, related_name='uploads')
+    uploaded_by = djongo_models.ForeignKey(CustomUser, on_delete=djongo_models.SET_NULL, null=True, blank=True)
+    image = djongo_models.FileField(upload_to='prescription_uploads/%Y/%m/%d/')
+    
+    status = djongo_models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    engine = djongo_models.CharField(max_length=50, blank=True)
+    extracted_text = djongo_models.TextField(blank=True)
+    error = djongo_models.TextField(blank=True)
+    
+    created_at = djongo_models.DateTimeField(auto_now_add=True)
+    started_at = djongo_models.DateTimeField(null=True, blank=True)
+    finished_at = djongo_models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'prescription_uploads'
+        indexes = [
+            djongo_models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Prescription upload {self.upload_id} ({self.status})"
+
+
+class SafetyScanJob(djongo_models.Model):
+    """Queued prescription safety scan, picked up by run_safety_scans workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_id = djongo_models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    prescription = djongo_models.ForeignKey(Prescription, on_delete=djongo_models.CASCADE, related_name='safety_scan_jobs')
+    requested_by = djongo_models.ForeignKey(CustomUser, on_delete=djongo_models.SET_NULL, null=True, blank=True)
+    
+    # Names prescribed in addition to the patient's active medications
+    medications = djongo_models.JSONField(default=list)
+    
+    status = djongo_models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    scan_key = djongo_models.CharField(max_length=64, blank=True)
+    cached = djongo_models.BooleanField(default=False)
+    warnings = djongo_models.JSONField(default=list)
+    error = djongo_models.TextField(blank=True)
+    
+    created_at = djongo_models.DateTimeField(auto_now_add=True)
+    started_at = djongo_models.DateTimeField(null=True, blank=True)
+    finished_at = djongo_models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'safety_scan_jobs'
+        indexes = [
+            djongo_models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Safety scan {self.job_id} ({self.status})"
+
+
+class SafetyScanResult(djongo_models.Model):
+    """Scan warnings cached by regimen, allergies and interaction database version"""
+    scan_key = djongo_models.CharField(max_length=64, primary_key=True)
+    warnings = djongo_models.JSONField(default=list)
+    created_at = djongo_models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'safety_scan_results'
     
     def __str__(self):
-        return f"Prescription {self.prescription_id} - {self.patient.username}"
\ No newline at end of file
+        return self.scan_key
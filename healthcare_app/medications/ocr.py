@@ -0,0 +1,103 @@
+# medications/ocr.py
+
+from functools import lru_cache
+
+import cv2
+from django.utils.module_loading import import_string
+
+DEFAULT_ENGINE = 'medications.ocr.StubEngine'
+
+# Longest side of a preprocessed image; phone photos are several times
+# larger than text recognition needs.
+MAX_SIDE = 2000
+
+# Skew below this is left alone: rotating resamples the whole image
+MIN_SKEW_DEGREES = 0.5
+
+# Neighbourhood and offset of the adaptive threshold, sized for handwriting
+# and print at MAX_SIDE resolution
+THRESHOLD_BLOCK_SIZE = 31
+THRESHOLD_OFFSET = 15
+
+
+class OCREngine:
+    """
+    Text extraction backend. Subclasses implement extract_text() for a
+    preprocessed image: grayscale, deskewed and binarized (ink 0, paper 255).
+    """
+    name = ''
+
+    def extract_text(self, image):
+        raise NotImplementedError
+
+
+class StubEngine(OCREngine):
+    """Engine that reads nothing, for development and tests"""
+    name = 'stub'
+
+    def extract_text(self, image):
+        return ''
+
+
+@lru_cache(maxsize=None)
+def load_engine(path):
+    """The engine class at dotted `path`, instantiated once per process"""
+    return import_string(path)()
+
+
+def downscale(image, max_side=MAX_SIDE):
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def skew_angle(image):
+    """Degrees the text in a grayscale image is rotated by, in (-45, 45]"""
+    _, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return 0.0
+
+    # The minimum-area rectangle around all ink is tilted with the text lines.
+    # Its angle convention differs between OpenCV versions, but is always
+    # defined modulo 90 degrees.
+    angle = cv2.minAreaRect(points)[-1] % 90
+    return angle - 90 if angle > 45 else angle
+
+
+def deskew(image):
+    angle = skew_angle(image)
+    if abs(angle) < MIN_SKEW_DEGREES:
+        return image
+    height, width = image.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        image, rotation, (width, height), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def binarize(image):
+    # Adaptive rather than global: photos of paper are unevenly lit
+    return cv2.adaptiveThreshold(
+        image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+        THRESHOLD_BLOCK_SIZE, THRESHOLD_OFFSET
+    )
+
+
+def preprocess(path, max_side=MAX_SIDE):
+    """Load the image at `path` as grayscale, downscale, deskew and binarize it"""
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Unreadable image: {path}")
+    return binarize(deskew(downscale(image, max_side)))
+
+
+def extract(path, engine_path=DEFAULT_ENGINE):
+    """
+    Preprocess and read the image at `path`; returns (engine name, text).
+    Runs in OCR pool processes, so it only touches the file system.
+    """
+    engine = load_engine(engine_path)
+    return engine.name, engine.extract_text(preprocess(path))
@@ -0,0 +1,150 @@
+# medications/ocr_jobs.py
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import PrescriptionUpload
+from .ocr import DEFAULT_ENGINE, extract
+
+logger = logging.getLogger(__name__)
+
+
+def ocr_engine_path():
+    return getattr(settings, 'OCR_ENGINE', DEFAULT_ENGINE)
+
+
+def requeue_stale_uploads():
+    """Queue again uploads left processing by a worker that died; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=settings.QUEUE_CLAIM_TIMEOUT)
+    requeued = PrescriptionUpload.objects.filter(status='processing', started_at__lt=cutoff).update(
+        status='queued', started_at=None
+    )
+    if requeued:
+        logger.warning(f"Requeued {requeued} prescription uploads stuck in processing")
+    return requeued
+
+
+def _claim_queued(candidates):
+    queued = PrescriptionUpload.objects.filter(status='queued').order_by('created_at')
+    for upload_id in queued.values_list('pk', flat=True)[:candidates]:
+        # Conditional UPDATE: exactly one worker wins each upload, without row locks
+        claimed = PrescriptionUpload.objects.filter(pk=upload_id, status='queued').update(
+            status='processing', started_at=timezone.now()
+        )
+        if claimed:
+            return PrescriptionUpload.objects.select_related('prescription').get(pk=upload_id)
+    return None
+
+
+def claim_upload(candidates=10):
+    """Mark the oldest queued upload as processing and return it, or None"""
+    upload = _claim_queued(candidates)
+    # Stale claims are only looked for once the queue is empty
+    if upload is None and requeue_stale_uploads():
+        upload = _claim_queued(candidates)
+    return upload
+
+
+def complete_upload(upload, engine, text):
+    """Write extracted text onto the upload's draft prescription"""
+    now = timezone.now()
+    with transaction.atomic():
+        prescription = upload.prescription
+        prescription.instructions = text
+        prescription.save(update_fields=['instructions', 'updated_at'])
+
+        upload.status = 'completed'
+        upload.engine = engine
+        upload.extracted_text = text
+        upload.finished_at = now
+        upload.save(update_fields=['status', 'engine', 'extracted_text', 'finished_at'])
+    return upload
+
+
+def fail_upload(upload, error):
+    logger.error(f"Prescription upload {upload.upload_id} failed: {error}")
+    PrescriptionUpload.objects.filter(pk=upload.pk).update(
+        status='failed', error=str(error), finished_at=timezone.now()
+    )
+
+
+def _finish(upload, future):
+    try:
+        engine, text = future.result()
+    except Exception as e:
+        fail_upload(upload, e)
+        return
+    try:
+        complete_upload(upload, engine, text)
+    except DatabaseError:
+        logger.exception(f"Could not save the text of prescription upload {upload.upload_id}")
+
+
+def _process_inline(engine_path):
+    """Claim and read one upload in this process; returns False when the queue is empty"""
+    upload = claim_upload()
+    if upload is None:
+        return False
+    try:
+        engine, text = extract(upload.image.path, engine_path)
+    except Exception as e:
+        fail_upload(upload, e)
+    else:
+        complete_upload(upload, engine, text)
+    return True
+
+
+def work(stop, processes=2, poll_interval=2.0, once=False, engine_path=None):
+    """
+    Worker loop: read queued uploads until `stop` is set (or the queue
+    drains, with once=True).
+
+    Images are preprocessed and read in a pool of `processes`; this process
+    only claims uploads and writes results. At most two uploads per pool
+    process are claimed ahead, so a backlog stays queued where other
+    workers can pick it up. With processes=1 everything runs in this process.
+    """
+    engine_path = engine_path or ocr_engine_path()
+
+    if processes <= 1:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if _process_inline(engine_path):
+                    continue
+            except DatabaseError:
+                logger.exception("OCR worker could not reach the queue")
+            if once:
+                return
+            stop.wait(poll_interval)
+        return
+
+    # Pool processes never use the database; don't hand them open connections
+    connections.close_all()
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        while True:
+            close_old_connections()
+            try:
+                while not stop.is_set() and len(in_flight) < processes * 2:
+                    upload = claim_upload()
+                    if upload is None:
+                        break
+                    in_flight[pool.submit(extract, upload.image.path, engine_path)] = upload
+            except DatabaseError:
+                logger.exception("OCR worker could not reach the queue")
+
+            if not in_flight:
+                if once or stop.is_set():
+                    return
+                stop.wait(poll_interval)
+                continue
+
+            done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                _finish(in_flight.pop(future), future)
@@ -0,0 +1,159 @@
+# medications/regimens.py
+
+import logging
+
+from django.db import transaction
+
+from .interactions import interaction_index, normalize_name, pair_key
+from .models import ActiveMedicationName, PatientMedication
+
+logger = logging.getLogger(__name__)
+
+# Posting lists read and patients rescanned per query
+BATCH_SIZE = 1000
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = sorted(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sync_active_medication_names(patient_ids):
+    """Rewrite the name postings of `patient_ids` from their active medications"""
+    patient_ids = set(patient_ids)
+    if not patient_ids:
+        return
+
+    names = {
+        (patient_id, normalize_name(name))
+        for patient_id, name in PatientMedication.objects.filter(
+            patient_id__in=patient_ids, is_active=True
+        ).values_list('patient_id', 'name')
+    }
+    with transaction.atomic():
+        stored = {
+            (patient_id, name): pk
+            for pk, patient_id, name in ActiveMedicationName.objects.filter(
+                patient_id__in=patient_ids
+            ).values_list('pk', 'patient_id', 'name')
+        }
+        stale = [pk for key, pk in stored.items() if key not in names]
+        if stale:
+            ActiveMedicationName.objects.filter(pk__in=stale).delete()
+        # A concurrent save of the same patient may have added the name already
+        ActiveMedicationName.objects.bulk_create([
+            ActiveMedicationName(patient_id=patient_id, name=name)
+            for patient_id, name in sorted(names - stored.keys())
+        ], ignore_conflicts=True)
+
+
+def sync_patient_medication_names(patient_id):
+    """Re-post one patient's names; used after their medications change"""
+    try:
+        sync_active_medication_names([patient_id])
+    except Exception as e:
+        logger.error(f"Error syncing the medication names of patient {patient_id}: {str(e)}")
+
+
+def add_active_medication_names(medications):
+    """Post newly created medications, which can only add names; the bulk counterpart of saving each"""
+    ActiveMedicationName.objects.bulk_create([
+        ActiveMedicationName(patient_id=patient_id, name=name)
+        for patient_id, name in sorted({
+            (medication.patient_id, normalize_name(medication.name))
+            for medication in medications if medication.is_active
+        })
+    ], ignore_conflicts=True)
+
+
+def backfill_active_medication_names(batch_size=BATCH_SIZE):
+    """Post the active medications of every patient; returns the patients synced"""
+    patient_ids = PatientMedication.objects.values_list('patient_id', flat=True).distinct().order_by('patient_id')
+    synced = 0
+    batch = []
+    for patient_id in patient_ids.iterator(chunk_size=batch_size):
+        batch.append(patient_id)
+        if len(batch) >= batch_size:
+            sync_active_medication_names(batch)
+            synced += len(batch)
+            batch = []
+    if batch:
+        sync_active_medication_names(batch)
+        synced += len(batch)
+    return synced
+
+
+def patients_taking(pairs):
+    """
+    Patients actively taking both medications of any of `pairs`: the
+    intersection of the two names' posting lists, per pair.
+    """
+    pairs = {pair_key(medication_1, medication_2) for medication_1, medication_2 in pairs}
+    postings = {}
+    for names in _batches({name for pair in pairs for name in pair}):
+        for name, patient_id in ActiveMedicationName.objects.filter(name__in=names).values_list(
+            'name', 'patient_id'
+        ).iterator(chunk_size=5000):
+            postings.setdefault(name, set()).add(patient_id)
+
+    patient_ids = set()
+    for name_1, name_2 in pairs:
+        patient_ids |= postings.get(name_1, set()) & postings.get(name_2, set())
+    return patient_ids
+
+
+def refresh_interaction_warnings(patient_ids):
+    """
+    Recompute the interaction warnings on the active medications of
+    `patient_ids`, keeping their other warnings; returns the rows changed.
+    """
+    medications = PatientMedication.objects.filter(
+        patient_id__in=patient_ids, is_active=True
+    ).only('medication_id', 'patient_id', 'name', 'safety_checked', 'safety_warnings').order_by('pk')
+    regimens = {}
+    for medication in medications:
+        regimens.setdefault(medication.patient_id, {}).setdefault(normalize_name(medication.name), []).append(medication)
+
+    changed = []
+    for regimen in regimens.values():
+        found = {name: [] for name in regimen}
+        for name_1, name_2, interaction in interaction_index.find_interactions(sorted(regimen)):
+            warning = {
+                'type': 'interaction',
+                'medications': [regimen[name_1][0].name, regimen[name_2][0].name],
+                'severity': interaction.severity,
+                'message': interaction.description,
+                'recommendation': interaction.recommendation
+            }
+            found[name_1].append(warning)
+            found[name_2].append(warning)
+
+        for name, warnings in found.items():
+            for medication in regimen[name]:
+                kept = [warning for warning in medication.safety_warnings if warning.get('type') != 'interaction']
+                if kept + warnings != medication.safety_warnings or not medication.safety_checked:
+                    medication.safety_warnings = kept + warnings
+                    medication.safety_checked = True
+                    changed.append(medication)
+
+    PatientMedication.objects.bulk_update(changed, ['safety_warnings', 'safety_checked'], batch_size=1000)
+    return len(changed)
+
+
+def rescan_interactions(pairs):
+    """Refresh the interaction warnings of exactly the patients taking both drugs of a changed pair"""
+    patient_ids = patients_taking(pairs)
+    changed = 0
+    for batch in _batches(patient_ids):
+        changed += refresh_interaction_warnings(batch)
+    logger.info(f"Rescanned {len(patient_ids)} patients for {len(pairs)} interactions: {changed} medications updated")
+    return len(patient_ids)
+
+
+def rescan_interaction_change(pairs):
+    """Rescan after an interaction is saved or deleted; used from signals once the change is committed"""
+    try:
+        rescan_interactions(pairs)
+    except Exception as e:
+        logger.error(f"Error rescanning regimens for interactions {sorted(pairs)}: {str(e)}")
@@ -0,0 +1,122 @@
+# medications/rollups.py
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import MedicationAdherenceRollup, MedicationLog
+
+ROLLUP_STATUSES = ('taken', 'late', 'missed', 'skipped')
+TAKEN_STATUSES = ('taken', 'late')
+
+
+def rollup_date(scheduled_time):
+    """Day bucket a log falls into, in the project's time zone"""
+    if timezone.is_naive(scheduled_time):
+        return scheduled_time.date()
+    return timezone.localdate(scheduled_time)
+
+
+def _day_bounds(day):
+    start = datetime.combine(day, time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start)
+    return start, start + timedelta(days=1)
+
+
+def _latest_taken_subquery(day):
+    start, end = _day_bounds(day)
+    return Subquery(
+        MedicationLog.objects.filter(
+            medication_id=OuterRef('medication_id'),
+            scheduled_time__gte=start,
+            scheduled_time__lt=end,
+            status__in=TAKEN_STATUSES
+        ).order_by('-scheduled_time').values('scheduled_time')[:1]
+    )
+
+
+def apply_log(medication_id, scheduled_time, status, delta):
+    """
+    Add (delta=1) or remove (delta=-1) a single log from its day's rollup.
+
+    Counters are changed with F() expressions so concurrent writers never
+    lose an increment. The first log of a day creates the row.
+    """
+    if status not in ROLLUP_STATUSES:
+        return
+
+    day = rollup_date(scheduled_time)
+    rollups = MedicationAdherenceRollup.objects.filter(medication_id=medication_id, date=day)
+
+    changes = {status: F(status) + delta}
+    if status in TAKEN_STATUSES:
+        if delta > 0:
+            when = Value(scheduled_time, output_field=models.DateTimeField())
+            changes['last_taken'] = Greatest(Coalesce(F('last_taken'), when), when)
+        else:
+            changes['last_taken'] = _latest_taken_subquery(day)
+
+    if rollups.update(**changes) or delta < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            MedicationAdherenceRollup.objects.create(
+                medication_id=medication_id,
+                date=day,
+                last_taken=scheduled_time if status in TAKEN_STATUSES else None,
+                **{status: delta}
+            )
+    except IntegrityError:
+        # Another writer created the day's row first
+        rollups.update(**changes)
+
+
+def record_logs(logs):
+    """
+    Apply logs written without signals (bulk_create) to their rollups,
+    with one counter update per medication, day and status.
+    """
+    groups = {}
+    for log in logs:
+        if log.status not in ROLLUP_STATUSES:
+            continue
+        key = (log.medication_id, rollup_date(log.scheduled_time), log.status)
+        count, latest = groups.get(key, (0, log.scheduled_time))
+        groups[key] = (count + 1, max(latest, log.scheduled_time))
+
+    for (medication_id, day, status), (count, latest) in groups.items():
+        apply_log(medication_id, latest, status, count)
+
+
+def rebuild_rollups(medication_ids):
+    """Recompute the rollups of the given medications from their raw logs"""
+    with transaction.atomic():
+        MedicationAdherenceRollup.objects.filter(medication_id__in=medication_ids).delete()
+
+        rows = MedicationLog.objects.filter(
+            medication_id__in=medication_ids
+        ).annotate(
+            day=TruncDate('scheduled_time')
+        ).values('medication_id', 'day').annotate(
+            last_taken=Max('scheduled_time', filter=Q(status__in=TAKEN_STATUSES)),
+            **{status: Count('pk', filter=Q(status=status)) for status in ROLLUP_STATUSES}
+        ).order_by()
+
+        rollups = [
+            MedicationAdherenceRollup(
+                medication_id=row['medication_id'],
+                date=row['day'],
+                last_taken=row['last_taken'],
+                **{status: row[status] for status in ROLLUP_STATUSES}
+            )
+            for row in rows.iterator()
+        ]
+        MedicationAdherenceRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    return len(rollups)
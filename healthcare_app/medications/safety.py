@@ -0,0 +1,171 @@
+# medications/safety.py
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .allergies import allergy_index, patient_allergy_set
+from .interactions import interaction_db_version, interaction_index, normalize_name
+from .models import PatientMedication, SafetyScanJob, SafetyScanResult
+
+logger = logging.getLogger(__name__)
+
+
+def scan_key(medications, allergies, version):
+    """Cache key of a scan: the sorted medication set, allergies and interaction database version"""
+    payload = json.dumps({
+        'medications': sorted({normalize_name(name) for name in medications}),
+        'allergies': allergies.key(),
+        'version': version,
+    }, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def scan_regimen(current, prescribed, allergies, interactions=None):
+    """
+    Warnings for a regimen: interactions between any two medications,
+    prescribed medications the patient already takes, and medications
+    covered by the patient's compiled AllergySet. `interactions` pins the
+    interaction index copy to scan with.
+    """
+    warnings = []
+    names = list(dict.fromkeys(current + prescribed))
+
+    for med_1, med_2, interaction in interaction_index.find_interactions(names, interactions):
+        warnings.append({
+            'type': 'interaction',
+            'medications': [med_1, med_2],
+            'severity': interaction.severity,
+            'message': interaction.description,
+            'recommendation': interaction.recommendation
+        })
+
+    taking = {normalize_name(name) for name in current}
+    for name in prescribed:
+        if normalize_name(name) in taking:
+            warnings.append({
+                'type': 'duplicate',
+                'medications': [name],
+                'message': f'Patient is already taking {name}'
+            })
+
+    for name, allergy, matched_on in allergy_index.conflicts(names, allergies):
+        warnings.append({
+            'type': 'allergy',
+            'medications': [name],
+            'allergy': allergy,
+            'matched_on': matched_on,
+            'message': f'Patient is allergic to {allergy}'
+        })
+    return warnings
+
+
+def run_scan(job):
+    """Scan a job's regimen, reusing a cached result for an identical one"""
+    prescription = job.prescription
+    current = list(PatientMedication.objects.filter(
+        patient_id=prescription.patient_id, is_active=True
+    ).values_list('name', flat=True))
+    allergies = patient_allergy_set(prescription.patient_id)
+
+    # Scan with an index built at the version in the key, so a result is
+    # never cached under a newer version than the rows it was scanned with
+    version = interaction_db_version()
+    interactions = interaction_index.ensure_version(version)
+    key = scan_key(current + job.medications, allergies, version)
+    cached = SafetyScanResult.objects.filter(scan_key=key).first()
+    if cached:
+        warnings = cached.warnings
+    else:
+        warnings = scan_regimen(current, job.medications, allergies, interactions)
+        try:
+            with transaction.atomic():
+                SafetyScanResult.objects.create(scan_key=key, warnings=warnings)
+        except IntegrityError:
+            pass  # another worker scanned the same regimen concurrently
+
+    now = timezone.now()
+    with transaction.atomic():
+        prescription.safety_scan_performed = True
+        prescription.safety_warnings = warnings
+        prescription.scan_timestamp = now
+        prescription.save(update_fields=['safety_scan_performed', 'safety_warnings', 'scan_timestamp', 'updated_at'])
+
+        job.status = 'completed'
+        job.scan_key = key
+        job.cached = cached is not None
+        job.warnings = warnings
+        job.finished_at = now
+        job.save(update_fields=['status', 'scan_key', 'cached', 'warnings', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    """Queue again jobs left running by a worker that died; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=settings.QUEUE_CLAIM_TIMEOUT)
+    requeued = SafetyScanJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='queued', started_at=None
+    )
+    if requeued:
+        logger.warning(f"Requeued {requeued} safety scans stuck in running")
+    return requeued
+
+
+def _claim_queued(candidates):
+    queued = SafetyScanJob.objects.filter(status='queued').order_by('created_at')
+    for job_id in queued.values_list('pk', flat=True)[:candidates]:
+        # Conditional UPDATE: exactly one worker wins each job, without row locks
+        claimed = SafetyScanJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if claimed:
+            return SafetyScanJob.objects.select_related('prescription__patient').get(pk=job_id)
+    return None
+
+
+def claim_job(candidates=10):
+    """Mark the oldest queued job as running and return it, or None"""
+    job = _claim_queued(candidates)
+    # Stale claims are only looked for once the queue is empty
+    if job is None and requeue_stale_jobs():
+        job = _claim_queued(candidates)
+    return job
+
+
+def process_next_job():
+    """Claim and run one job; returns False when the queue is empty"""
+    job = claim_job()
+    if job is None:
+        return False
+    try:
+        run_scan(job)
+    except Exception as e:
+        logger.exception(f"Safety scan {job.job_id} failed")
+        SafetyScanJob.objects.filter(pk=job.pk).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+    return True
+
+
+def work(stop, poll_interval=2.0, once=False):
+    """Worker loop: run jobs until `stop` is set (or the queue drains, with once=True)"""
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                if process_next_job():
+                    continue
+            except DatabaseError:
+                # e.g. a dropped connection; retry after a pause
+                logger.exception("Safety scan worker could not reach the queue")
+            if once:
+                return
+            stop.wait(poll_interval)
+    finally:
+        # Each worker thread has its own connection
+        connection.close()
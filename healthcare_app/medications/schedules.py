@@ -0,0 +1,75 @@
+# medications/schedules.py
+
+from datetime import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MedicationReminder, PatientMedication, weekday_mask
+from .regimens import add_active_medication_names
+from .scheduling import compute_next_trigger
+
+EVERY_DAY = (0, 1, 2, 3, 4, 5, 6)
+START_WEEKDAY = 'start'  # the weekday of the medication's start_date
+START_DAY = 'start_day'  # the day of the month of the medication's start_date
+
+# Default reminder times and days for every PatientMedication.FREQUENCY_CHOICES
+# value. As-needed doses have no default.
+DEFAULT_SCHEDULES = {
+    'once_daily': ((time(9, 0), EVERY_DAY),),
+    'twice_daily': ((time(9, 0), EVERY_DAY), (time(21, 0), EVERY_DAY)),
+    'thrice_daily': ((time(8, 0), EVERY_DAY), (time(14, 0), EVERY_DAY), (time(20, 0), EVERY_DAY)),
+    'four_times_daily': (
+        (time(8, 0), EVERY_DAY), (time(12, 0), EVERY_DAY), (time(16, 0), EVERY_DAY), (time(20, 0), EVERY_DAY),
+    ),
+    'weekly': ((time(9, 0), START_WEEKDAY),),
+    'monthly': ((time(9, 0), START_DAY),),
+    'as_needed': (),
+}
+
+
+def default_reminders(medication, now=None):
+    """
+    Unsaved default reminders for a medication. weekday_mask and
+    next_trigger are filled in here because bulk_create skips save() and
+    the pre_save signal.
+    """
+    now = now or timezone.now()
+    reminders = []
+    for reminder_time, days in DEFAULT_SCHEDULES.get(medication.frequency, ()):
+        day_of_month = None
+        if days == START_WEEKDAY:
+            days = (medication.start_date.weekday(),)
+        elif days == START_DAY:
+            days, day_of_month = (), medication.start_date.day
+        days = list(days)
+        reminders.append(MedicationReminder(
+            medication=medication,
+            reminder_time=reminder_time,
+            days_of_week=days,
+            weekday_mask=weekday_mask(days),
+            day_of_month=day_of_month,
+            next_trigger=compute_next_trigger(reminder_time, days, now, day_of_month) if medication.is_active else None,
+            is_active=medication.is_active
+        ))
+    return reminders
+
+
+def create_default_reminders(medications, batch_size=1000):
+    """Create the default reminders of any number of medications with one bulk_create"""
+    now = timezone.now()
+    reminders = [reminder for medication in medications for reminder in default_reminders(medication, now)]
+    return MedicationReminder.objects.bulk_create(reminders, batch_size=batch_size)
+
+
+def bulk_create_medications(medications, batch_size=1000):
+    """
+    Insert many PatientMedications, their default reminders and name
+    postings in batched statements, for imports and onboarding. post_save does not fire, so
+    this is the bulk counterpart of saving each medication.
+    """
+    with transaction.atomic():
+        medications = PatientMedication.objects.bulk_create(medications, batch_size=batch_size)
+        create_default_reminders(medications, batch_size=batch_size)
+        add_active_medication_names(medications)
+    return medications
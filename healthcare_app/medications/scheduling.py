@@ -0,0 +1,211 @@
+# medications/scheduling.py
+
+import heapq
+import logging
+import time as time_module
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from .models import MedicationReminder
+
+logger = logging.getLogger(__name__)
+
+# Sent with `reminders` (a list of MedicationReminder) for every dispatched
+# batch. Delivery channels (push, email, sms) hook in as receivers.
+reminders_due = Signal()
+
+
+def _monthly_trigger(reminder_time, day_of_month, local_after, after):
+    year, month = local_after.year, local_after.month
+    for _ in range(2):
+        # Past the end of a short month the dose falls on its last day
+        day = min(day_of_month, monthrange(year, month)[1])
+        candidate = datetime.combine(date(year, month, day), reminder_time)
+        if settings.USE_TZ:
+            candidate = timezone.make_aware(candidate)
+        if candidate > after:
+            return candidate
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return None
+
+
+def compute_next_trigger(reminder_time, days_of_week, after, day_of_month=None):
+    """
+    First occurrence of `reminder_time` on one of `days_of_week`
+    (0=Monday), or on `day_of_month` when given, strictly after `after`;
+    None if no day is selected.
+    """
+    days = set(days_of_week or [])
+    if not days and not day_of_month:
+        return None
+    if isinstance(reminder_time, str):
+        reminder_time = parse_time(reminder_time)
+
+    local_after = timezone.localtime(after) if settings.USE_TZ else after
+    if day_of_month:
+        return _monthly_trigger(reminder_time, day_of_month, local_after, after)
+    for offset in range(8):
+        day = local_after.date() + timedelta(days=offset)
+        if day.weekday() not in days:
+            continue
+        candidate = datetime.combine(day, reminder_time)
+        if settings.USE_TZ:
+            candidate = timezone.make_aware(candidate)
+        if candidate > after:
+            return candidate
+    return None
+
+
+class ReminderScheduler:
+    """
+    Dispatches medication reminders when their next_trigger comes due.
+
+    Only reminders due within `horizon` are held in memory, in a min-heap
+    ordered by next_trigger, and the window is reloaded every `horizon / 2`
+    with a range seek on reminder_active_trigger_idx (next_trigger, partial
+    on is_active). The loop sleeps until the earliest reminder or the next
+    reload, whichever comes first, so the table is never polled as a whole.
+    """
+
+    def __init__(self, horizon=timedelta(minutes=10), batch_size=500, grace=timedelta(minutes=15)):
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.grace = grace
+        self._heap = []
+        self._scheduled = {}  # reminder_id -> next_trigger currently in the heap
+        self._next_refill = None
+        self._loaded_until = None
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def prime(self, now):
+        """Fill in next_trigger for active reminders that have none yet"""
+        # Reminders without any weekday or day of the month never come due
+        missing = MedicationReminder.objects.scheduled().filter(
+            is_active=True, next_trigger__isnull=True, medication__is_active=True
+        ).only('reminder_id', 'reminder_time', 'days_of_week', 'day_of_month', 'next_trigger')
+
+        pending = []
+        primed = 0
+        for reminder in missing.iterator(chunk_size=self.batch_size):
+            reminder.next_trigger = compute_next_trigger(
+                reminder.reminder_time, reminder.days_of_week, now, reminder.day_of_month
+            )
+            if reminder.next_trigger is None:
+                continue
+            pending.append(reminder)
+            if len(pending) >= self.batch_size:
+                MedicationReminder.objects.bulk_update(pending, ['next_trigger'])
+                primed += len(pending)
+                pending = []
+        if pending:
+            MedicationReminder.objects.bulk_update(pending, ['next_trigger'])
+            primed += len(pending)
+        return primed
+
+    def _push(self, reminder_id, when):
+        if self._scheduled.get(reminder_id) == when:
+            return
+        self._scheduled[reminder_id] = when
+        heapq.heappush(self._heap, (when, reminder_id))
+
+    def refill(self, now):
+        """Load every active reminder due before now + horizon into the heap"""
+        self.prime(now)
+        self._loaded_until = now + self.horizon
+        # Reminders of deactivated medications keep their next_trigger but are
+        # never dispatched, so they must not be reloaded every refill either
+        due = MedicationReminder.objects.filter(
+            is_active=True, next_trigger__lte=self._loaded_until, medication__is_active=True
+        ).values_list('reminder_id', 'next_trigger')
+        for reminder_id, when in due.iterator(chunk_size=self.batch_size):
+            self._push(reminder_id, when)
+        self._next_refill = now + self.horizon / 2
+
+    def _pop_due(self, now):
+        batch = {}
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            when, reminder_id = heapq.heappop(self._heap)
+            # Entries superseded by a newer next_trigger are skipped
+            if self._scheduled.get(reminder_id) == when:
+                del self._scheduled[reminder_id]
+                batch[reminder_id] = when
+        return batch
+
+    def dispatch(self, batch, now):
+        """Send one batch of due reminders and advance their next_trigger"""
+        # Medications can be deactivated ahead of the nightly expiry sweep
+        reminders = MedicationReminder.objects.filter(
+            reminder_id__in=batch.keys(), is_active=True, medication__is_active=True
+        ).select_related('medication__patient')
+
+        to_send = []
+        to_update = []
+        for reminder in reminders:
+            # The row changed since it was loaded; a refill picks up the new time
+            if reminder.next_trigger != batch[reminder.reminder_id]:
+                continue
+            if now - reminder.next_trigger <= self.grace:
+                reminder.last_triggered = now
+                to_send.append(reminder)
+            reminder.next_trigger = compute_next_trigger(
+                reminder.reminder_time, reminder.days_of_week, now, reminder.day_of_month
+            )
+            to_update.append(reminder)
+
+        if to_send:
+            reminders_due.send(sender=self.__class__, reminders=to_send)
+        if to_update:
+            MedicationReminder.objects.bulk_update(to_update, ['last_triggered', 'next_trigger'])
+
+        for reminder in to_update:
+            if reminder.next_trigger and reminder.next_trigger <= self._loaded_until:
+                self._push(reminder.reminder_id, reminder.next_trigger)
+
+        return len(to_send)
+
+    def run_once(self, now=None):
+        """Refill if needed and dispatch everything due at `now`"""
+        now = now or timezone.now()
+        if self._next_refill is None or now >= self._next_refill:
+            self.refill(now)
+
+        sent = 0
+        while True:
+            batch = self._pop_due(now)
+            if not batch:
+                break
+            sent += self.dispatch(batch, now)
+        return sent
+
+    def seconds_until_next_wakeup(self, now):
+        wake = self._next_refill
+        if self._heap and self._heap[0][0] < wake:
+            wake = self._heap[0][0]
+        return max((wake - now).total_seconds(), 0)
+
+    def run_forever(self):
+        while not self._stopped:
+            sent = self.run_once()
+            if sent:
+                logger.info(f"Dispatched {sent} medication reminders")
+            time_module.sleep(self.seconds_until_next_wakeup(timezone.now()))
+
+
+def log_due_reminders(sender, reminders, **kwargs):
+    """Default receiver: record each dispatched reminder"""
+    for reminder in reminders:
+        logger.info(
+            f"Reminder {reminder.reminder_id} due for {reminder.medication.patient.username}: "
+            f"{reminder.medication.name} via {reminder.notification_type}"
+        )
+
+
+reminders_due.connect(log_due_reminders, dispatch_uid='medications.log_due_reminders')
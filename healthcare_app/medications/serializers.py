@@ -3,6 +3,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from .models import *
+from .adherence import adherence_rate, rollup_totals
 from users.serializers import CustomUserSerializer
 
 class MedicationSerializer(serializers.ModelSerializer):
@@ -26,13 +27,13 @@ class PatientMedicationSerializer(serializers.ModelSerializer):
         return obj.is_expired()
     
     def get_adherence_rate(self, obj):
-        # Calculate adherence rate for this medication
-        logs = obj.logs.all()
-        if not logs:
-            return 0
+        # Prefer counts annotated by PatientMedicationViewSet.get_queryset
+        if hasattr(obj, 'total_doses'):
+            return adherence_rate(obj.taken_doses, obj.total_doses)
         
-        taken_logs = logs.filter(status__in=['taken', 'late']).count()
-        return (taken_logs / logs.count()) * 100 if logs.count() > 0 else 0
+        # Calculate adherence rate for this medication from its daily rollups
+        totals = obj.adherence_rollups.aggregate(**rollup_totals())
+        return adherence_rate(totals['taken_doses'], totals['total_doses'])
     
     def validate(self, data):
         # Validate end date is after start date
@@ -69,6 +70,11 @@ class MedicationReminderSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Days must be between 0 (Monday) and 6 (Sunday)")
         return value
 
+    def validate_day_of_month(self, value):
+        if value is not None and not 1 <= value <= 31:
+            raise serializers.ValidationError("day_of_month must be between 1 and 31")
+        return value
+
 
 class MedicationLogSerializer(serializers.ModelSerializer):
     medication_name = serializers.CharField(source='medication.name', read_only=True)
@@ -122,6 +128,25 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         return data
 
 
+class SafetyScanJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SafetyScanJob
+        fields = (
+            'job_id', 'prescription', 'medications', 'status', 'cached',
+            'warnings', 'error', 'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+
+class SafetyScanRequestSerializer(serializers.Serializer):
+    """Serializer for queuing a prescription safety scan"""
+    medications = serializers.ListField(
+        child=serializers.CharField(max_length=200),
+        required=False,
+        default=list
+    )
+
+
 class MedicationCheckSerializer(serializers.Serializer):
     """Serializer for medication safety check"""
     medications = serializers.ListField(
@@ -147,6 +172,26 @@ class MedicationAdherenceSerializer(serializers.Serializer):
     last_taken = serializers.DateTimeField(allow_null=True)
 
 
+class PrescriptionUploadStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PrescriptionUpload
+        fields = (
+            'upload_id', 'prescription', 'status', 'engine', 'extracted_text',
+            'error', 'created_at', 'started_at', 'finished_at',
+        )
+        read_only_fields = fields
+
+
+class PopulationAdherenceStatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PopulationAdherenceStat
+        fields = (
+            'dimension', 'bucket', 'patients', 'doses', 'taken', 'adherence_rate',
+            'mean_patient_rate', 'p25', 'median', 'p75', 'histogram',
+        )
+        read_only_fields = fields
+
+
 class PrescriptionUploadSerializer(serializers.Serializer):
     """Serializer for prescription upload with OCR"""
     prescription_image = serializers.ImageField()
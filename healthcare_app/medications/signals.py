@@ -1,45 +1,51 @@
 # medications/signals.py
 
-from django.db.models.signals import post_save, pre_save
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import PatientMedication, MedicationReminder
+from .models import (
+    Medication, PatientMedication, MedicationReminder, MedicationLog, DrugInteraction, AllergenGroup,
+    Contraindication,
+)
+from .allergies import PROFILE_SOURCES, allergy_index, sync_patient_allergies
+from .catalogue import catalogue_index
+from .classification import classification_index
+from .contraindications import contraindication_index
+from .indexes import ALLERGEN_GROUPS, CONTRAINDICATIONS, DRUG_INTERACTIONS, MEDICATION_CATALOGUE, bump_generation
+from .interactions import interaction_index, pair_key
+from .regimens import rescan_interaction_change, sync_patient_medication_names
+from .rollups import apply_log
+from .summaries import queue_summary_refresh
+from . import schedules
+from .scheduling import compute_next_trigger
+from health.models import HealthProfile
+from users.models import PatientProfile
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def is_cascade(instance, kwargs):
+    """Whether a post_delete is part of deleting something else (a medication or patient)"""
+    origin = kwargs.get('origin')
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not type(instance)
+
+
 @receiver(post_save, sender=PatientMedication)
 def create_default_reminders(sender, instance, created, **kwargs):
     """Create default reminders when a new medication is added"""
-    if created and instance.frequency != 'as_needed':
+    if created:
         try:
-            # Create reminders based on frequency
-            if instance.frequency == 'once_daily':
-                MedicationReminder.objects.create(
-                    medication=instance,
-                    reminder_time=timezone.now().time().replace(hour=9, minute=0, second=0),
-                    days_of_week=[0, 1, 2, 3, 4, 5, 6]  # Every day
-                )
-            elif instance.frequency == 'twice_daily':
-                MedicationReminder.objects.create(
-                    medication=instance,
-                    reminder_time=timezone.now().time().replace(hour=9, minute=0, second=0),
-                    days_of_week=[0, 1, 2, 3, 4, 5, 6]
-                )
-                MedicationReminder.objects.create(
-                    medication=instance,
-                    reminder_time=timezone.now().time().replace(hour=21, minute=0, second=0),
-                    days_of_week=[0, 1, 2, 3, 4, 5, 6]
-                )
-            elif instance.frequency == 'thrice_daily':
-                for hour in [8, 14, 20]:
-                    MedicationReminder.objects.create(
-                        medication=instance,
-                        reminder_time=timezone.now().time().replace(hour=hour, minute=0, second=0),
-                        days_of_week=[0, 1, 2, 3, 4, 5, 6]
-                    )
-            
-            logger.info(f"Created default reminders for medication: {instance.name}")
+            reminders = schedules.create_default_reminders([instance])
+            if reminders:
+                logger.info(f"Created default reminders for medication: {instance.name}")
             
         except Exception as e:
             logger.error(f"Error creating reminders for medication {instance.name}: {str(e)}")
@@ -47,12 +53,165 @@ def create_default_reminders(sender, instance, created, **kwargs):
 
 @receiver(pre_save, sender=PatientMedication)
 def check_expiration(sender, instance, **kwargs):
-    """Check if medication is expired and update status"""
-    if instance.end_date and instance.end_date < timezone.now().date():
+    """Mark a medication saved past its end date as expired"""
+    # Its reminders are switched off by the expire_medications sweep
+    if instance.is_active and instance.end_date and instance.end_date < timezone.now().date():
         instance.is_active = False
         instance.reason_for_discontinuation = "Expired"
-        
-        # Deactivate all reminders
-        instance.reminders.update(is_active=False)
-        
-        logger.info(f"Medication {instance.name} marked as expired and deactivated")
\ No newline at end of file
+
+
+@receiver(pre_save, sender=MedicationReminder)
+def schedule_next_trigger(sender, instance, **kwargs):
+    """Keep next_trigger in step with the reminder's time, days and status"""
+    if instance.is_active:
+        instance.next_trigger = compute_next_trigger(
+            instance.reminder_time, instance.days_of_week, timezone.now(), instance.day_of_month
+        )
+    else:
+        instance.next_trigger = None
+
+
+@receiver(post_save, sender=DrugInteraction)
+@receiver(post_delete, sender=DrugInteraction)
+def refresh_interaction_index(sender, instance, **kwargs):
+    """Drop the cached interaction index so the next check rebuilds it, here and in other processes"""
+    bump_generation(DRUG_INTERACTIONS)
+    interaction_index.invalidate()
+    # Rebuilds that raced the open transaction may have cached the old rows
+    transaction.on_commit(interaction_index.invalidate)
+
+
+@receiver(pre_save, sender=DrugInteraction)
+def remember_previous_pair(sender, instance, **kwargs):
+    """Keep the stored pair of an updated interaction so its old patients are rescanned too"""
+    instance._previous_pair = None
+    if not instance._state.adding:
+        instance._previous_pair = DrugInteraction.objects.filter(pk=instance.pk).values_list(
+            'medication_1', 'medication_2'
+        ).first()
+
+
+# Registered after refresh_interaction_index, so its on_commit drop runs first
+@receiver(post_save, sender=DrugInteraction)
+@receiver(post_delete, sender=DrugInteraction)
+def rescan_patients_taking_pair(sender, instance, **kwargs):
+    """Update the warnings of patients taking both drugs once the interaction is committed"""
+    pairs = {pair_key(instance.medication_1, instance.medication_2)}
+    previous = getattr(instance, '_previous_pair', None)
+    if previous:
+        pairs.add(pair_key(*previous))
+    transaction.on_commit(partial(rescan_interaction_change, pairs))
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def refresh_catalogue_index(sender, instance, **kwargs):
+    """Drop the cached catalogue and classification indexes, here and in other processes"""
+    bump_generation(MEDICATION_CATALOGUE)
+    catalogue_index.invalidate()
+    transaction.on_commit(catalogue_index.invalidate)
+
+
+@receiver(post_save, sender=Medication)
+@receiver(post_delete, sender=Medication)
+def refresh_classification_index(sender, instance, **kwargs):
+    """Drop the cached drug classes and ATC codes of catalogue medications"""
+    classification_index.invalidate()
+    transaction.on_commit(classification_index.invalidate)
+
+
+@receiver(post_save, sender=AllergenGroup)
+@receiver(post_delete, sender=AllergenGroup)
+def refresh_allergy_index(sender, instance, **kwargs):
+    """Drop the cached allergen groups, here and in other processes"""
+    bump_generation(ALLERGEN_GROUPS)
+    allergy_index.invalidate()
+    transaction.on_commit(allergy_index.invalidate)
+
+
+@receiver(post_save, sender=Contraindication)
+@receiver(post_delete, sender=Contraindication)
+def refresh_contraindication_index(sender, instance, **kwargs):
+    """Drop the cached contraindication matrix so the next check rebuilds it, here and in other processes"""
+    bump_generation(CONTRAINDICATIONS)
+    contraindication_index.invalidate()
+    transaction.on_commit(contraindication_index.invalidate)
+
+
+@receiver(post_save, sender=PatientProfile)
+def parse_patient_profile_allergies(sender, instance, **kwargs):
+    """Keep the patient's parsed allergy entries in step with their profile"""
+    sync_patient_allergies(instance.user_id, 'patient_profile', instance.allergies)
+
+
+@receiver(post_save, sender=HealthProfile)
+def parse_health_profile_allergies(sender, instance, **kwargs):
+    """Keep the patient's parsed allergy entries in step with their health profile"""
+    sync_patient_allergies(instance.user_id, 'health_profile', instance.allergies)
+
+
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_delete, sender=HealthProfile)
+def remove_profile_allergies(sender, instance, **kwargs):
+    """Drop the allergy entries parsed from a deleted profile"""
+    source = next(source for source, model in PROFILE_SOURCES if model is sender)
+    sync_patient_allergies(instance.user_id, source, '')
+
+
+@receiver(pre_save, sender=MedicationLog)
+def remember_previous_log(sender, instance, **kwargs):
+    """Keep the stored state of an updated log so its rollup can be moved"""
+    instance._rollup_previous = None
+    if not instance._state.adding:
+        instance._rollup_previous = MedicationLog.objects.filter(pk=instance.pk).values(
+            'medication_id', 'scheduled_time', 'status'
+        ).first()
+
+
+@receiver(post_save, sender=MedicationLog)
+def update_adherence_rollup(sender, instance, created, **kwargs):
+    """Apply a new or changed log to the daily adherence rollup"""
+    current = {
+        'medication_id': instance.medication_id,
+        'scheduled_time': instance.scheduled_time,
+        'status': instance.status,
+    }
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous == current:
+        return
+    
+    if previous:
+        apply_log(previous['medication_id'], previous['scheduled_time'], previous['status'], -1)
+    apply_log(instance.medication_id, instance.scheduled_time, instance.status, 1)
+
+
+@receiver(post_delete, sender=MedicationLog)
+def remove_from_adherence_rollup(sender, instance, **kwargs):
+    """Take a deleted log out of the daily adherence rollup"""
+    if is_cascade(instance, kwargs):
+        return  # the medication's rollup rows are deleted with it in one statement
+    apply_log(instance.medication_id, instance.scheduled_time, instance.status, -1)
+
+
+@receiver(post_save, sender=PatientMedication)
+@receiver(post_delete, sender=PatientMedication)
+def refresh_summary_for_medication(sender, instance, **kwargs):
+    """Refresh the patient's panel summary once the change is committed"""
+    queue_summary_refresh(patient_ids=[instance.patient_id])
+
+
+@receiver(post_save, sender=MedicationLog)
+@receiver(post_delete, sender=MedicationLog)
+def refresh_summary_for_log(sender, instance, **kwargs):
+    """Refresh the patient's panel summary once the log is committed"""
+    if is_cascade(instance, kwargs):
+        return  # refreshed once by the deleted medication's own handler
+    # Resolved to patients in one query at commit, not one FK fetch per log
+    queue_summary_refresh(medication_ids=[instance.medication_id])
+
+
+@receiver(post_save, sender=PatientMedication)
+@receiver(post_delete, sender=PatientMedication)
+def sync_medication_names(sender, instance, **kwargs):
+    """Re-post the patient's active medication names once the change is committed"""
+    transaction.on_commit(partial(sync_patient_medication_names, instance.patient_id))
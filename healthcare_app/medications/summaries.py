@@ -0,0 +1,165 @@
+# medications/summaries.py
+
+import logging
+from datetime import timedelta
+from functools import partial
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .adherence import rollup_totals
+from .forecasting import forecast_run_out, load_supply
+from .interactions import interaction_index
+from .models import MedicationAdherenceRollup, PatientMedication, PatientSummary
+from users.models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = (
+    'taken_7d', 'total_7d', 'adherence_7d', 'taken_30d', 'total_30d', 'adherence_30d',
+    'active_medications', 'next_refill_date', 'interaction_warnings',
+)
+
+# Columns of the doctor panel endpoint
+PANEL_SUMMARY_FIELDS = (
+    'adherence_7d', 'adherence_30d', 'active_medications', 'next_refill_date',
+    'interaction_warnings', 'refreshed_at',
+)
+
+
+def _rate(taken, total):
+    return round(taken / total * 100, 2) if total else None
+
+
+def compute_summaries(patient_ids, today=None):
+    """Unsaved PatientSummary rows for `patient_ids`, from a fixed handful of grouped queries"""
+    today = today or timezone.localdate()
+    now = timezone.now()
+    summaries = {
+        patient_id: PatientSummary(patient_id=patient_id, refreshed_at=now)
+        for patient_id in patient_ids
+    }
+
+    last_7 = rollup_totals(filter=Q(date__gt=today - timedelta(days=7)))
+    last_30 = rollup_totals()
+    rows = MedicationAdherenceRollup.objects.filter(
+        medication__patient_id__in=patient_ids,
+        date__gt=today - timedelta(days=30),
+        date__lte=today
+    ).values('medication__patient_id').annotate(
+        taken_7d=last_7['taken_doses'],
+        total_7d=last_7['total_doses'],
+        taken_30d=last_30['taken_doses'],
+        total_30d=last_30['total_doses']
+    ).order_by()
+    for row in rows:
+        summary = summaries[row['medication__patient_id']]
+        for field in ('taken_7d', 'total_7d', 'taken_30d', 'total_30d'):
+            setattr(summary, field, row[field])
+
+    regimens = {}
+    active = PatientMedication.objects.filter(patient_id__in=patient_ids, is_active=True)
+    for patient_id, name in active.values_list('patient_id', 'name').iterator():
+        regimens.setdefault(patient_id, []).append(name)
+
+    supply = load_supply(PatientMedication.objects.filter(patient_id__in=patient_ids))
+    if supply['medication_id']:
+        run_out = forecast_run_out(supply)
+        for i in np.flatnonzero(~np.isnat(run_out)).tolist():
+            summary = summaries[supply['patient_id'][i]]
+            day = run_out[i].item()
+            if summary.next_refill_date is None or day < summary.next_refill_date:
+                summary.next_refill_date = day
+
+    for patient_id, summary in summaries.items():
+        summary.adherence_7d = _rate(summary.taken_7d, summary.total_7d)
+        summary.adherence_30d = _rate(summary.taken_30d, summary.total_30d)
+        names = regimens.get(patient_id, [])
+        summary.active_medications = len(names)
+        summary.interaction_warnings = len(interaction_index.find_interactions(names))
+    return list(summaries.values())
+
+
+def refresh_summaries(patient_ids, today=None):
+    """Recompute and store the summaries of `patient_ids`"""
+    patient_ids = list(set(patient_ids))
+    if not patient_ids:
+        return 0
+
+    summaries = compute_summaries(patient_ids, today)
+    with transaction.atomic():
+        # Patients deleted since (their medications cascade) are skipped
+        stored = dict(CustomUser.objects.filter(pk__in=patient_ids).values_list('pk', 'medication_summary'))
+        summaries = [summary for summary in summaries if summary.pk in stored]
+        PatientSummary.objects.bulk_update(
+            [summary for summary in summaries if stored[summary.pk] is not None],
+            SUMMARY_FIELDS + ('refreshed_at',),
+            batch_size=1000
+        )
+        PatientSummary.objects.bulk_create(
+            [summary for summary in summaries if stored[summary.pk] is None],
+            batch_size=1000
+        )
+    return len(summaries)
+
+
+def refresh_patient_summary(patient_id):
+    """Refresh one patient's summary; used after their logs or medications change"""
+    try:
+        refresh_summaries([patient_id])
+    except Exception as e:
+        logger.error(f"Error refreshing the summary of patient {patient_id}: {str(e)}")
+
+
+def _refresh_queued(pending):
+    patient_ids = set(pending['patients'])
+    if pending['medications']:
+        patient_ids.update(PatientMedication.objects.filter(
+            pk__in=pending['medications']
+        ).values_list('patient_id', flat=True))
+    pending['patients'].clear()
+    pending['medications'].clear()
+    try:
+        refresh_summaries(patient_ids)
+    except Exception as e:
+        logger.error(f"Error refreshing the summaries of patients {sorted(patient_ids)}: {str(e)}")
+
+
+def queue_summary_refresh(patient_ids=(), medication_ids=()):
+    """
+    Refresh the summaries of `patient_ids` and of the patients owning
+    `medication_ids` once the current transaction commits. However many
+    rows a transaction changes, its patients are refreshed in one batch.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _refresh_queued({'patients': set(patient_ids), 'medications': set(medication_ids)})
+        return
+
+    # One pending batch per savepoint context, kept on the outermost atomic
+    # block: a rolled-back savepoint or transaction takes its batch with it
+    batches = connection.atomic_blocks[0].__dict__.setdefault('_summary_refreshes', {})
+    key = tuple(connection.savepoint_ids)
+    pending = batches.get(key)
+    if pending is None or not (pending['patients'] or pending['medications']):
+        pending = batches[key] = {'patients': set(), 'medications': set()}
+        transaction.on_commit(partial(_refresh_queued, pending))
+    pending['patients'].update(patient_ids)
+    pending['medications'].update(medication_ids)
+
+
+def refresh_all_summaries(batch_size=1000, today=None):
+    """Refresh every patient with medications, in batches; run nightly so the 7/30-day windows move"""
+    patient_ids = PatientMedication.objects.values_list('patient_id', flat=True).distinct().order_by('patient_id')
+    refreshed = 0
+    batch = []
+    for patient_id in patient_ids.iterator(chunk_size=batch_size):
+        batch.append(patient_id)
+        if len(batch) >= batch_size:
+            refreshed += refresh_summaries(batch, today)
+            batch = []
+    if batch:
+        refreshed += refresh_summaries(batch, today)
+    return refreshed
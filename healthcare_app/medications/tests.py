@@ -1,9 +1,10 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from .models import *
-from users.models import PatientProfile, DoctorProfile
+from users.models import PatientProfile, DoctorProfile, CareTeamMember
 import uuid
 
 User = get_user_model()
@@ -305,4 +306,2172 @@ class AdverseEventReportingTests(APITestCase):
         
         # Check updated
         adverse_event.refresh_from_db()
-        self.assertTrue(adverse_event.reported_to_doctor)
\ No newline at end of file
+        self.assertTrue(adverse_event.reported_to_doctor)
+
+class InteractionIndexTests(APITestCase):
+    def setUp(self):
+        from .interactions import interaction_index
+        self.index = interaction_index
+        self.index.invalidate()
+
+        self.user = User.objects.create_user(
+            username='index_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+
+        DrugInteraction.objects.create(
+            medication_1='Warfarin',
+            medication_2='Aspirin',
+            severity='major',
+            description='Increased bleeding risk'
+        )
+
+    def test_lookup_is_case_and_order_insensitive(self):
+        self.assertIsNotNone(self.index.lookup('aspirin', ' WARFARIN '))
+        self.assertIsNone(self.index.lookup('aspirin', 'ibuprofen'))
+
+    def test_regimen_check_uses_no_queries_once_warm(self):
+        self.index.get_index()
+        medications = ['Drug %d' % i for i in range(13)] + ['warfarin', 'ASPIRIN']
+
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/medications/check/', {'medications': medications}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['interactions']), 1)
+        self.assertEqual(response.data['interactions'][0]['medication_1'], 'warfarin')
+        self.assertEqual(response.data['interactions'][0]['severity'], 'major')
+
+    def test_index_rebuilt_on_change(self):
+        self.assertIsNone(self.index.lookup('Simvastatin', 'Clarithromycin'))
+
+        interaction = DrugInteraction.objects.create(
+            medication_1='Simvastatin',
+            medication_2='Clarithromycin',
+            severity='contraindicated',
+            description='Rhabdomyolysis risk'
+        )
+        self.assertIsNotNone(self.index.lookup('clarithromycin', 'simvastatin'))
+
+        interaction.delete()
+        self.assertIsNone(self.index.lookup('clarithromycin', 'simvastatin'))
+
+    def test_writes_from_other_processes_reload_the_index(self):
+        from django.test import override_settings
+        from .catalogue import catalogue_index
+        from .classification import classification_index
+        from .indexes import DRUG_INTERACTIONS, MEDICATION_CATALOGUE, bump_generation
+
+        self.index.get_index()
+        catalogue_index.get_index()
+        classification_index.get_index()
+        # Bulk writes elsewhere send no signals to this process; the
+        # writers bump the shared generations instead
+        DrugInteraction.objects.bulk_create([DrugInteraction(
+            medication_1='Simvastatin', medication_2='Clarithromycin',
+            severity='contraindicated', description='Rhabdomyolysis risk'
+        )])
+        bump_generation(DRUG_INTERACTIONS)
+        Medication.objects.bulk_create([Medication(
+            name='Simvastatin', dosage_form='tablet', strength='20mg', drug_class='Statins'
+        )])
+        bump_generation(MEDICATION_CATALOGUE)
+
+        # Served from memory until the check interval is up
+        self.assertIsNone(self.index.lookup('simvastatin', 'clarithromycin'))
+        with override_settings(INDEX_CHECK_INTERVAL=0):
+            self.assertIsNotNone(self.index.lookup('simvastatin', 'clarithromycin'))
+            self.assertEqual(catalogue_index.search('simva')[0]['name'], 'Simvastatin')
+            self.assertEqual(classification_index.classify('simvastatin')[1], 'statins')
+
+            # An unchanged version costs one read of the generation, not
+            # an aggregate over the table or a reload of the rows
+            with self.assertNumQueries(1):
+                self.index.get_index()
+
+    def test_check_action_uses_index(self):
+        self.index.get_index()
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/medications/interactions/check/', {
+                'medication1': 'aspirin',
+                'medication2': 'warfarin'
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['severity'], 'major')
+
+
+class MedicationAdherenceTests(APITestCase):
+    url = '/api/medications/adherence/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='adherence_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_medication(self, name, statuses, days_ago=1):
+        medication = PatientMedication.objects.create(
+            patient=self.user,
+            name=name,
+            dosage='10mg',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        scheduled = timezone.now() - timezone.timedelta(days=days_ago)
+        for log_status in statuses:
+            MedicationLog.objects.create(
+                medication=medication,
+                scheduled_time=scheduled,
+                status=log_status
+            )
+        return medication
+
+    def test_adherence_summary(self):
+        self.add_medication('Metformin', ['taken', 'late', 'missed', 'skipped'])
+        self.add_medication('Lisinopril', [])
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_medications'], 2)
+        self.assertEqual(response.data['overall_adherence'], 50.0)
+        self.assertEqual(response.data['weekly_adherence'], 50.0)
+        metformin = next(m for m in response.data['medications'] if m['medication_name'] == 'Metformin')
+        self.assertEqual(metformin['total_doses'], 4)
+        self.assertEqual(metformin['taken_doses'], 2)
+        self.assertEqual(metformin['missed_doses'], 1)
+        self.assertIsNotNone(metformin['last_taken'])
+
+    def test_date_window(self):
+        self.add_medication('Atorvastatin', ['missed', 'missed'], days_ago=30)
+        self.add_medication('Amlodipine', ['taken'], days_ago=1)
+        date_from = (timezone.now() - timezone.timedelta(days=7)).date()
+
+        response = self.client.get(self.url, {'from': date_from.isoformat()})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['summary']['total_doses'], 1)
+        self.assertEqual(response.data['overall_adherence'], 100.0)
+
+    def test_invalid_window(self):
+        response = self.client.get(self.url, {'from': 'last-week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_count_is_constant(self):
+        """Benchmark: one aggregation query no matter how many medications"""
+        for count in (1, 10, 25):
+            for i in range(count):
+                self.add_medication('Bench %d-%d' % (count, i), ['taken', 'missed'])
+
+            with self.assertNumQueries(1):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AdherenceRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='rollup_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Metformin',
+            dosage='500mg',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        self.scheduled = timezone.now() - timezone.timedelta(hours=1)
+
+    def rollup(self):
+        return MedicationAdherenceRollup.objects.get(medication=self.medication)
+
+    def test_logs_increment_rollup(self):
+        MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status='taken')
+        MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status='missed')
+
+        rollup = self.rollup()
+        self.assertEqual((rollup.taken, rollup.missed, rollup.total), (1, 1, 2))
+        self.assertEqual(rollup.last_taken, self.scheduled)
+
+    def test_status_change_and_delete(self):
+        log = MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status='taken')
+
+        log.status = 'skipped'
+        log.save()
+        rollup = self.rollup()
+        self.assertEqual((rollup.taken, rollup.skipped), (0, 1))
+        self.assertIsNone(rollup.last_taken)
+
+        log.delete()
+        self.assertEqual(self.rollup().total, 0)
+
+    def test_medication_delete_skips_per_log_updates(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        for hour in range(1, 21):
+            MedicationLog.objects.create(
+                medication=self.medication,
+                scheduled_time=timezone.now() - timezone.timedelta(hours=hour),
+                status='taken'
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.medication.delete()
+
+        rollup_updates = [q for q in queries if q['sql'].startswith('UPDATE') and 'adherence_rollup' in q['sql']]
+        self.assertEqual(rollup_updates, [])
+        self.assertFalse(MedicationAdherenceRollup.objects.exists())
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        for log_status in ('taken', 'late', 'missed'):
+            MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status=log_status)
+        MedicationAdherenceRollup.objects.all().delete()
+
+        call_command('rebuild_adherence_rollups', chunk_size=1, stdout=StringIO())
+
+        rollup = self.rollup()
+        self.assertEqual((rollup.taken, rollup.late, rollup.missed), (1, 1, 1))
+        self.assertEqual(rollup.last_taken, self.scheduled)
+
+    def test_serializer_reads_rollup(self):
+        from .serializers import PatientMedicationSerializer
+
+        MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status='taken')
+        MedicationLog.objects.create(medication=self.medication, scheduled_time=self.scheduled, status='missed')
+
+        self.assertEqual(PatientMedicationSerializer(self.medication).data['adherence_rate'], 50.0)
+
+
+class PatientMedicationQueryCountTests(APITestCase):
+    url = '/api/medications/patient-medications/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='list_patient',
+            password='testpass123',
+            user_type='patient',
+            first_name='List',
+            last_name='Patient'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_medications(self, count):
+        yesterday = timezone.now().date() - timezone.timedelta(days=1)
+        for i in range(count):
+            medication = PatientMedication.objects.create(
+                patient=self.user,
+                name='Medication %d' % i,
+                dosage='10mg',
+                frequency='as_needed',
+                start_date=yesterday
+            )
+            # Bypass check_expiration so the row stays active but expired
+            PatientMedication.objects.filter(pk=medication.pk).update(end_date=yesterday)
+            MedicationLog.objects.create(
+                medication=medication,
+                scheduled_time=timezone.now() - timezone.timedelta(hours=1),
+                status='taken'
+            )
+
+    def test_fixed_query_count(self):
+        for count in (1, 20):
+            self.add_medications(count)
+
+            # Keyset pagination: the annotated page query, plus one COUNT(*)
+            # for the first page's total once it doesn't hold every row
+            total = PatientMedication.objects.filter(patient=self.user).count()
+            with self.assertNumQueries(1 if total <= 10 else 2):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], total)
+            self.assertEqual(response.data['results'][0]['adherence_rate'], 100.0)
+            self.assertEqual(response.data['results'][0]['patient_name'], 'List Patient')
+
+            for action in ('active', 'expired'):
+                with self.assertNumQueries(1):
+                    response = self.client.get(self.url + action + '/')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertTrue(response.data)
+
+
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        from .scheduling import reminders_due
+
+        self.user = User.objects.create_user(
+            username='scheduler_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Levothyroxine',
+            dosage='50mcg',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        self.reminder = MedicationReminder.objects.create(
+            medication=self.medication,
+            reminder_time='08:00',
+            days_of_week=[0, 1, 2, 3, 4, 5, 6]
+        )
+
+        self.sent = []
+        receiver = lambda sender, reminders, **kwargs: self.sent.extend(reminders)
+        reminders_due.connect(receiver, weak=False, dispatch_uid='test_reminders_due')
+        self.addCleanup(reminders_due.disconnect, dispatch_uid='test_reminders_due')
+
+    def test_compute_next_trigger(self):
+        from datetime import time
+        from .scheduling import compute_next_trigger
+
+        monday = timezone.make_aware(timezone.datetime(2024, 1, 1, 10, 0))
+        self.assertEqual(
+            compute_next_trigger(time(9, 0), [0], monday),
+            timezone.make_aware(timezone.datetime(2024, 1, 8, 9, 0))
+        )
+        self.assertEqual(
+            compute_next_trigger(time(9, 0), [0, 1], monday),
+            timezone.make_aware(timezone.datetime(2024, 1, 2, 9, 0))
+        )
+        self.assertIsNone(compute_next_trigger(time(9, 0), [], monday))
+
+        # Monthly: the 31st falls on the last day of shorter months
+        self.assertEqual(
+            compute_next_trigger(time(9, 0), [], timezone.make_aware(timezone.datetime(2024, 1, 31, 10, 0)), 31),
+            timezone.make_aware(timezone.datetime(2024, 2, 29, 9, 0))
+        )
+        self.assertEqual(
+            compute_next_trigger(time(9, 0), [], timezone.make_aware(timezone.datetime(2024, 12, 15, 10, 0)), 15),
+            timezone.make_aware(timezone.datetime(2025, 1, 15, 9, 0))
+        )
+
+    def test_dispatch_due_reminder(self):
+        from .scheduling import ReminderScheduler
+
+        due = self.reminder.next_trigger
+        self.assertIsNotNone(due)
+        scheduler = ReminderScheduler()
+
+        self.assertEqual(scheduler.run_once(now=due - timezone.timedelta(minutes=1)), 0)
+        self.assertEqual(scheduler.run_once(now=due + timezone.timedelta(seconds=1)), 1)
+        self.assertEqual(self.sent, [self.reminder])
+
+        self.reminder.refresh_from_db()
+        self.assertEqual(self.reminder.next_trigger, due + timezone.timedelta(days=1))
+        self.assertIsNotNone(self.reminder.last_triggered)
+
+        # Nothing fires twice for the same slot
+        self.assertEqual(scheduler.run_once(now=due + timezone.timedelta(seconds=2)), 0)
+
+    def test_stale_and_overdue_reminders_are_not_sent(self):
+        from .scheduling import ReminderScheduler
+
+        due = self.reminder.next_trigger
+        scheduler = ReminderScheduler()
+        scheduler.refill(due - timezone.timedelta(minutes=1))
+
+        # Moved after it was loaded: the heap entry no longer matches
+        MedicationReminder.objects.filter(pk=self.reminder.pk).update(
+            next_trigger=due + timezone.timedelta(hours=1)
+        )
+        self.assertEqual(scheduler.run_once(now=due), 0)
+
+        # Far past its slot: advanced without sending
+        late = due + timezone.timedelta(hours=3)
+        self.assertEqual(ReminderScheduler().run_once(now=late), 0)
+        self.reminder.refresh_from_db()
+        self.assertGreater(self.reminder.next_trigger, late)
+        self.assertEqual(self.sent, [])
+
+    def test_refill_seeks_the_trigger_index(self):
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('query plan wording is SQLite-specific')
+        # The query ReminderScheduler.refill runs
+        plan = MedicationReminder.objects.filter(
+            is_active=True, next_trigger__lte=timezone.now(), medication__is_active=True
+        ).values_list('reminder_id', 'next_trigger').explain()
+        self.assertIn('USING INDEX reminder_active_trigger_idx (next_trigger<?)', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_inactive_medication_reminders_are_not_reloaded(self):
+        from .scheduling import ReminderScheduler
+
+        due = self.reminder.next_trigger
+        PatientMedication.objects.filter(pk=self.medication.pk).update(is_active=False)
+        scheduler = ReminderScheduler()
+
+        scheduler.refill(due - timezone.timedelta(minutes=1))
+        self.assertEqual(scheduler._heap, [])
+        self.assertEqual(scheduler.run_once(now=due), 0)
+
+        # Reactivated after the slot passed: advanced on the next refill without sending
+        PatientMedication.objects.filter(pk=self.medication.pk).update(is_active=True)
+        late = due + timezone.timedelta(hours=3)
+        self.assertEqual(ReminderScheduler().run_once(now=late), 0)
+        self.reminder.refresh_from_db()
+        self.assertGreater(self.reminder.next_trigger, late)
+
+
+class ReminderWeekdayMaskTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='weekday_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Alendronate',
+            dosage='70mg',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+
+    def test_mask_follows_days_of_week(self):
+        reminder = MedicationReminder.objects.create(
+            medication=self.medication,
+            reminder_time='07:00',
+            days_of_week=[0, 2, 6]
+        )
+        self.assertEqual(reminder.weekday_mask, 0b1000101)
+
+        reminder.days_of_week = [1]
+        reminder.save(update_fields=['days_of_week'])
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.weekday_mask, 0b10)
+
+    def test_todays_reminders(self):
+        today = timezone.now().weekday()
+        other_day = (today + 1) % 7
+        later = MedicationReminder.objects.create(
+            medication=self.medication, reminder_time='20:00', days_of_week=[today, other_day]
+        )
+        earlier = MedicationReminder.objects.create(
+            medication=self.medication, reminder_time='08:00', days_of_week=[today]
+        )
+        MedicationReminder.objects.create(
+            medication=self.medication, reminder_time='12:00', days_of_week=[other_day]
+        )
+
+        response = self.client.get('/api/medications/reminders/todays_reminders/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['reminder_id'] for r in response.data],
+            [str(earlier.reminder_id), str(later.reminder_id)]
+        )
+        self.assertEqual(MedicationReminder.objects.for_weekday(other_day).count(), 2)
+
+    def test_weekday_and_monthly_lookups_seek_partial_indexes(self):
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('query plan wording is SQLite-specific')
+        today = timezone.localdate()
+
+        plan = MedicationReminder.objects.filter(is_active=True).for_weekday(today.weekday()).explain()
+        self.assertIn('USING INDEX reminder_active_weekday_idx (weekday_mask=?)', plan)
+
+        plan = MedicationReminder.objects.for_date(today).explain()
+        self.assertIn('USING INDEX reminder_active_weekday_idx (weekday_mask=?)', plan)
+        self.assertIn('USING INDEX reminder_active_monthday_idx (day_of_month=?)', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+class BatchDoseLoggingTests(APITestCase):
+    url = '/api/medications/logs/batch/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='batch_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.medications = [
+            PatientMedication.objects.create(
+                patient=self.user,
+                name='Morning %d' % i,
+                dosage='1 tablet',
+                frequency='as_needed',
+                start_date=timezone.now().date()
+            )
+            for i in range(3)
+        ]
+        self.reminder = MedicationReminder.objects.create(
+            medication=self.medications[0],
+            reminder_time='08:00',
+            days_of_week=[0, 1, 2, 3, 4, 5, 6]
+        )
+        self.scheduled = (timezone.now() - timezone.timedelta(minutes=30)).isoformat()
+
+    def event(self, medication, **extra):
+        return dict({
+            'medication': str(medication.medication_id),
+            'scheduled_time': self.scheduled,
+            'status': 'taken'
+        }, **extra)
+
+    def test_batch_creates_logs_and_updates_reminders(self):
+        events = [self.event(self.medications[0], reminder=str(self.reminder.reminder_id))]
+        events += [self.event(medication) for medication in self.medications[1:]]
+        # A slot that has come due: logging it moves the reminder on to the next one
+        stale = timezone.now() - timezone.timedelta(hours=1)
+        MedicationReminder.objects.filter(pk=self.reminder.pk).update(next_trigger=stale, updated_at=stale)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, events, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 3)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(MedicationLog.objects.filter(confirmed_by=self.user).count(), 3)
+        self.reminder.refresh_from_db()
+        self.assertIsNotNone(self.reminder.last_triggered)
+        self.assertGreater(self.reminder.next_trigger, self.reminder.last_triggered)
+        self.assertEqual(self.reminder.updated_at, self.reminder.last_triggered)
+        self.assertEqual(MedicationAdherenceRollup.objects.get(medication=self.medications[1]).taken, 1)
+        # The doctor panel sees the batch without waiting for the nightly refresh
+        self.assertEqual(PatientSummary.objects.get(patient=self.user).total_7d, 3)
+
+    def test_partial_failure_is_reported_per_item(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        other = PatientMedication.objects.create(
+            patient=stranger,
+            name='Not mine',
+            dosage='1 tablet',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        events = [
+            self.event(self.medications[0]),
+            self.event(other),
+            self.event(self.medications[1], status='forgotten'),
+        ]
+
+        response = self.client.post(self.url, events, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        self.assertIn('medication', response.data['errors'][0]['errors'])
+        self.assertIn('status', response.data['errors'][1]['errors'])
+        self.assertFalse(MedicationLog.objects.filter(medication=other).exists())
+
+    def test_rejects_non_list(self):
+        response = self.client.post(self.url, self.event(self.medications[0]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(APITestCase):
+    url = '/api/medications/logs/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='paging_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+        medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Paged',
+            dosage='1 tablet',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        # Pairs of logs share a scheduled_time so pages split on the tiebreaker
+        base = timezone.now() - timezone.timedelta(days=1)
+        for i in range(25):
+            MedicationLog.objects.create(
+                medication=medication,
+                scheduled_time=base - timezone.timedelta(hours=i // 2),
+                status='taken'
+            )
+        self.expected = list(MedicationLog.objects.order_by('-scheduled_time', '-log_id').values_list('log_id', flat=True))
+
+    def collect(self, url):
+        seen = []
+        first = True
+        while url:
+            # The first page also counts the rows; cursor pages never do
+            with self.assertNumQueries(2 if first else 1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            if first:
+                self.assertEqual(response.data['count'], len(self.expected))
+            else:
+                self.assertNotIn('count', response.data)
+            first = False
+            seen.extend(row['log_id'] for row in response.data['results'])
+            last = response
+            url = response.data['next']
+        return seen, last
+
+    def test_walks_every_row_once_in_order(self):
+        seen, last = self.collect(self.url + '?page_size=4')
+        self.assertEqual(seen, [str(log_id) for log_id in self.expected])
+
+        # Walking back from the last page returns the previous rows
+        response = self.client.get(last.data['previous'])
+        self.assertEqual(
+            [row['log_id'] for row in response.data['results']],
+            [str(log_id) for log_id in self.expected[-5:-1]]
+        )
+
+    def test_page_size_is_capped(self):
+        from api.pagination import KeysetPagination
+
+        KeysetPagination.max_page_size, original = 5, KeysetPagination.max_page_size
+        self.addCleanup(setattr, KeysetPagination, 'max_page_size', original)
+
+        response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_single_page_counts_without_a_count_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'page_size': 50})
+        self.assertEqual(response.data['count'], 25)
+
+    def test_page_number_still_available(self):
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MedicationLogExportTests(APITestCase):
+    url = '/api/medications/logs/export/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='export_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Exported',
+            dosage='1 tablet',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        other = User.objects.create_user(
+            username='export_other',
+            password='testpass123',
+            user_type='patient'
+        )
+        other_medication = PatientMedication.objects.create(
+            patient=other,
+            name='Hidden',
+            dosage='1 tablet',
+            frequency='as_needed',
+            start_date=timezone.now().date()
+        )
+        self.today = timezone.localdate()
+        for days in range(5):
+            MedicationLog.objects.create(
+                medication=self.medication,
+                scheduled_time=timezone.now() - timezone.timedelta(days=days),
+                status='taken' if days % 2 else 'missed',
+                notes='said "ok", then left' if days == 0 else ''
+            )
+        MedicationLog.objects.create(
+            medication=other_medication,
+            scheduled_time=timezone.now(),
+            status='taken'
+        )
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        import csv
+        import io
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['medication__name'] for row in rows}, {'Exported'})
+        self.assertEqual(rows[-1]['notes'], 'said "ok", then left')
+
+    def test_ndjson_export_with_window(self):
+        import json
+
+        start = (self.today - timezone.timedelta(days=2)).isoformat()
+        response = self.client.get(self.url, {'type': 'ndjson', 'from': start, 'to': self.today.isoformat()})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row['status'] for row in rows], ['missed', 'taken', 'missed'])
+        self.assertEqual(rows[0]['medication_id'], str(self.medication.medication_id))
+
+    def test_invalid_parameters(self):
+        for params in ({'type': 'xml'}, {'from': 'yesterday'}, {'medication': 'nope'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogueSearchTests(APITestCase):
+    url = '/api/medications/catalogue/search/'
+
+    def setUp(self):
+        from .catalogue import catalogue_index
+        self.index = catalogue_index
+        self.index.invalidate()
+
+        self.user = User.objects.create_user(
+            username='catalogue_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+
+        for name, generic, brand in (
+            ('Amoxicillin', 'amoxicillin', 'Amoxil'),
+            ('Amlodipine', 'amlodipine besylate', 'Norvasc'),
+            ('Atorvastatin', 'atorvastatin calcium', 'Lipitor'),
+            ('Ibuprofen', 'ibuprofen', 'Advil'),
+        ):
+            Medication.objects.create(
+                name=name,
+                generic_name=generic,
+                brand_name=brand,
+                dosage_form='tablet',
+                strength='10mg'
+            )
+
+    def names(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_matches_across_fields(self):
+        self.assertCountEqual(self.names('am'), ['Amlodipine', 'Amoxicillin'])
+        self.assertEqual(self.names('lipi'), ['Atorvastatin'])
+        self.assertEqual(self.names('besyl'), ['Amlodipine'])
+
+    def test_typos_match_by_trigram(self):
+        self.assertEqual(self.names('ibuprofin')[:1], ['Ibuprofen'])
+        self.assertEqual(self.names('amoxicilin')[:1], ['Amoxicillin'])
+
+    def test_served_from_memory_once_warm(self):
+        self.index.get_index()
+        with self.assertNumQueries(0):
+            self.index.search('norv')
+
+    def test_rebuilt_on_catalogue_change(self):
+        self.assertEqual(self.names('parace'), [])
+        Medication.objects.create(name='Paracetamol', dosage_form='tablet', strength='500mg')
+        self.assertEqual(self.names('parace'), ['Paracetamol'])
+
+    def test_limit_and_missing_query(self):
+        self.assertEqual(len(self.names('a', limit=1)), 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoadInteractionsCommandTests(TestCase):
+    def load(self, content, suffix='.csv', **options):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('load_interactions', path, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_loads_orders_and_dedupes_pairs(self):
+        existing = DrugInteraction.objects.create(
+            medication_1='Warfarin',
+            medication_2='Aspirin',
+            severity='moderate',
+            description='Old text'
+        )
+        output = self.load(
+            'medication_1,medication_2,severity,description\n'
+            ' aspirin ,WARFARIN,major,Bleeding risk\n'
+            'Simvastatin,Clarithromycin,Contraindicated,Myopathy\n'
+            'clarithromycin,simvastatin,contraindicated,Rhabdomyolysis\n'
+            'Ibuprofen,Ibuprofen,minor,Same drug\n'
+            'Lisinopril,Potassium,unknown,Hyperkalaemia\n',
+            batch_size=1
+        )
+        # With one row per batch the repeated pair updates the row created before it
+        self.assertIn('1 created, 2 updated, 0 skipped, 2 invalid of 5 rows', output)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.severity, existing.description), ('major', 'Bleeding risk'))
+
+        loaded = DrugInteraction.objects.exclude(pk=existing.pk).get()
+        self.assertEqual((loaded.medication_1, loaded.medication_2), ('Clarithromycin', 'Simvastatin'))
+        self.assertEqual(loaded.description, 'Rhabdomyolysis')
+
+    def test_json_lines_and_skip_existing(self):
+        from .indexes import DRUG_INTERACTIONS, current_generation
+        from .interactions import interaction_index
+
+        DrugInteraction.objects.create(
+            medication_1='Aspirin',
+            medication_2='Warfarin',
+            severity='major',
+            description='Bleeding risk'
+        )
+        interaction_index.get_index()
+        generation = current_generation(DRUG_INTERACTIONS)
+        self.load(
+            '{"medication_1": "Warfarin", "medication_2": "Aspirin", "severity": "minor", "description": "x"}\n'
+            '\n'
+            '{"medication_1": "Sildenafil", "medication_2": "Nitroglycerin", "severity": "contraindicated", '
+            '"description": "Severe hypotension", "mechanism": "Additive vasodilation"}\n',
+            suffix='.jsonl',
+            skip_existing=True
+        )
+
+        self.assertEqual(DrugInteraction.objects.get(medication_1='Aspirin').severity, 'major')
+        # Bulk writes send no signals, so the loader bumps the generation
+        # every process's index checks
+        self.assertEqual(current_generation(DRUG_INTERACTIONS), generation + 1)
+        self.assertIsNotNone(interaction_index.lookup('nitroglycerin', 'sildenafil'))
+
+
+class ImportCatalogueCommandTests(TestCase):
+    header = 'name,strength,dosage_form,generic_name,atc_code,requires_prescription\n'
+
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f'{directory.name}/catalogue.csv'
+        self.checkpoint = f'{directory.name}/catalogue.checkpoint'
+
+    def run_import(self, content=None, **options):
+        from io import StringIO
+        from django.core.management import call_command
+
+        if content is not None:
+            with open(self.path, 'w') as f:
+                f.write(self.header + content)
+        out = StringIO()
+        call_command('import_catalogue', self.path, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_upserts_by_natural_key_and_skips_unchanged(self):
+        existing = Medication.objects.create(
+            name='Metformin', strength='500mg', dosage_form='tablet', generic_name='metformin'
+        )
+        output = self.run_import(
+            ' METFORMIN ,500MG,Tablet,metformin hydrochloride,a10ba02,yes\n'
+            'Metformin,850mg,tablet,metformin,A10BA02,yes\n'
+            'Aspirin,81mg,tablet,acetylsalicylic acid,B01AC06,no\n'
+            ',10mg,tablet,,,\n',
+            chunk_size=2
+        )
+        self.assertIn('2 created, 1 updated, 0 unchanged, 1 invalid', output)
+
+        existing.refresh_from_db()
+        self.assertEqual(existing.generic_name, 'metformin hydrochloride')
+        self.assertEqual(existing.atc_code, 'A10BA02')
+        self.assertFalse(Medication.objects.get(name='Aspirin').requires_prescription)
+
+        # Re-running the same file touches nothing
+        output = self.run_import(
+            'Metformin,850mg,tablet,metformin,A10BA02,yes\n'
+            'Aspirin,81mg,tablet,acetylsalicylic acid,B01AC06,no\n'
+        )
+        self.assertIn('0 created, 0 updated, 2 unchanged', output)
+        self.assertEqual(Medication.objects.count(), 3)
+
+    def test_import_marks_catalogue_and_classification_stale(self):
+        from django.test import override_settings
+        from .catalogue import catalogue_index
+        from .classification import classification_index
+
+        catalogue_index.get_index()
+        classification_index.get_index()
+        self.run_import('Atorvastatin,20mg,tablet,atorvastatin,C10AA05,yes\n')
+
+        with override_settings(INDEX_CHECK_INTERVAL=0):
+            self.assertEqual(catalogue_index.search('atorva')[0]['name'], 'Atorvastatin')
+            self.assertIn('C10', classification_index.classify('atorvastatin')[2])
+
+    def test_resumes_from_checkpoint(self):
+        import json
+        import os
+
+        content = ''.join(f'Drug {i},10mg,tablet,,,\n' for i in range(5))
+        self.run_import(content, checkpoint=self.checkpoint)
+        self.assertFalse(os.path.exists(self.checkpoint))
+        Medication.objects.filter(name__in=['Drug 3', 'Drug 4']).delete()
+
+        # Pretend an earlier run stopped after committing the first four rows
+        stat = os.stat(self.path)
+        with open(self.checkpoint, 'w') as f:
+            json.dump({
+                'source': {'path': os.path.abspath(self.path), 'size': stat.st_size, 'mtime': stat.st_mtime},
+                'rows': 4
+            }, f)
+        output = self.run_import(checkpoint=self.checkpoint)
+
+        self.assertIn('Resuming after row 4', output)
+        self.assertTrue(Medication.objects.filter(name='Drug 4').exists())
+        self.assertFalse(Medication.objects.filter(name='Drug 3').exists())
+
+
+class MissedDoseDetectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='missed_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.medication = PatientMedication.objects.create(
+            patient=self.user,
+            name='Lisinopril',
+            dosage='10mg',
+            frequency='as_needed',
+            start_date=timezone.now().date() - timezone.timedelta(days=10)
+        )
+        self.reminder = MedicationReminder.objects.create(
+            medication=self.medication,
+            reminder_time='08:00',
+            days_of_week=[0, 1, 2, 3, 4, 5, 6]
+        )
+        # Pretend the reminder has existed for a while
+        self.now = timezone.now()
+        MedicationReminder.objects.filter(pk=self.reminder.pk).update(
+            created_at=self.now - timezone.timedelta(days=10)
+        )
+        self.slots = self.slots_in_last(timezone.timedelta(days=2))
+
+    def slots_in_last(self, lookback):
+        from .missed_doses import scheduled_slots
+
+        self.reminder.refresh_from_db()
+        return scheduled_slots(self.reminder, self.now - lookback, self.now - timezone.timedelta(hours=2))
+
+    def detect(self, **kwargs):
+        from .missed_doses import run_missed_dose_detection
+        return run_missed_dose_detection(now=self.now, **kwargs)
+
+    def test_logs_unconfirmed_slots_once(self):
+        confirmed = self.slots[0]
+        MedicationLog.objects.create(
+            medication=self.medication,
+            scheduled_time=confirmed + timezone.timedelta(minutes=40),
+            status='taken'
+        )
+
+        self.assertEqual(self.detect(), len(self.slots) - 1)
+        missed = MedicationLog.objects.filter(status='missed')
+        self.assertEqual(sorted(missed.values_list('scheduled_time', flat=True)), self.slots[1:])
+        self.assertEqual({log.reminder_id for log in missed}, {self.reminder.pk})
+
+        # Re-running (e.g. after a crash) adds nothing
+        self.assertEqual(self.detect(), 0)
+        self.assertEqual(missed.count(), len(self.slots) - 1)
+
+        rollups = MedicationAdherenceRollup.objects.filter(medication=self.medication)
+        self.assertEqual(sum(rollup.missed for rollup in rollups), len(self.slots) - 1)
+
+    def test_one_log_covers_one_slot(self):
+        from .missed_doses import scheduled_slots
+
+        later = MedicationReminder.objects.create(
+            medication=self.medication,
+            reminder_time='10:00',
+            days_of_week=[0, 1, 2, 3, 4, 5, 6]
+        )
+        MedicationReminder.objects.filter(pk=later.pk).update(created_at=self.now - timezone.timedelta(days=10))
+        later.refresh_from_db()
+        later_slots = scheduled_slots(later, self.now - timezone.timedelta(days=2), self.now - timezone.timedelta(hours=2))
+
+        # 09:00 is within the window of both the 08:00 and the 10:00 dose, but is only one dose
+        for slot in self.slots:
+            MedicationLog.objects.create(
+                medication=self.medication,
+                scheduled_time=slot + timezone.timedelta(hours=1),
+                status='taken'
+            )
+        # A log of the 10:00 reminder covers that dose even though 08:00 is closer
+        covered = self.slots[0] + timezone.timedelta(hours=2)
+        MedicationLog.objects.create(
+            medication=self.medication,
+            reminder=later,
+            scheduled_time=self.slots[0] + timezone.timedelta(minutes=30),
+            status='taken'
+        )
+
+        self.assertEqual(self.detect(), len(later_slots) - 1)
+        missed = MedicationLog.objects.filter(status='missed')
+        self.assertEqual(
+            sorted(missed.values_list('reminder_id', 'scheduled_time')),
+            [(later.pk, slot) for slot in later_slots if slot != covered]
+        )
+        self.assertEqual(self.detect(), 0)
+
+    def test_inactive_and_not_yet_started_are_ignored(self):
+        PatientMedication.objects.filter(pk=self.medication.pk).update(
+            start_date=timezone.localdate(self.now) + timezone.timedelta(days=1)
+        )
+        self.assertEqual(self.detect(), 0)
+
+        PatientMedication.objects.filter(pk=self.medication.pk).update(
+            start_date=timezone.localdate(self.now) - timezone.timedelta(days=10),
+            is_active=False
+        )
+        self.assertEqual(self.detect(), 0)
+
+    def test_patient_ranges_cover_all_patients(self):
+        from .missed_doses import patient_ranges
+
+        ranges = patient_ranges(4)
+        self.assertTrue(any(low <= self.user.pk < high for low, high in ranges))
+        self.assertEqual(patient_ranges(4)[0][0], self.user.pk)
+
+
+class RefillForecastTests(APITestCase):
+    url = '/api/medications/patient-medications/refills_due/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='refill_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+
+    def add(self, name, frequency, remaining, **extra):
+        return PatientMedication.objects.create(
+            patient=self.user,
+            name=name,
+            dosage='1 tablet',
+            frequency=frequency,
+            start_date=self.today,
+            total_quantity=60,
+            remaining_quantity=remaining,
+            pharmacy='Main Street',
+            **extra
+        )
+
+    def test_forecast_run_out(self):
+        import numpy as np
+        from .forecasting import forecast_run_out, load_supply
+
+        self.add('Twice', 'twice_daily', 9)
+        self.add('Weekly', 'weekly', 2)
+        self.add('Ends first', 'once_daily', 30, end_date=self.today + timezone.timedelta(days=3))
+        self.add('As needed', 'as_needed', 1)
+
+        supply = load_supply(PatientMedication.objects.order_by('name'))
+        run_out = dict(zip(supply['name'], forecast_run_out(supply)))
+
+        self.assertEqual(set(run_out), {'Twice', 'Weekly', 'Ends first'})
+        self.assertEqual(run_out['Twice'], np.datetime64(self.today + timezone.timedelta(days=4)))
+        self.assertEqual(run_out['Weekly'], np.datetime64(self.today + timezone.timedelta(days=14)))
+        self.assertTrue(np.isnat(run_out['Ends first']))
+
+    def test_forecast_counts_from_the_last_quantity_change(self):
+        import numpy as np
+        from .forecasting import forecast_run_out, load_supply
+
+        medication = self.add('Twice', 'twice_daily', 9)
+        two_days_ago = timezone.now() - timezone.timedelta(days=2)
+        PatientMedication.objects.filter(pk=medication.pk).update(quantity_updated_at=two_days_ago)
+
+        def run_out():
+            return forecast_run_out(load_supply(PatientMedication.objects.all()))[0]
+
+        # Edits that leave the supply alone keep the baseline
+        medication = PatientMedication.objects.get(pk=medication.pk)
+        medication.pharmacy = 'High Street'
+        medication.save()
+        PatientMedication.objects.filter(pk=medication.pk).update(safety_warnings=[])
+        self.assertEqual(run_out(), np.datetime64(timezone.localdate(two_days_ago) + timezone.timedelta(days=4)))
+
+        medication.remaining_quantity = 8
+        medication.save(update_fields=['remaining_quantity'])
+        self.assertEqual(run_out(), np.datetime64(self.today + timezone.timedelta(days=4)))
+
+    def test_runs_out_without_refills_first(self):
+        self.add('Refillable', 'once_daily', 2, refills_remaining=2)
+        self.add('Last supply', 'once_daily', 2)
+
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [(row['name'], row['needs_prescription']) for row in response.data],
+            [('Last supply', True), ('Refillable', False)]
+        )
+
+    def test_refills_due_endpoint(self):
+        soon = self.add('Soon', 'thrice_daily', 6)
+        self.add('Later', 'once_daily', 30)
+        self.add('Sooner', 'four_times_daily', 0)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in response.data], ['Sooner', 'Soon'])
+        self.assertEqual(response.data[1]['days_left'], 2)
+        self.assertEqual(response.data[1]['medication_id'], soon.medication_id)
+
+        response = self.client.get(self.url, {'days': 30})
+        self.assertEqual(len(response.data), 3)
+
+        response = self.client.get(self.url, {'days': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refill_report_command(self):
+        import csv
+        import io
+        from django.core.management import call_command
+
+        self.add('Soon', 'once_daily', 2)
+        out = io.StringIO()
+        call_command('refill_report', days=7, stdout=out)
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([(row['name'], row['pharmacy'], row['days_left']) for row in rows], [('Soon', 'Main Street', '2')])
+
+
+class ExpirySweepTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='expiry_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.today = timezone.localdate()
+
+    def add(self, name, end_date):
+        medication = PatientMedication.objects.create(
+            patient=self.user,
+            name=name,
+            dosage='1 tablet',
+            frequency='once_daily',
+            start_date=self.today - timezone.timedelta(days=30),
+            end_date=end_date
+        )
+        return medication
+
+    def test_sweep_expires_medications_reminders_and_prescriptions(self):
+        from .expiry import expire_medications
+
+        current = self.add('Current', self.today)
+        expired = self.add('Expired', self.today)
+        # Ended since it was last saved
+        PatientMedication.objects.filter(pk=expired.pk).update(end_date=self.today - timezone.timedelta(days=1))
+
+        doctor = User.objects.create_user(username='expiry_doctor', password='testpass123', user_type='doctor')
+        lapsed = Prescription.objects.create(
+            patient=self.user,
+            doctor=doctor,
+            issue_date=timezone.now() - timezone.timedelta(days=60),
+            expiry_date=timezone.now() - timezone.timedelta(days=1),
+            instructions='Take daily'
+        )
+
+        # Three UPDATEs, plus the savepoint around them
+        with self.assertNumQueries(5):
+            counts = expire_medications()
+        self.assertEqual(counts, {'medications': 1, 'reminders': 1, 'prescriptions': 1})
+
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertEqual(expired.reason_for_discontinuation, 'Expired')
+        self.assertFalse(expired.reminders.filter(is_active=True).exists())
+        self.assertTrue(current.reminders.get().is_active)
+        lapsed.refresh_from_db()
+        self.assertEqual(lapsed.status, 'expired')
+
+        self.assertEqual(expire_medications(), {'medications': 0, 'reminders': 0, 'prescriptions': 0})
+
+    def test_sweep_seeks_the_end_date_index(self):
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('query plan wording is SQLite-specific')
+        plan = PatientMedication.objects.filter(is_active=True, end_date__lt=self.today).explain()
+        self.assertIn('USING INDEX medication_active_end_idx (end_date<?)', plan)
+
+    def test_sweep_refreshes_panel_summaries(self):
+        from .expiry import expire_medications
+        from .summaries import refresh_summaries
+
+        self.add('Current', self.today)
+        expired = self.add('Expired', self.today)
+        PatientMedication.objects.filter(pk=expired.pk).update(end_date=self.today - timezone.timedelta(days=1))
+        refresh_summaries([self.user.pk])
+        self.assertEqual(PatientSummary.objects.get(patient=self.user).active_medications, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_medications()
+        self.assertEqual(PatientSummary.objects.get(patient=self.user).active_medications, 1)
+
+    def test_save_only_flags_the_medication(self):
+        medication = self.add('Saved late', self.today)
+        medication.end_date = self.today - timezone.timedelta(days=1)
+
+        # The reminders wait for the sweep instead of an UPDATE inside pre_save
+        with self.assertNumQueries(1):
+            medication.save()
+        self.assertFalse(medication.is_active)
+        self.assertTrue(medication.reminders.get().is_active)
+
+
+class DefaultReminderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='schedule_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+
+    def medication(self, frequency, **extra):
+        return PatientMedication(
+            patient=self.user,
+            name=f'Drug {frequency}',
+            dosage='1 tablet',
+            frequency=frequency,
+            start_date=timezone.localdate(),
+            **extra
+        )
+
+    def test_every_frequency_has_a_schedule(self):
+        from .schedules import DEFAULT_SCHEDULES
+
+        self.assertEqual(set(DEFAULT_SCHEDULES), {value for value, _ in PatientMedication.FREQUENCY_CHOICES})
+
+    def test_signal_creates_reminders_in_one_insert(self):
+        medication = self.medication('four_times_daily')
+        # Medication INSERT plus one bulk INSERT for all four reminders
+        with self.assertNumQueries(2):
+            medication.save()
+
+        reminders = list(medication.reminders.order_by('reminder_time'))
+        self.assertEqual([r.reminder_time.hour for r in reminders], [8, 12, 16, 20])
+        self.assertTrue(all(r.weekday_mask == 127 and r.next_trigger for r in reminders))
+
+    def test_weekly_uses_start_weekday(self):
+        medication = self.medication('weekly')
+        medication.save()
+
+        reminder = medication.reminders.get()
+        self.assertEqual(reminder.days_of_week, [medication.start_date.weekday()])
+        self.assertEqual(reminder.weekday_mask, 1 << medication.start_date.weekday())
+        self.assertEqual(timezone.localtime(reminder.next_trigger).weekday(), medication.start_date.weekday())
+
+    def test_monthly_uses_start_day(self):
+        from calendar import monthrange
+        from .scheduling import ReminderScheduler
+
+        medication = self.medication('monthly')
+        medication.save()
+
+        reminder = medication.reminders.get()
+        self.assertEqual((reminder.days_of_week, reminder.day_of_month), ([], medication.start_date.day))
+        due = reminder.next_trigger
+        self.assertEqual(timezone.localtime(due).day, medication.start_date.day)
+        self.assertIn(reminder, MedicationReminder.objects.for_date(timezone.localtime(due).date()))
+
+        # Dispatch re-arms it for the same day next month
+        self.assertEqual(ReminderScheduler().run_once(now=due), 1)
+        reminder.refresh_from_db()
+        self.assertGreater(reminder.next_trigger, due + timezone.timedelta(days=27))
+        following = timezone.localtime(reminder.next_trigger)
+        self.assertEqual(following.day, min(medication.start_date.day, monthrange(following.year, following.month)[1]))
+
+    def test_bulk_create_medications(self):
+        from .schedules import bulk_create_medications
+
+        medications = [
+            self.medication(frequency)
+            for _ in range(20)
+            for frequency in ('once_daily', 'thrice_daily', 'as_needed')
+        ]
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # A handful of batched INSERTs, not one per medication or reminder
+        with CaptureQueriesContext(connection) as queries:
+            bulk_create_medications(medications)
+        self.assertLessEqual(len(queries), 6)
+
+        self.assertEqual(PatientMedication.objects.count(), 60)
+        self.assertEqual(MedicationReminder.objects.count(), 80)
+        self.assertEqual(MedicationReminder.objects.filter(next_trigger__isnull=True).count(), 0)
+
+
+class SafetyScanPipelineTests(APITestCase):
+    def setUp(self):
+        from .interactions import interaction_index
+        interaction_index.invalidate()
+
+        self.patient = User.objects.create_user(
+            username='scan_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        PatientProfile.objects.update_or_create(user=self.patient, defaults={'allergies': 'Penicillin, latex'})
+        self.doctor = User.objects.create_user(
+            username='scan_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+
+        PatientMedication.objects.create(
+            patient=self.patient,
+            name='Warfarin',
+            dosage='5mg',
+            frequency='as_needed',
+            start_date=timezone.localdate()
+        )
+        DrugInteraction.objects.create(
+            medication_1='Warfarin',
+            medication_2='Aspirin',
+            severity='major',
+            description='Increased bleeding risk'
+        )
+        self.prescription = Prescription.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            issue_date=timezone.now(),
+            instructions='As directed'
+        )
+        self.url = f'/api/medications/prescriptions/{self.prescription.pk}/safety_scan/'
+
+    def queue(self, medications):
+        response = self.client.post(self.url, {'medications': medications}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        return response.data
+
+    def drain(self):
+        import threading
+        from .safety import work
+
+        # Workers share the test transaction, so run the loop in this thread
+        work(threading.Event(), once=True)
+
+    def test_queued_scan_completes_with_warnings(self):
+        queued = self.queue(['aspirin', 'Warfarin', 'Amoxicillin Penicillin'])
+        self.assertIsNone(queued['finished_at'])
+
+        self.drain()
+        response = self.client.get(queued['status_url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertFalse(response.data['cached'])
+        self.assertEqual(
+            sorted(warning['type'] for warning in response.data['warnings']),
+            ['allergy', 'duplicate', 'interaction']
+        )
+
+        self.prescription.refresh_from_db()
+        self.assertTrue(self.prescription.safety_scan_performed)
+        self.assertEqual(self.prescription.safety_warnings, response.data['warnings'])
+
+    def test_identical_regimens_use_the_cache(self):
+        from .safety import scan_regimen
+        from unittest import mock
+
+        first = self.queue(['Aspirin'])
+        self.drain()
+        second = self.queue([' ASPIRIN '])
+        with mock.patch('medications.safety.scan_regimen', wraps=scan_regimen) as scan:
+            self.drain()
+        scan.assert_not_called()
+        self.assertTrue(SafetyScanJob.objects.get(pk=second['job_id']).cached)
+
+        # Changing the interaction database invalidates cached results
+        DrugInteraction.objects.get().save()
+        self.queue(['Aspirin'])
+        with mock.patch('medications.safety.scan_regimen', wraps=scan_regimen) as scan:
+            self.drain()
+        scan.assert_called_once()
+        self.assertEqual(SafetyScanJob.objects.get(pk=first['job_id']).status, 'completed')
+
+    def test_warm_worker_scans_at_the_keyed_version(self):
+        from .allergies import patient_allergy_set
+        from .indexes import DRUG_INTERACTIONS, bump_generation
+        from .interactions import interaction_db_version, interaction_index
+        from .safety import scan_key
+
+        interaction_index.get_index()
+        # Written by another process (as load_interactions does): no signal
+        # reaches this worker's index, only the generation bump
+        DrugInteraction.objects.bulk_create([DrugInteraction(
+            medication_1='Warfarin', medication_2='Ibuprofen', severity='major', description='Bleeding risk'
+        )])
+        bump_generation(DRUG_INTERACTIONS)
+        queued = self.queue(['Ibuprofen'])
+        self.drain()
+
+        job = SafetyScanJob.objects.get(pk=queued['job_id'])
+        self.assertEqual([warning['type'] for warning in job.warnings], ['interaction'])
+        self.assertEqual(interaction_index.version, interaction_db_version())
+        self.assertEqual(job.scan_key, scan_key(
+            ['Warfarin', 'Ibuprofen'], patient_allergy_set(self.patient.pk), interaction_index.version
+        ))
+
+    def test_scans_abandoned_by_a_dead_worker_are_requeued(self):
+        queued = self.queue(['Aspirin'])
+        # Claimed by a worker that crashed before finishing
+        SafetyScanJob.objects.filter(pk=queued['job_id']).update(
+            status='running', started_at=timezone.now() - timezone.timedelta(minutes=5)
+        )
+        self.drain()
+        self.assertEqual(SafetyScanJob.objects.get(pk=queued['job_id']).status, 'running')
+
+        SafetyScanJob.objects.filter(pk=queued['job_id']).update(
+            started_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+        self.drain()
+        self.assertEqual(SafetyScanJob.objects.get(pk=queued['job_id']).status, 'completed')
+
+    def test_jobs_are_private(self):
+        queued = self.queue([])
+        other = User.objects.create_user(username='scan_other', password='testpass123', user_type='patient')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(queued['status_url'])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FixedTextEngine:
+    """OCR engine for PrescriptionUploadTests"""
+    name = 'fixed'
+
+    def extract_text(self, image):
+        return f'Amoxicillin 500mg three times daily ({image.shape[1]}x{image.shape[0]})'
+
+
+class PrescriptionUploadTests(APITestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, OCR_ENGINE='medications.tests.FixedTextEngine')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.patient = User.objects.create_user(
+            username='ocr_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.doctor = User.objects.create_user(
+            username='ocr_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+        CareTeamMember.objects.create(doctor=self.doctor, patient=self.patient)
+        self.url = '/api/medications/prescriptions/upload/'
+
+    def page(self, width=1000, height=800, angle=0):
+        """A synthetic page of text-like blocks, rotated by `angle` degrees"""
+        import cv2
+        import numpy as np
+
+        image = np.full((height, width), 255, np.uint8)
+        for y in range(height // 8, height * 7 // 8, height // 20):
+            for x in range(width // 10, width * 9 // 10, width // 16):
+                cv2.rectangle(image, (x, y), (x + width // 22, y + height // 50), 0, -1)
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(image, rotation, (width, height), borderValue=255)
+
+    def upload(self, image):
+        import cv2
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        png = cv2.imencode('.png', image)[1].tobytes()
+        return self.client.post(self.url, {
+            'prescription_image': SimpleUploadedFile('scan.PNG', png, content_type='image/png'),
+            'patient_id': self.patient.id
+        }, format='multipart')
+
+    def drain(self):
+        import threading
+        from .ocr_jobs import work
+
+        work(threading.Event(), processes=1, once=True)
+
+    def test_upload_queues_a_draft_prescription(self):
+        import os
+
+        response = self.upload(self.page())
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+
+        upload = PrescriptionUpload.objects.get(pk=response.data['upload_id'])
+        self.assertTrue(os.path.exists(upload.image.path))
+        self.assertTrue(upload.image.name.endswith(f'{upload.upload_id}.png'))
+        self.assertEqual(upload.prescription.status, 'draft')
+        self.assertEqual(upload.prescription.source, 'ocr')
+        self.assertEqual(upload.prescription.patient, self.patient)
+
+    def test_worker_writes_text_onto_the_draft(self):
+        queued = self.upload(self.page(width=3000, height=2400, angle=4)).data
+        self.drain()
+
+        response = self.client.get(queued['status_url'])
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['engine'], 'fixed')
+        # Preprocessing downscaled the image to fit MAX_SIDE
+        self.assertEqual(response.data['extracted_text'], 'Amoxicillin 500mg three times daily (2000x1600)')
+
+        prescription = Prescription.objects.get(pk=queued['prescription'])
+        self.assertEqual(prescription.status, 'draft')
+        self.assertEqual(prescription.instructions, response.data['extracted_text'])
+
+    def test_unreadable_image_fails_the_upload(self):
+        from django.core.files.base import ContentFile
+
+        prescription = Prescription.objects.create(
+            patient=self.patient,
+            doctor=self.doctor,
+            issue_date=timezone.now(),
+            status='draft',
+            source='ocr'
+        )
+        upload = PrescriptionUpload(prescription=prescription, uploaded_by=self.doctor)
+        upload.image.save('broken.png', ContentFile(b'not an image'))
+
+        self.drain()
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'failed')
+        self.assertIn('Unreadable image', upload.error)
+
+    def test_preprocessing_deskews_and_binarizes(self):
+        import numpy as np
+        from .ocr import binarize, deskew, skew_angle
+
+        image = self.page(angle=6)
+        self.assertAlmostEqual(abs(skew_angle(image)), 6, delta=0.5)
+        straightened = deskew(image)
+        self.assertLess(abs(skew_angle(straightened)), 0.5)
+        self.assertEqual(set(np.unique(binarize(straightened)).tolist()), {0, 255})
+
+    def test_only_doctors_upload(self):
+        self.client.force_authenticate(user=self.patient)
+        response = self.upload(self.page())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(PrescriptionUpload.objects.exists())
+
+    def test_doctors_upload_only_for_their_patients(self):
+        CareTeamMember.objects.filter(doctor=self.doctor).update(is_active=False)
+        response = self.upload(self.page())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Prescription.objects.exists())
+
+    def test_uploads_abandoned_by_a_dead_worker_are_requeued(self):
+        queued = self.upload(self.page()).data
+        # Claimed by a worker that crashed before finishing
+        PrescriptionUpload.objects.filter(pk=queued['upload_id']).update(
+            status='processing', started_at=timezone.now() - timezone.timedelta(hours=1)
+        )
+        self.drain()
+
+        upload = PrescriptionUpload.objects.get(pk=queued['upload_id'])
+        self.assertEqual(upload.status, 'completed')
+        self.assertGreater(upload.started_at, timezone.now() - timezone.timedelta(minutes=1))
+
+
+class AllergyIndexTests(APITestCase):
+    def setUp(self):
+        from health.models import HealthProfile
+        from .allergies import allergy_index
+        allergy_index.invalidate()
+
+        self.patient = User.objects.create_user(
+            username='allergy_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        PatientProfile.objects.update_or_create(user=self.patient, defaults={'allergies': 'Penicillin; latex'})
+        HealthProfile.objects.update_or_create(user=self.patient, defaults={'allergies': 'Sulfa drugs,\nLATEX'})
+        self.doctor = User.objects.create_user(
+            username='allergy_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+        CareTeamMember.objects.create(doctor=self.doctor, patient=self.patient)
+
+        Medication.objects.create(
+            name='Augmentin', generic_name='Amoxicillin Clavulanate', dosage_form='tablet',
+            strength='625mg', drug_class='Penicillins', atc_code='J01CR02'
+        )
+        Medication.objects.create(
+            name='Bactrim', generic_name='Sulfamethoxazole Trimethoprim', dosage_form='tablet',
+            strength='800mg', drug_class='Antibacterial combinations', atc_code='J01EE01'
+        )
+        AllergenGroup.objects.create(token='penicillin', drug_class='Penicillins')
+        AllergenGroup.objects.create(token='Sulfa drugs', atc_prefix='j01e')
+
+    def tokens(self):
+        return set(PatientAllergy.objects.filter(patient=self.patient).values_list('source', 'token'))
+
+    def test_profiles_are_parsed_on_save(self):
+        self.assertEqual(self.tokens(), {
+            ('patient_profile', 'penicillin'), ('patient_profile', 'latex'),
+            ('health_profile', 'sulfa drugs'), ('health_profile', 'latex'),
+        })
+
+        profile = PatientProfile.objects.get(user=self.patient)
+        profile.allergies = 'Latex, Peanuts'
+        profile.save()
+        self.assertIn(('patient_profile', 'peanuts'), self.tokens())
+        self.assertNotIn(('patient_profile', 'penicillin'), self.tokens())
+
+    def test_check_flags_allergy_conflicts(self):
+        response = self.client.post('/api/medications/check/', {
+            'medications': ['Augmentin', 'bactrim', 'Latex gloves', 'Ibuprofen'],
+            'patient_id': self.patient.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        allergies = {
+            warning['medication']: (warning['allergy'], warning['matched_on'])
+            for warning in response.data['warnings'] if warning['type'] == 'allergy'
+        }
+        self.assertEqual(allergies, {
+            'Augmentin': ('penicillin', 'drug_class'),
+            'bactrim': ('sulfa drugs', 'atc_code'),
+            'Latex gloves': ('latex', 'name'),
+        })
+
+    def test_backfill_parses_existing_profiles(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        # Queryset updates bypass the save signals
+        PatientProfile.objects.filter(user=self.patient).update(allergies='Aspirin')
+        call_command('backfill_allergies', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.tokens(), {
+            ('patient_profile', 'aspirin'),
+            ('health_profile', 'sulfa drugs'), ('health_profile', 'latex'),
+        })
+
+
+class ContraindicationTests(APITestCase):
+    def setUp(self):
+        from .classification import classification_index
+        from .contraindications import contraindication_index
+        classification_index.invalidate()
+        contraindication_index.invalidate()
+
+        self.doctor = User.objects.create_user(
+            username='contra_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+
+        Medication.objects.create(
+            name='Ibuprofen', dosage_form='tablet', strength='400mg',
+            drug_class='NSAIDs', atc_code='M01AE01'
+        )
+        Medication.objects.create(
+            name='Propranolol', dosage_form='tablet', strength='40mg',
+            drug_class='Beta blockers', atc_code='C07AA05'
+        )
+        Contraindication.objects.create(condition='Asthma', drug_class='Beta Blockers', severity='major')
+        Contraindication.objects.create(
+            condition='peptic ulcer', atc_prefix='M01A', severity='contraindicated',
+            description='NSAIDs can cause ulcer bleeding'
+        )
+        Contraindication.objects.create(condition='Peptic Ulcer', drug_class='NSAIDs', severity='moderate')
+
+    def check(self, **data):
+        response = self.client.post('/api/medications/check/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {
+            (warning['medication'], warning['condition']): warning['severity']
+            for warning in response.data['warnings'] if warning['type'] == 'condition'
+        }
+
+    def test_conditions_are_checked_against_the_matrix(self):
+        warnings = self.check(
+            medications=['ibuprofen', 'Propranolol', 'Paracetamol'],
+            existing_conditions=['asthma', 'Peptic ulcer', 'Gout']
+        )
+        # The ATC match outranks the drug class match for ibuprofen
+        self.assertEqual(warnings, {
+            ('ibuprofen', 'peptic ulcer'): 'contraindicated',
+            ('Propranolol', 'asthma'): 'major',
+        })
+
+    def test_falls_back_to_health_profile_conditions(self):
+        from health.models import HealthProfile
+
+        patient = User.objects.create_user(username='contra_patient', password='testpass123', user_type='patient')
+        HealthProfile.objects.update_or_create(user=patient, defaults={'medical_conditions': 'Asthma, hypertension'})
+        CareTeamMember.objects.create(doctor=self.doctor, patient=patient)
+
+        warnings = self.check(medications=['Propranolol', 'Ibuprofen'], patient_id=patient.id)
+        self.assertEqual(warnings, {('Propranolol', 'asthma'): 'major'})
+
+        # Conditions given with the request take precedence
+        warnings = self.check(medications=['Propranolol'], patient_id=patient.id, existing_conditions=['gout'])
+        self.assertEqual(warnings, {})
+
+    def test_matrix_is_refreshed_on_change(self):
+        self.assertEqual(self.check(medications=['Propranolol'], existing_conditions=['bradycardia']), {})
+        Contraindication.objects.create(condition='Bradycardia', atc_prefix='C07', severity='contraindicated')
+        self.assertEqual(
+            self.check(medications=['Propranolol'], existing_conditions=['bradycardia']),
+            {('Propranolol', 'bradycardia'): 'contraindicated'}
+        )
+
+
+class DoctorPanelTests(APITestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            username='panel_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+
+        self.patients = [
+            User.objects.create_user(username=f'panel_patient_{i}', password='testpass123', user_type='patient')
+            for i in range(3)
+        ]
+        for patient in self.patients:
+            PatientMedication.objects.create(
+                patient=patient,
+                name='Metformin',
+                dosage='500mg',
+                frequency='as_needed',
+                start_date=timezone.localdate()
+            )
+        CareTeamMember.objects.create(doctor=self.doctor, patient=self.patients[0])
+        CareTeamMember.objects.create(doctor=self.doctor, patient=self.patients[1], is_active=False)
+
+    def test_doctor_sees_medications_of_panel_patients_only(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/medications/patient-medications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['patient'] for row in response.data['results']], [self.patients[0].id])
+
+        # The panel is a subquery of the list query, not a list of ids
+        listing = [query['sql'] for query in queries if PatientMedication._meta.db_table in query['sql']]
+        self.assertTrue(listing)
+        self.assertTrue(all(CareTeamMember._meta.db_table in sql for sql in listing))
+
+    def test_check_requires_patient_on_panel(self):
+        data = {'medications': ['Aspirin']}
+
+        response = self.client.post('/api/medications/check/', dict(data, patient_id=self.patients[1].id), format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post('/api/medications/check/', dict(data, patient_id=self.patients[0].id), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_panel_is_loaded_once_per_request(self):
+        from rest_framework.test import APIRequestFactory
+        from users.panels import doctor_panel
+
+        request = APIRequestFactory().get('/')
+        request.user = self.doctor
+        with self.assertNumQueries(1):
+            self.assertIn(self.patients[0].id, doctor_panel(request))
+            self.assertNotIn(self.patients[1].id, doctor_panel(request))
+            self.assertNotIn(self.patients[2].id, doctor_panel(request))
+
+
+class DoctorPanelDashboardTests(APITestCase):
+    def setUp(self):
+        from .interactions import interaction_index
+        interaction_index.invalidate()
+
+        self.doctor = User.objects.create_user(
+            username='dashboard_doctor',
+            password='testpass123',
+            user_type='doctor'
+        )
+        self.client.force_authenticate(user=self.doctor)
+        self.patient = User.objects.create_user(username='dashboard_patient', password='testpass123', user_type='patient')
+        self.new_patient = User.objects.create_user(username='dashboard_new', password='testpass123', user_type='patient')
+        other = User.objects.create_user(username='dashboard_other', password='testpass123', user_type='patient')
+        for patient in (self.patient, self.new_patient):
+            CareTeamMember.objects.create(doctor=self.doctor, patient=patient)
+
+        DrugInteraction.objects.create(
+            medication_1='Warfarin', medication_2='Aspirin', severity='major', description='Bleeding risk'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('Warfarin', 'Aspirin'):
+                self.medication = PatientMedication.objects.create(
+                    patient=self.patient,
+                    name=name,
+                    dosage='5mg',
+                    frequency='once_daily',
+                    start_date=timezone.localdate() - timezone.timedelta(days=40),
+                    remaining_quantity=10 if name == 'Aspirin' else None
+                )
+            PatientMedication.objects.create(
+                patient=other, name='Metformin', dosage='500mg', frequency='once_daily',
+                start_date=timezone.localdate()
+            )
+
+    def log(self, days_ago, log_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicationLog.objects.create(
+                medication=self.medication,
+                scheduled_time=timezone.now() - timezone.timedelta(days=days_ago),
+                status=log_status
+            )
+
+    def test_summary_follows_logs(self):
+        self.log(1, 'taken')
+        self.log(2, 'missed')
+        self.log(20, 'taken')
+        self.log(45, 'missed')
+
+        summary = PatientSummary.objects.get(patient=self.patient)
+        self.assertEqual((summary.taken_7d, summary.total_7d, summary.adherence_7d), (1, 2, 50.0))
+        self.assertEqual((summary.taken_30d, summary.total_30d), (2, 3))
+        self.assertEqual(summary.active_medications, 2)
+        self.assertEqual(summary.interaction_warnings, 1)
+        self.assertIsNotNone(summary.next_refill_date)
+
+    def test_panel_renders_in_one_query(self):
+        self.log(1, 'missed')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/medications/panel/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data['count'], 2)
+        first, second = response.data['patients']
+        self.assertEqual(first['patient_id'], self.patient.id)
+        self.assertEqual(first['adherence_7d'], 0.0)
+        self.assertEqual(first['interaction_warnings'], 1)
+        # No medications, so no summary yet
+        self.assertEqual(second['patient_id'], self.new_patient.id)
+        self.assertIsNone(second['adherence_7d'])
+
+    def test_nightly_refresh(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        PatientSummary.objects.all().delete()
+        out = StringIO()
+        call_command('refresh_patient_summaries', batch_size=1, stdout=out)
+        self.assertIn('Refreshed 2 patient summaries', out.getvalue())
+        self.assertTrue(PatientSummary.objects.filter(patient=self.patient).exists())
+
+    def test_cascade_delete_queues_one_refresh(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .summaries import _refresh_queued
+
+        MedicationLog.objects.bulk_create([
+            MedicationLog(
+                medication=self.medication,
+                scheduled_time=timezone.now() - timezone.timedelta(hours=hours),
+                status='taken'
+            )
+            for hours in range(1, 51)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                PatientMedication.objects.get(pk=self.medication.pk).delete()
+
+        refreshes = [callback for callback in callbacks if getattr(callback, 'func', None) is _refresh_queued]
+        self.assertEqual(len(refreshes), 1)
+        # No per-log fetch of the medication being deleted
+        medication_reads = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "medications_patientmedication"' in query['sql']
+            and '"medication_id" = ' in query['sql']
+        ]
+        self.assertLessEqual(len(medication_reads), 1)
+        self.assertEqual(PatientSummary.objects.get(patient=self.patient).active_medications, 1)
+
+    def test_only_doctors_have_a_panel(self):
+        self.client.force_authenticate(user=self.patient)
+        response = self.client.get('/api/medications/panel/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AdherenceHeatmapTests(APITestCase):
+    def setUp(self):
+        from datetime import date, datetime, time
+
+        self.patient = User.objects.create_user(
+            username='heatmap_patient',
+            password='testpass123',
+            user_type='patient'
+        )
+        self.client.force_authenticate(user=self.patient)
+        self.medication = PatientMedication.objects.create(
+            patient=self.patient,
+            name='Lisinopril',
+            dosage='10mg',
+            frequency='as_needed',
+            start_date=date(2026, 1, 1)
+        )
+        for day, log_status in ((date(2026, 1, 30), 'taken'), (date(2026, 1, 31), 'taken'),
+                                (date(2026, 1, 31), 'missed'), (date(2026, 2, 1), 'late'),
+                                (date(2026, 3, 5), 'taken')):
+            MedicationLog.objects.create(
+                medication=self.medication,
+                scheduled_time=timezone.make_aware(datetime.combine(day, time(23, 30))),
+                status=log_status
+            )
+
+    def test_days_and_months_by_status(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/medications/logs/heatmap/', {'from': '2026-01-30', 'to': '2026-02-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(response.data['statuses'], ['taken', 'missed', 'skipped', 'late'])
+        self.assertEqual(response.data['days']['taken'], [1, 1, 0, 0])
+        self.assertEqual(response.data['days']['missed'], [0, 1, 0, 0])
+        self.assertEqual(response.data['days']['late'], [0, 0, 1, 0])
+        self.assertEqual(response.data['months']['labels'], ['2026-01', '2026-02'])
+        self.assertEqual(response.data['months']['taken'], [2, 0])
+        self.assertEqual(response.data['months']['late'], [0, 1])
+
+    def test_rejects_long_or_inverted_ranges(self):
+        for window in ({'from': '2026-03-01', 'to': '2026-02-01'}, {'from': '2020-01-01', 'to': '2026-01-01'}):
+            response = self.client.get('/api/medications/logs/heatmap/', window)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_matrix_ignores_days_and_statuses_outside_the_grid(self):
+        from datetime import date
+        from .heatmap import day_status_matrix
+
+        matrix = day_status_matrix(
+            [date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 9), date(2026, 1, 2)],
+            ['taken', 'unknown', 'taken', 'skipped'],
+            date(2026, 1, 1), 3
+        )
+        self.assertEqual(matrix.tolist(), [[1, 0, 0, 0], [0, 0, 1, 0], [0, 0, 0, 0]])
+
+
+class PopulationAdherenceTests(APITestCase):
+    def setUp(self):
+        from datetime import date, datetime
+        from .classification import classification_index
+        classification_index.invalidate()
+
+        self.now = timezone.make_aware(datetime(2026, 3, 4, 12, 0))
+        self.admin = User.objects.create_user(username='analytics_admin', password='testpass123', user_type='admin')
+        Medication.objects.create(
+            name='Ibuprofen', dosage_form='tablet', strength='400mg',
+            drug_class='NSAIDs', atc_code='M01AE01'
+        )
+
+        dated = User.objects.create_user(
+            username='analytics_dated', password='testpass123', user_type='patient', date_of_birth=date(1990, 6, 1)
+        )
+        undated = User.objects.create_user(username='analytics_undated', password='testpass123', user_type='patient')
+        ibuprofen = PatientMedication.objects.create(
+            patient=dated, name='Ibuprofen', dosage='400mg', frequency='as_needed', start_date=date(2026, 1, 1)
+        )
+        other = PatientMedication.objects.create(
+            patient=undated, name='Unlisted', dosage='1mg', frequency='weekly', start_date=date(2026, 1, 1)
+        )
+        # 3 of 4 and 1 of 2 taken in the week of 2 March; pending and old logs are left out
+        for medication, day, log_status in (
+            (ibuprofen, 2, 'taken'), (ibuprofen, 2, 'late'), (ibuprofen, 3, 'taken'), (ibuprofen, 3, 'missed'),
+            (ibuprofen, 4, 'pending'), (other, 3, 'taken'), (other, 3, 'skipped'),
+        ):
+            MedicationLog.objects.create(
+                medication=medication, scheduled_time=self.now.replace(day=day, hour=8), status=log_status
+            )
+        MedicationLog.objects.create(medication=other, scheduled_time=self.now - timezone.timedelta(days=40), status='missed')
+
+    def compute(self, **kwargs):
+        from .analytics import compute_population_adherence
+        return compute_population_adherence(days=30, now=self.now, **kwargs)
+
+    def test_distributions_by_dimension(self):
+        self.assertEqual(self.compute(batch_size=1), (6, 7))
+
+        stats = {(stat.dimension, stat.bucket): stat for stat in PopulationAdherenceStat.objects.all()}
+        self.assertEqual(set(stats), {
+            ('frequency', 'as_needed'), ('frequency', 'weekly'),
+            ('drug_class', 'nsaids'), ('drug_class', 'unknown'),
+            ('age_band', '30-44'), ('age_band', 'unknown'),
+            ('week', '2026-03-02'),
+        })
+        self.assertEqual(stats['drug_class', 'nsaids'].adherence_rate, 75.0)
+        self.assertEqual(stats['age_band', 'unknown'].taken, 1)
+
+        week = stats['week', '2026-03-02']
+        self.assertEqual((week.patients, week.doses, week.taken), (2, 6, 4))
+        self.assertEqual(week.adherence_rate, 66.67)
+        self.assertEqual(week.mean_patient_rate, 62.5)
+        self.assertEqual((week.p25, week.median, week.p75), (55.0, 55.0, 80.0))
+        self.assertEqual(week.histogram[10], 1)
+        self.assertEqual(week.histogram[15], 1)
+
+    def test_rerun_replaces_cache(self):
+        self.compute()
+        MedicationLog.objects.all().delete()
+        self.assertEqual(self.compute(), (0, 0))
+        self.assertFalse(PopulationAdherenceStat.objects.exists())
+
+    def test_endpoint_is_admin_only(self):
+        self.compute()
+        self.client.force_authenticate(user=User.objects.get(username='analytics_dated'))
+        response = self.client.get('/api/medications/analytics/adherence/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/medications/analytics/adherence/', {'dimension': 'age_band'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['dimensions']), ['age_band'])
+        self.assertEqual([row['bucket'] for row in response.data['dimensions']['age_band']], ['30-44', 'unknown'])
+        self.assertEqual(response.data['window_end'], self.now)
+
+        response = self.client.get('/api/medications/analytics/adherence/', {'dimension': 'ward'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class InteractionRescanTests(TestCase):
+    def setUp(self):
+        from datetime import date
+        from .interactions import interaction_index
+        interaction_index.invalidate()
+
+        self.start = date(2026, 1, 1)
+        self.both = User.objects.create_user(username='rescan_both', password='testpass123', user_type='patient')
+        self.one = User.objects.create_user(username='rescan_one', password='testpass123', user_type='patient')
+        # Names are posted once the medication change is committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.warfarin = self.medication(self.both, 'Warfarin')
+            self.aspirin = self.medication(self.both, ' ASPIRIN ')
+            self.medication(self.one, 'Warfarin')
+            self.aspirin.safety_warnings = [{'type': 'allergy', 'medications': [' ASPIRIN ']}]
+            self.aspirin.save()
+
+    def medication(self, patient, name, **fields):
+        return PatientMedication.objects.create(
+            patient=patient, name=name, dosage='1 tablet', frequency='as_needed', start_date=self.start, **fields
+        )
+
+    def postings(self):
+        return set(ActiveMedicationName.objects.values_list('name', 'patient_id'))
+
+    def test_postings_follow_active_medications(self):
+        self.assertEqual(self.postings(), {
+            ('warfarin', self.both.pk), ('aspirin', self.both.pk), ('warfarin', self.one.pk),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.aspirin.is_active = False
+            self.aspirin.save()
+            PatientMedication.objects.filter(patient=self.one).delete()
+        self.assertEqual(self.postings(), {('warfarin', self.both.pk)})
+
+    def test_new_interaction_warns_patients_taking_both(self):
+        from .regimens import patients_taking
+        self.assertEqual(patients_taking([('aspirin', 'WARFARIN')]), {self.both.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            interaction = DrugInteraction.objects.create(
+                medication_1='Warfarin', medication_2='Aspirin', severity='major', description='Bleeding risk'
+            )
+
+        self.warfarin.refresh_from_db()
+        self.aspirin.refresh_from_db()
+        self.assertEqual(self.warfarin.safety_warnings, [{
+            'type': 'interaction', 'medications': [' ASPIRIN ', 'Warfarin'], 'severity': 'major',
+            'message': 'Bleeding risk', 'recommendation': interaction.recommendation,
+        }])
+        self.assertTrue(self.warfarin.safety_checked)
+        self.assertEqual([warning['type'] for warning in self.aspirin.safety_warnings], ['allergy', 'interaction'])
+        self.assertEqual(PatientMedication.objects.get(patient=self.one).safety_warnings, [])
+
+        # Moving the row to another pair clears the warnings of the old one
+        interaction.medication_2 = 'Ibuprofen'
+        with self.captureOnCommitCallbacks(execute=True):
+            interaction.save()
+        self.warfarin.refresh_from_db()
+        self.assertEqual(self.warfarin.safety_warnings, [])
+
+    def test_loader_rescans_once_after_the_last_batch(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from unittest import mock
+        from django.core.management import call_command
+        from .regimens import rescan_interactions
+
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(
+                'medication_1,medication_2,severity,description\n'
+                'Warfarin,Aspirin,major,Bleeding risk\n'
+                'Simvastatin,Clarithromycin,contraindicated,Myopathy\n'
+            )
+        self.addCleanup(os.remove, path)
+
+        with mock.patch(
+            'medications.management.commands.load_interactions.rescan_interactions', wraps=rescan_interactions
+        ) as rescan:
+            call_command('load_interactions', path, batch_size=1, stdout=StringIO(), stderr=StringIO())
+
+        rescan.assert_called_once_with({('aspirin', 'warfarin'), ('clarithromycin', 'simvastatin')})
+        self.warfarin.refresh_from_db()
+        self.assertEqual([warning['type'] for warning in self.warfarin.safety_warnings], ['interaction'])
+
+    def test_expiry_and_bulk_creates_keep_postings(self):
+        from datetime import date
+        from .expiry import expire_medications
+        from .schedules import bulk_create_medications
+
+        other = User.objects.create_user(username='rescan_bulk', password='testpass123', user_type='patient')
+        bulk_create_medications([
+            PatientMedication(patient=other, name=name, dosage='1 tablet', frequency='as_needed', start_date=self.start)
+            for name in ('Warfarin', 'Aspirin')
+        ])
+        PatientMedication.objects.filter(pk=self.warfarin.pk).update(end_date=date(2026, 1, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_medications()
+
+        from .regimens import patients_taking
+        self.assertEqual(patients_taking([('Warfarin', 'Aspirin')]), {other.pk})
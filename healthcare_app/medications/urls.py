@@ -14,9 +14,24 @@ router.register(r'interactions', views.DrugInteractionViewSet, basename='interac
 urlpatterns = [
     path('', include(router.urls)),
     
+    # Catalogue autocomplete
+    path('catalogue/search/', views.MedicationCatalogueSearchView.as_view(), name='catalogue-search'),
+    
     # Safety checking
     path('check/', views.MedicationCheckView.as_view(), name='medication-check'),
     
+    # Queued prescription safety scans
+    path('safety-scans/<uuid:job_id>/', views.SafetyScanJobView.as_view(), name='safety-scan-job'),
+    
+    # Prescription images queued for OCR
+    path('prescription-uploads/<uuid:upload_id>/', views.PrescriptionUploadView.as_view(), name='prescription-upload'),
+    
+    # Doctor panel dashboard
+    path('panel/', views.DoctorPanelView.as_view(), name='doctor-panel'),
+    
+    # Platform-wide adherence analytics (admins)
+    path('analytics/adherence/', views.PopulationAdherenceView.as_view(), name='population-adherence'),
+    
     # Adherence tracking
     path('adherence/', views.MedicationAdherenceView.as_view(), name='medication-adherence'),
     
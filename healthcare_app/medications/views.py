@@ -1,41 +1,96 @@
 # medications/views.py
 
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, serializers
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Q
+from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
+import csv
 import logging
+import os
+import uuid
 
 from .models import *
 from .serializers import *
+from .allergies import allergy_index, patient_allergy_set
+from .catalogue import catalogue_index
+from .contraindications import contraindication_index, split_conditions
+from .forecasting import refills_due
+from .heatmap import adherence_heatmap
+from .interactions import interaction_index
+from .adherence import compute_adherence, rollup_totals
+from .rollups import record_logs
+from .scheduling import compute_next_trigger
+from .summaries import PANEL_SUMMARY_FIELDS, queue_summary_refresh
 from users.models import CustomUser
+from users.panels import can_view_patient, doctor_panel
+from health.models import HealthProfile
+from api.pagination import KeysetPagination
+from api.permissions import IsAdminUser
 
 logger = logging.getLogger(__name__)
 
+
+def parse_date_window(query_params):
+    """Parse optional ?from=YYYY-MM-DD&to=YYYY-MM-DD; returns (window, error)"""
+    window = {}
+    for param in ('from', 'to'):
+        value = query_params.get(param)
+        if value:
+            try:
+                window[param] = parse_date(value)
+            except ValueError:
+                window[param] = None
+            if window[param] is None:
+                return window, f'{param} must be a date in YYYY-MM-DD format'
+    
+    if window.get('from') and window.get('to') and window['from'] > window['to']:
+        return window, 'from must not be after to'
+    
+    return window, None
+
+
 class PatientMedicationViewSet(viewsets.ModelViewSet):
     """ViewSet for patient medications"""
     serializer_class = PatientMedicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-medication_id')
     
-    def get_queryset(self):
+    def get_visible_queryset(self):
+        """Medications the user may see, without per-row annotations"""
         user = self.request.user
         
         # Patients can see their own medications
         if user.user_type == 'patient':
             return PatientMedication.objects.filter(patient=user, is_active=True)
         
-        # Doctors can see medications of their patients
+        # Doctors can see medications of the patients on their panel
         elif user.user_type == 'doctor':
-            # Assuming doctor-patient relationship exists
-            # You may need to adjust this based on your actual relationship model
-            patient_ids = []  # Get patient IDs from doctor-patient relationship
-            return PatientMedication.objects.filter(patient_id__in=patient_ids)
+            return doctor_panel(self.request).filter(PatientMedication.objects.all())
         
         return PatientMedication.objects.none()
     
+    def get_queryset(self):
+        queryset = self.get_visible_queryset()
+        
+        # Adherence counts and patient names come with the rows, not per row
+        totals = rollup_totals('adherence_rollups__')
+        return queryset.select_related('patient').annotate(
+            taken_doses=totals['taken_doses'],
+            total_doses=totals['total_doses']
+        )
+    
     def perform_create(self, serializer):
         serializer.save(patient=self.request.user)
     
@@ -55,6 +110,21 @@ class PatientMedicationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(medications, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def refills_due(self, request):
+        """Medications projected to run out within ?days= (default 7)"""
+        try:
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            days = -1
+        if not 0 <= days <= 365:
+            return Response(
+                {'error': 'days must be a whole number between 0 and 365'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(refills_due(self.get_visible_queryset(), within_days=days))
+    
     @action(detail=True, methods=['post'])
     def deactivate(self, request, pk=None):
         """Deactivate a medication"""
@@ -106,11 +176,7 @@ class MedicationReminderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def todays_reminders(self, request):
         """Get today's reminders"""
-        today_weekday = timezone.now().weekday()  # Monday=0, Sunday=6
-        
-        reminders = self.get_queryset().filter(
-            days_of_week__contains=today_weekday
-        ).order_by('reminder_time')
+        reminders = self.get_queryset().for_date(timezone.localdate()).order_by('reminder_time')
         
         serializer = self.get_serializer(reminders, many=True)
         return Response(serializer.data)
@@ -120,7 +186,7 @@ class MedicationReminderViewSet(viewsets.ModelViewSet):
         """Mark reminder as triggered"""
         reminder = self.get_object()
         reminder.last_triggered = timezone.now()
-        reminder.save()
+        reminder.save(update_fields=['last_triggered', 'next_trigger', 'updated_at'])
         
         # Create medication log entry
         MedicationLog.objects.create(
@@ -137,10 +203,26 @@ class MedicationReminderViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class _Echo:
+    """File-like object that hands csv.writer output straight back"""
+    def write(self, value):
+        return value
+
+
 class MedicationLogViewSet(viewsets.ModelViewSet):
     """ViewSet for medication logs"""
     serializer_class = MedicationLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination  # -scheduled_time, -log_id
+    
+    MAX_BATCH_SIZE = 100
+    EXPORT_CHUNK_SIZE = 2000
+    HEATMAP_DEFAULT_DAYS = 365
+    HEATMAP_MAX_DAYS = 731
+    EXPORT_FIELDS = (
+        'log_id', 'medication_id', 'medication__name', 'scheduled_time', 'actual_time',
+        'status', 'dosage_taken', 'confirmation_method', 'notes',
+    )
     
     def get_queryset(self):
         user = self.request.user
@@ -148,7 +230,7 @@ class MedicationLogViewSet(viewsets.ModelViewSet):
         if user.user_type == 'patient':
             return MedicationLog.objects.filter(
                 medication__patient=user
-            ).order_by('-scheduled_time')
+            ).select_related('medication__patient').order_by('-scheduled_time')
         
         return MedicationLog.objects.none()
     
@@ -164,6 +246,93 @@ class MedicationLogViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(logs, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the full dose history as CSV or NDJSON"""
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in ('csv', 'ndjson'):
+            return Response(
+                {'error': 'type must be csv or ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        window, error = parse_date_window(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        logs = self.get_queryset()
+        medication_id = request.query_params.get('medication')
+        if medication_id:
+            try:
+                logs = logs.filter(medication_id=uuid.UUID(medication_id))
+            except ValueError:
+                return Response(
+                    {'error': 'medication must be a medication id'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        # Whole-day bounds keep the (medication, scheduled_time) index usable
+        if window.get('from'):
+            logs = logs.filter(scheduled_time__gte=timezone.make_aware(
+                datetime.combine(window['from'], datetime.min.time())
+            ))
+        if window.get('to'):
+            logs = logs.filter(scheduled_time__lt=timezone.make_aware(
+                datetime.combine(window['to'] + timedelta(days=1), datetime.min.time())
+            ))
+        
+        rows = logs.order_by('scheduled_time', 'log_id').values_list(
+            *self.EXPORT_FIELDS
+        ).iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        
+        if export_type == 'csv':
+            content, content_type = self._export_csv(rows), 'text/csv'
+        else:
+            content, content_type = self._export_ndjson(rows), 'application/x-ndjson'
+        
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="medication-logs.{export_type}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def heatmap(self, request):
+        """Doses per day and month by status, as one array per status"""
+        window, error = parse_date_window(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        end = window.get('to') or timezone.localdate()
+        start = window.get('from') or end - timedelta(days=self.HEATMAP_DEFAULT_DAYS - 1)
+        if start > end or (end - start).days >= self.HEATMAP_MAX_DAYS:
+            return Response(
+                {'error': f'from must be on or before to and at most {self.HEATMAP_MAX_DAYS} days earlier'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        logs = self.get_queryset()
+        medication_id = request.query_params.get('medication')
+        if medication_id:
+            try:
+                logs = logs.filter(medication_id=uuid.UUID(medication_id))
+            except ValueError:
+                return Response(
+                    {'error': 'medication must be a medication id'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        return Response(adherence_heatmap(logs, start, end))
+    
+    def _export_csv(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.EXPORT_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    
+    def _export_ndjson(self, rows):
+        encoder = DjangoJSONEncoder()
+        for row in rows:
+            yield encoder.encode(dict(zip(self.EXPORT_FIELDS, row))) + '\n'
+    
     @action(detail=False, methods=['post'])
     def log_manual(self, request):
         """Log medication intake manually"""
@@ -177,6 +346,109 @@ class MedicationLogViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], url_path='batch')
+    def log_batch(self, request):
+        """Log a list of dose events in one request"""
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {'error': 'Expected a non-empty list of dose events'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(request.data) > self.MAX_BATCH_SIZE:
+            return Response(
+                {'error': f'At most {self.MAX_BATCH_SIZE} dose events can be logged at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = self.get_serializer(data=request.data, many=True)
+        
+        # Only the patient's own medications and reminders are accepted
+        fields = serializer.child.fields
+        fields['medication'].queryset = PatientMedication.objects.filter(
+            patient=request.user
+        ).select_related('patient')
+        fields['reminder'].queryset = MedicationReminder.objects.filter(medication__patient=request.user)
+        
+        # Validate item by item so one bad event does not reject the rest
+        now = timezone.now()
+        logs = []
+        errors = []
+        for index, item in enumerate(request.data):
+            try:
+                data = serializer.child.run_validation(item)
+            except serializers.ValidationError as e:
+                errors.append({'index': index, 'errors': e.detail})
+                continue
+            
+            if data.get('reminder') and data['reminder'].medication_id != data['medication'].medication_id:
+                errors.append({'index': index, 'errors': {
+                    'reminder': ['Reminder does not belong to this medication']
+                }})
+                continue
+            
+            data['actual_time'] = data.get('actual_time') or now
+            data['confirmed_by'] = request.user
+            logs.append(MedicationLog(**data))
+        
+        if logs:
+            # bulk_update skips save(), so next_trigger and updated_at are set
+            # here the way the trigger action's save() sets them
+            reminders = {log.reminder_id: log.reminder for log in logs if log.reminder_id}
+            for reminder in reminders.values():
+                reminder.last_triggered = now
+                reminder.next_trigger = compute_next_trigger(
+                    reminder.reminder_time, reminder.days_of_week, now, reminder.day_of_month
+                ) if reminder.is_active else None
+                reminder.updated_at = now
+            
+            with transaction.atomic():
+                MedicationLog.objects.bulk_create(logs)
+                MedicationReminder.objects.bulk_update(
+                    reminders.values(), ['last_triggered', 'next_trigger', 'updated_at']
+                )
+                record_logs(logs)
+                # bulk_create skips the signals that refresh panel summaries
+                queue_summary_refresh(patient_ids={log.medication.patient_id for log in logs})
+        
+        if not logs:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        
+        return Response({
+            'created': self.get_serializer(logs, many=True).data,
+            'errors': errors
+        }, status=response_status)
+
+
+class MedicationCatalogueSearchView(APIView):
+    """Autocomplete over the medication catalogue"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(int(request.query_params.get('limit', self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            limit = self.DEFAULT_LIMIT
+        
+        return Response({
+            'query': query,
+            'results': catalogue_index.search(query, limit=max(limit, 1))
+        })
 
 
 class MedicationCheckView(APIView):
@@ -193,26 +465,26 @@ class MedicationCheckView(APIView):
             patient_id = serializer.validated_data.get('patient_id')
             existing_conditions = serializer.validated_data.get('existing_conditions', [])
             
-            # Check for drug interactions
+            # Check for drug interactions against the in-memory index
             interactions = []
-            for i in range(len(medications)):
-                for j in range(i + 1, len(medications)):
-                    interaction = DrugInteraction.objects.filter(
-                        Q(medication_1__iexact=medications[i], medication_2__iexact=medications[j]) |
-                        Q(medication_1__iexact=medications[j], medication_2__iexact=medications[i])
-                    ).first()
-                    
-                    if interaction:
-                        interactions.append({
-                            'medication_1': medications[i],
-                            'medication_2': medications[j],
-                            'severity': interaction.severity,
-                            'description': interaction.description,
-                            'recommendation': interaction.recommendation
-                        })
+            for med_1, med_2, interaction in interaction_index.find_interactions(medications):
+                interactions.append({
+                    'medication_1': med_1,
+                    'medication_2': med_2,
+                    'severity': interaction.severity,
+                    'description': interaction.description,
+                    'recommendation': interaction.recommendation
+                })
             
             # Check for existing patient conditions
             warnings = []
+            conditions = existing_conditions
+            if patient_id and not can_view_patient(request, patient_id):
+                return Response(
+                    {'error': 'Patient is not under your care'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            
             if patient_id:
                 try:
                     patient = CustomUser.objects.get(id=patient_id, user_type='patient')
@@ -234,12 +506,41 @@ class MedicationCheckView(APIView):
                                 'medication': med,
                                 'message': f'Patient is already taking {med}'
                             })
+                    
+                    # Intersect with the patient's compiled allergies
+                    allergies = patient_allergy_set(patient.id)
+                    for med, allergy, matched_on in allergy_index.conflicts(medications, allergies):
+                        warnings.append({
+                            'type': 'allergy',
+                            'medication': med,
+                            'allergy': allergy,
+                            'matched_on': matched_on,
+                            'message': f'Patient is allergic to {allergy}'
+                        })
+                    
+                    if not conditions:
+                        medical_conditions = HealthProfile.objects.filter(
+                            user=patient
+                        ).values_list('medical_conditions', flat=True).first()
+                        conditions = split_conditions(medical_conditions)
                 
                 except CustomUser.DoesNotExist:
                     pass
             
+            # One pass over the regimen against the contraindication matrix
+            for med, condition, contraindication in contraindication_index.find_contraindications(medications, conditions):
+                warnings.append({
+                    'type': 'condition',
+                    'medication': med,
+                    'condition': condition,
+                    'severity': contraindication.severity,
+                    'message': contraindication.description or f'{med} is contraindicated in {condition}',
+                    'recommendation': contraindication.recommendation
+                })
+            
             return Response({
                 'medications_checked': medications,
+                'conditions_checked': conditions,
                 'interactions': interactions,
                 'warnings': warnings,
                 'timestamp': timezone.now()
@@ -253,6 +554,39 @@ class MedicationCheckView(APIView):
             )
 
 
+class DoctorPanelView(APIView):
+    """Adherence, medications, refills and interaction warnings of every patient on the doctor's panel"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        if request.user.user_type != 'doctor':
+            return Response(
+                {'error': 'Only doctors have a patient panel'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # One query: panel members joined to their stored summaries, worst
+        # 7-day adherence first. Patients without a summary yet come last.
+        summary = 'patient__medication_summary__'
+        rows = doctor_panel(request).members.values(
+            'patient_id', 'patient__username', 'patient__first_name', 'patient__last_name',
+            *(summary + field for field in PANEL_SUMMARY_FIELDS)
+        ).order_by(
+            F(summary + 'adherence_7d').asc(nulls_last=True), 'patient_id'
+        )
+        
+        patients = [
+            {
+                'patient_id': row['patient_id'],
+                'username': row['patient__username'],
+                'name': f"{row['patient__first_name']} {row['patient__last_name']}".strip(),
+                **{field: row[summary + field] for field in PANEL_SUMMARY_FIELDS}
+            }
+            for row in rows
+        ]
+        return Response({'count': len(patients), 'patients': patients})
+
+
 class MedicationAdherenceView(APIView):
     """Get medication adherence statistics"""
     permission_classes = [permissions.IsAuthenticated]
@@ -266,64 +600,41 @@ class MedicationAdherenceView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get all active medications
-        medications = PatientMedication.objects.filter(
-            patient=user,
-            is_active=True
-        )
-        
-        adherence_data = []
-        overall_taken = 0
-        overall_total = 0
+        window, error = parse_date_window(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
         
-        for med in medications:
-            logs = med.logs.all()
-            total = logs.count()
-            taken = logs.filter(status__in=['taken', 'late']).count()
-            missed = logs.filter(status='missed').count()
-            
-            adherence_rate = (taken / total * 100) if total > 0 else 0
-            
-            last_taken = logs.filter(status__in=['taken', 'late']).order_by('-scheduled_time').first()
-            
-            adherence_data.append({
-                'medication_id': med.medication_id,
-                'medication_name': med.name,
-                'total_doses': total,
-                'taken_doses': taken,
-                'missed_doses': missed,
-                'adherence_rate': round(adherence_rate, 2),
-                'last_taken': last_taken.scheduled_time if last_taken else None
-            })
-            
-            overall_taken += taken
-            overall_total += total
+        data = compute_adherence(user, date_from=window.get('from'), date_to=window.get('to'))
+        if window:
+            data['window'] = {'from': window.get('from'), 'to': window.get('to')}
         
-        overall_adherence = (overall_taken / overall_total * 100) if overall_total > 0 else 0
+        return Response(data)
+
+
+class PopulationAdherenceView(APIView):
+    """Platform-wide adherence distributions from the last compute_population_adherence run (admins only)"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        dimension = request.query_params.get('dimension')
+        dimensions = dict(PopulationAdherenceStat.DIMENSION_CHOICES)
+        if dimension and dimension not in dimensions:
+            return Response(
+                {'error': f"dimension must be one of: {', '.join(dimensions)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Weekly adherence trend
-        week_ago = timezone.now() - timezone.timedelta(days=7)
-        weekly_logs = MedicationLog.objects.filter(
-            medication__patient=user,
-            scheduled_time__gte=week_ago
-        )
+        stats = PopulationAdherenceStat.objects.order_by('dimension', 'bucket')
+        if dimension:
+            stats = stats.filter(dimension=dimension)
         
-        weekly_taken = weekly_logs.filter(status__in=['taken', 'late']).count()
-        weekly_total = weekly_logs.count()
-        weekly_adherence = (weekly_taken / weekly_total * 100) if weekly_total > 0 else 0
+        data = {name: [] for name in dimensions if not dimension or name == dimension}
+        for stat in PopulationAdherenceStatSerializer(stats, many=True).data:
+            data[stat['dimension']].append(stat)
         
-        return Response({
-            'overall_adherence': round(overall_adherence, 2),
-            'weekly_adherence': round(weekly_adherence, 2),
-            'medications': adherence_data,
-            'total_medications': medications.count(),
-            'active_medications': medications.filter(is_active=True).count(),
-            'summary': {
-                'total_doses': overall_total,
-                'taken_doses': overall_taken,
-                'missed_doses': overall_total - overall_taken
-            }
-        })
+        # Every row of a run shares its window; empty until the first run
+        run = PopulationAdherenceStat.objects.values('window_start', 'window_end', 'generated_at').first()
+        return Response({**(run or dict.fromkeys(('window_start', 'window_end', 'generated_at'))), 'dimensions': data})
 
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -349,24 +660,103 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         
         serializer.save(doctor=user)
     
+    def initial(self, request, *args, **kwargs):
+        if self.action == 'upload':
+            # Stream uploaded images straight to a temporary file, however
+            # small, instead of buffering them in worker memory. This must
+            # happen before anything reads the request body.
+            request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def upload(self, request):
+        """Queue a prescription image for OCR into a draft prescription; run_ocr_jobs workers read it"""
+        user = request.user
+        
+        if user.user_type != 'doctor':
+            return Response(
+                {'error': 'Only doctors can upload prescriptions'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = PrescriptionUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not can_view_patient(request, serializer.validated_data['patient'].id):
+            return Response(
+                {'error': 'Patient is not under your care'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        image = serializer.validated_data['prescription_image']
+        with transaction.atomic():
+            prescription = Prescription.objects.create(
+                patient=serializer.validated_data['patient'],
+                doctor=user,
+                issue_date=timezone.now(),
+                status='draft',
+                source='ocr'
+            )
+            # The storage moves the temporary file into MEDIA_ROOT rather than copying it
+            upload = PrescriptionUpload(prescription=prescription, uploaded_by=user)
+            upload.image.save(f'{upload.upload_id}{os.path.splitext(image.name)[1].lower()}', image, save=False)
+            upload.save()
+        
+        data = PrescriptionUploadStatusSerializer(upload).data
+        data['status_url'] = request.build_absolute_uri(
+            reverse('prescription-upload', kwargs={'upload_id': upload.upload_id})
+        )
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=True, methods=['post'])
     def safety_scan(self, request, pk=None):
-        """Perform safety scan on prescription"""
+        """Queue a safety scan of the prescription; run_safety_scans workers pick it up"""
         prescription = self.get_object()
         
-        # TODO: Integrate with AI services for OCR and safety checking
-        # This is a placeholder implementation
+        serializer = SafetyScanRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        prescription.safety_scan_performed = True
-        prescription.scan_timestamp = timezone.now()
-        prescription.save()
+        job = SafetyScanJob.objects.create(
+            prescription=prescription,
+            requested_by=request.user,
+            medications=serializer.validated_data['medications']
+        )
         
-        return Response({
-            'prescription_id': str(prescription.prescription_id),
-            'safety_scan_performed': True,
-            'scan_timestamp': prescription.scan_timestamp,
-            'message': 'Safety scan completed (placeholder)'
-        })
+        data = SafetyScanJobSerializer(job).data
+        data['status_url'] = request.build_absolute_uri(
+            reverse('safety-scan-job', kwargs={'job_id': job.job_id})
+        )
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class SafetyScanJobView(APIView):
+    """Status and result of a queued safety scan"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(
+            SafetyScanJob.objects.filter(
+                Q(prescription__patient=request.user) | Q(prescription__doctor=request.user)
+            ),
+            job_id=job_id
+        )
+        return Response(SafetyScanJobSerializer(job).data)
+
+
+class PrescriptionUploadView(APIView):
+    """Status and extracted text of an uploaded prescription image"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, upload_id):
+        upload = get_object_or_404(
+            PrescriptionUpload.objects.filter(
+                Q(prescription__patient=request.user) | Q(prescription__doctor=request.user)
+            ),
+            upload_id=upload_id
+        )
+        return Response(PrescriptionUploadStatusSerializer(upload).data)
 
 
 class DrugInteractionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -389,10 +779,7 @@ class DrugInteractionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        interaction = DrugInteraction.objects.filter(
-            Q(medication_1__iexact=med1, medication_2__iexact=med2) |
-            Q(medication_1__iexact=med2, medication_2__iexact=med1)
-        ).first()
+        interaction = interaction_index.lookup(med1, med2)
         
         if interaction:
             serializer = self.get_serializer(interaction)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, FamilyMember, PatientProfile, DoctorProfile
+from .models import CustomUser, FamilyMember, PatientProfile, DoctorProfile, CareTeamMember
 from django.utils.html import format_html
 
 
@@ -60,4 +60,12 @@ class FamilyMemberAdmin(admin.ModelAdmin):
     list_display = ('name', 'main_user', 'relationship', 'is_emergency_contact', 'can_edit')
     list_filter = ('relationship', 'is_emergency_contact', 'can_edit', 'created_at')
     search_fields = ('name', 'main_user__username', 'email', 'phone')
-    raw_id_fields = ('main_user', 'health_profile')
\ No newline at end of file
+    raw_id_fields = ('main_user', 'health_profile')
+
+
+@admin.register(CareTeamMember)
+class CareTeamMemberAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'patient', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('doctor__username', 'patient__username')
+    raw_id_fields = ('doctor', 'patient')
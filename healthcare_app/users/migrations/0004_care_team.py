@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-17 00:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_customuser_options_alter_doctorprofile_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CareTeamMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='panel_memberships', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='care_team_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Care Team Member',
+                'verbose_name_plural': 'Care Team Members',
+                'indexes': [models.Index(fields=['doctor', 'is_active', 'patient'], name='users_caret_doctor__08d1eb_idx'), models.Index(fields=['patient', 'is_active', 'doctor'], name='users_caret_patient_8b10b6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'patient'), name='unique_care_team_member')],
+            },
+        ),
+    ]
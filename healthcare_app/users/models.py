@@ -223,4 +223,39 @@ class DoctorProfile(models.Model):
     @property
     def full_title(self):
         """Return doctor's full professional title."""
-        return f"Dr. {self.user.get_full_name()} - {self.specialization}"
\ No newline at end of file
+        return f"Dr. {self.user.get_full_name()} - {self.specialization}"
+
+class CareTeamMember(models.Model):
+    """A doctor on a patient's care team; a doctor's patients make up their panel."""
+    doctor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='panel_memberships'
+    )
+    patient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='care_team_memberships'
+    )
+    is_active = models.BooleanField(default=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Care Team Member"
+        verbose_name_plural = "Care Team Members"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'patient'],
+                name='unique_care_team_member'
+            )
+        ]
+        indexes = [
+            # Covers the panel subquery: patient ids by doctor, index-only
+            models.Index(fields=['doctor', 'is_active', 'patient']),
+            models.Index(fields=['patient', 'is_active', 'doctor']),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor.username} -> {self.patient.username}"
@@ -0,0 +1,53 @@
+from functools import cached_property
+
+from .models import CareTeamMember, CustomUser
+
+
+class Panel:
+    """
+    The patients on a doctor's care teams, for the duration of one request.
+
+    Querysets filter through `subquery` (a single indexed subquery, so a
+    large panel never travels through Python), while `patient_ids` loads
+    the set once for membership checks.
+    """
+
+    def __init__(self, doctor):
+        self.doctor = doctor
+
+    @property
+    def members(self):
+        return CareTeamMember.objects.filter(doctor=self.doctor, is_active=True)
+
+    @property
+    def subquery(self):
+        return self.members.values('patient_id')
+
+    @cached_property
+    def patient_ids(self):
+        return frozenset(self.subquery.values_list('patient_id', flat=True))
+
+    def __contains__(self, patient_id):
+        return patient_id in self.patient_ids
+
+    def filter(self, queryset, field='patient'):
+        """Restrict `queryset` to rows whose `field` is one of the panel's patients."""
+        return queryset.filter(**{f'{field}__in': self.subquery})
+
+
+def doctor_panel(request):
+    """The requesting doctor's Panel, cached on the request."""
+    panel = getattr(request, '_doctor_panel', None)
+    if panel is None or panel.doctor != request.user:
+        panel = request._doctor_panel = Panel(request.user)
+    return panel
+
+
+def can_view_patient(request, patient_id):
+    """Whether the requesting user may see a patient's records."""
+    user = request.user
+    if user.user_type == CustomUser.UserType.PATIENT:
+        return user.id == patient_id
+    if user.user_type == CustomUser.UserType.DOCTOR:
+        return patient_id in doctor_panel(request)
+    return user.user_type == CustomUser.UserType.ADMIN
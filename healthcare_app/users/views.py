@@ -13,6 +13,7 @@ from .forms import (
     FamilyMemberForm
 )
 from .models import CustomUser, PatientProfile, DoctorProfile, FamilyMember
+from .panels import doctor_panel
 from django.views.generic import DeleteView
 
 
@@ -164,7 +165,7 @@ def dashboard(request):
         template = 'users/doctor_dashboard.html'
         context = {
             'appointments_today': 0,  # Replace with actual logic
-            'total_patients': 0,  # Replace with actual logic
+            'total_patients': doctor_panel(request).members.count(),
         }
     elif user.user_type == CustomUser.UserType.PATIENT:
         template = 'users/patient_dashboard.html'